@@ -1,9 +1,14 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
 from pydantic import BaseModel, Field
 from typing import List, Dict, Any, Optional, Union
 from bson import ObjectId
 from database import StudentDB, DepartmentDB, SubjectDB
 from dependencies import get_student_db, get_department_db, get_subject_db
+from cache import conditional_json, bump_versions
+from results import refresh_results
+from projections import DEPARTMENT_NAME_FIELDS, SUBJECT_SUMMARY_FIELDS
+from assessment import DEFAULT_INTERNAL_RULES, internal_rules_of
+from jobs import enqueue
 import logging
 from datetime import date
 
@@ -41,6 +46,10 @@ class MarkCriteria(BaseModel):
     internal: int = Field(..., ge=0, le=100)
     external: int = Field(..., ge=0, le=100)
     formula: str
+    # How the stored internal score is aggregated (see assessment.py)
+    fat_best_of: int = Field(DEFAULT_INTERNAL_RULES["fat_best_of"], ge=1, le=3)
+    fat_weight: int = Field(DEFAULT_INTERNAL_RULES["fat_weight"], ge=0, le=100)
+    assignment_weight: int = Field(DEFAULT_INTERNAL_RULES["assignment_weight"], ge=0, le=100)
 
 def is_valid_object_id(oid: str) -> bool:
     """Check if the string is a valid MongoDB ObjectId."""
@@ -159,6 +168,9 @@ def sanitize_student_data(student: Dict[str, Any], subjects: List[Dict[str, Any]
     logger.debug(f"Sanitized student {student_id}: {sanitized}")
     return sanitized
 
+# Everything sanitize_student_data reads, and nothing else
+MARKS_STUDENT_FIELDS = {"fullName": 1, "registrationNumber": 1, "department": 1, "yearOfStudy": 1, "courses": 1, "marks": 1}
+
 @router.get("/students", response_model=List[Dict[str, Any]])
 async def get_students(
     student_db: StudentDB = Depends(get_student_db),
@@ -167,12 +179,12 @@ async def get_students(
 ):
     try:
         students = []
-        all_subjects = await subject_db.collection.find().to_list(length=None)
-        all_depts = await department_db.collection.find().to_list(length=None)
+        all_subjects = await subject_db.collection.find({}, SUBJECT_SUMMARY_FIELDS).to_list(length=None)
+        all_depts = await department_db.collection.find({}, DEPARTMENT_NAME_FIELDS).to_list(length=None)
         logger.info(f"Found {len(all_depts)} departments: {[str(d['_id']) + ':' + d.get('name', 'N/A') for d in all_depts]}")
         logger.info(f"Found {len(all_subjects)} subjects: {[s.get('code', 'N/A') for s in all_subjects]}")
         
-        async for student in student_db.collection.find():
+        async for student in student_db.collection.find({}, MARKS_STUDENT_FIELDS):
             try:
                 sanitized = sanitize_student_data(student, all_subjects, all_depts)
                 students.append(sanitized)
@@ -195,6 +207,7 @@ async def save_marks(
 ):
     logger.debug(f"Received marks payload: {marks_data.dict()}")
     saved_count = 0
+    saved_students = set()
     errors = []
     try:
         if not marks_data.marks:
@@ -220,13 +233,13 @@ async def save_marks(
                     continue
 
                 # Validate student
-                student = await student_db.collection.find_one({"_id": student_oid})
+                student = await student_db.collection.find_one({"_id": student_oid}, {"courses": 1})
                 if not student:
                     errors.append(f"Entry {index}: Student {mark.student_id} not found")
                     continue
 
                 # Validate subject
-                subject = await subject_db.collection.find_one({"_id": subject_oid})
+                subject = await subject_db.collection.find_one({"_id": subject_oid}, {"code": 1})
                 if not subject:
                     errors.append(f"Entry {index}: Subject {mark.subject_id} not found")
                     continue
@@ -263,6 +276,7 @@ async def save_marks(
 
                 if update_result.modified_count > 0 or update_result.matched_count > 0:
                     saved_count += 1
+                    saved_students.add(student_oid)
                     logger.info(f"Saved mark for Student: {mark.student_id}, Subject: {mark.subject_id}, Final: {mark.final}")
                 else:
                     errors.append(f"Entry {index}: Failed to save mark for Student: {mark.student_id}, Subject: {mark.subject_id}")
@@ -272,6 +286,10 @@ async def save_marks(
                 logger.error(error_msg)
                 errors.append(error_msg)
 
+        if saved_count > 0:
+            await bump_versions(student_db.collection.database, "students")
+            await refresh_results(student_db.collection.database, saved_students)
+
         if errors:
             error_details = "; ".join(errors)
             if saved_count == 0:
@@ -291,23 +309,28 @@ async def save_marks(
 
 @router.get("/mark-criteria", response_model=Dict[str, Any])
 async def get_mark_criteria(
+    request: Request,
     student_db: StudentDB = Depends(get_student_db)
 ):
-    try:
+    async def build():
         criteria = await student_db.collection.database["mark_criteria"].find_one({})
         if not criteria:
             await student_db.collection.database["mark_criteria"].insert_one(
-                {"internal": 30, "external": 70, "formula": "(internal * 0.3) + (external * 0.7)"}
+                {"internal": 30, "external": 70, "formula": "(internal * 0.3) + (external * 0.7)", **DEFAULT_INTERNAL_RULES}
             )
             logger.info("Inserted default mark criteria.")
-            return {"internal": 30, "external": 70, "formula": "(internal * 0.3) + (external * 0.7)"}
+            return {"internal": 30, "external": 70, "formula": "(internal * 0.3) + (external * 0.7)", **DEFAULT_INTERNAL_RULES}
 
         logger.info("Returning mark criteria.")
         return {
             "internal": criteria.get("internal", 30),
             "external": criteria.get("external", 70),
-            "formula": criteria.get("formula", "(internal * 0.3) + (external * 0.7)")
+            "formula": criteria.get("formula", "(internal * 0.3) + (external * 0.7)"),
+            **internal_rules_of(criteria)
         }
+
+    try:
+        return await conditional_json(request, student_db.collection.database, ["mark_criteria"], build, cache_body=True)
     except Exception as e:
         logger.error(f"Error retrieving mark criteria: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed to retrieve mark criteria: {str(e)}")
@@ -322,7 +345,12 @@ async def save_mark_criteria(
             raise HTTPException(status_code=400, detail="Internal and external must sum to 100.")
         if not ("internal" in criteria.formula and "external" in criteria.formula):
             raise HTTPException(status_code=400, detail="Formula must include 'internal' and 'external'.")
+        if criteria.fat_weight + criteria.assignment_weight != 100:
+            raise HTTPException(status_code=400, detail="FAT and assignment weights must sum to 100.")
 
+        db = student_db.collection.database
+        previous_rules = internal_rules_of(await db["mark_criteria"].find_one({}, {key: 1 for key in DEFAULT_INTERNAL_RULES}))
+        rules = {key: getattr(criteria, key) for key in DEFAULT_INTERNAL_RULES}
         update_result = await student_db.collection.database["mark_criteria"].update_one(
             {},
             {
@@ -330,11 +358,13 @@ async def save_mark_criteria(
                     "internal": criteria.internal,
                     "external": criteria.external,
                     "formula": criteria.formula,
+                    **rules,
                     "updated_at": date.today().isoformat()
                 }
             },
             upsert=True
         )
+        await bump_versions(student_db.collection.database, "mark_criteria")
 
         if update_result.upserted_id:
             logger.info(f"Mark criteria created with ID: {update_result.upserted_id}")
@@ -346,6 +376,11 @@ async def save_mark_criteria(
             logger.info("Mark criteria unchanged.")
             status_message = "Mark criteria unchanged."
 
+        if rules != previous_rules:
+            # Stored internal scores were aggregated under the old rules
+            job_id = await enqueue(db, "internal_marks.recompute", {})
+            logger.info(f"Internal score rules changed from {previous_rules} to {rules}; recompute job {job_id}")
+            return {"status": status_message, "recompute_job_id": job_id}
         return {"status": status_message}
     except HTTPException as e:
         raise e
@@ -0,0 +1,126 @@
+from fastapi import APIRouter, Depends, HTTPException, Request, Query
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from typing import Dict, Any, List, Optional, Awaitable
+from database import StudentDB, DepartmentDB, SubjectDB
+from dependencies import get_db, get_current_user
+from cache import conditional_json, cached_reference
+from projections import DEFAULT_PROJECTION, SUBJECT_SUMMARY_FIELDS
+from admin.Teachers import sanitize_teacher_data
+from assessment import DEFAULT_INTERNAL_RULES
+from filters import assignment_scope, scoped_query
+import asyncio
+import logging
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+DEFAULT_MARK_CRITERIA = {"internal": 30, "external": 70, "formula": "(internal * 0.3) + (external * 0.7)", **DEFAULT_INTERNAL_RULES}
+
+async def load_departments(db: AsyncIOMotorDatabase) -> List[Dict[str, Any]]:
+    return await DepartmentDB(db).get_departments()
+
+async def load_subjects(db: AsyncIOMotorDatabase) -> List[Dict[str, Any]]:
+    return await SubjectDB(db).get_subjects()
+
+async def load_mark_criteria(db: AsyncIOMotorDatabase) -> Dict[str, Any]:
+    criteria = await db["mark_criteria"].find_one({}) or {}
+    return {key: criteria.get(key, default) for key, default in DEFAULT_MARK_CRITERIA.items()}
+
+async def load_teachers(db: AsyncIOMotorDatabase) -> List[Dict[str, Any]]:
+    subjects, departments, teachers = await asyncio.gather(
+        db["db.subjects"].find({}, SUBJECT_SUMMARY_FIELDS).to_list(length=None),
+        db["db.departments"].find({}, {"shortName": 1}).to_list(length=None),
+        db["db.teachers"].find({}, DEFAULT_PROJECTION).to_list(length=None)
+    )
+    return [sanitize_teacher_data(teacher, subjects, departments) for teacher in teachers]
+
+async def load_students(db: AsyncIOMotorDatabase, query: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+    departments, students = await asyncio.gather(
+        db["db.departments"].find({}, {"name": 1, "shortName": 1}).to_list(length=None),
+        StudentDB(db).get_students(query)
+    )
+    names = {str(dept["_id"]): dept.get("name", dept.get("shortName", "N/A")) for dept in departments}
+    for student in students:
+        student["department"] = names.get(student.get("department"), student.get("department") or "N/A")
+    return students
+
+# Section name -> (collections it is built from, loader, roles allowed, kept in the reference cache)
+SECTIONS: Dict[str, tuple] = {
+    "departments": (["db.departments"], load_departments, {"admin", "teacher", "student"}, True),
+    "subjects": (["db.subjects"], load_subjects, {"admin", "teacher", "student"}, True),
+    "mark_criteria": (["mark_criteria"], load_mark_criteria, {"admin", "teacher", "student"}, True),
+    "teachers": (["db.teachers", "db.subjects", "db.departments"], load_teachers, {"admin"}, True),
+    # The student list is large and changes often; it is built per request rather than held per worker,
+    # and teachers only get the students of their classes
+    "students": (["students", "db.departments", "db.subjects"], load_students, {"admin", "teacher"}, False),
+}
+
+# What each page requests on first load
+PAGES: Dict[str, List[str]] = {
+    "admin-sat-score": ["students", "mark_criteria", "departments"],
+    "admin-teachers": ["teachers", "departments"],
+    "admin-assign-teachers": ["teachers", "departments", "subjects"],
+    "admin-subjects": ["departments", "subjects"],
+    "teacher-internal-marks": ["students", "subjects"],
+    "teacher-sat-marks": ["subjects"],
+}
+
+def load_section(db: AsyncIOMotorDatabase, name: str, query: Dict[str, Any]) -> Awaitable[Any]:
+    """``query`` narrows the sections built per request to what the caller may see."""
+    collections, load, _, shared = SECTIONS[name]
+    if shared:
+        return cached_reference(db, name, collections, lambda: load(db))
+    return load(db, query)
+
+@router.get("/bootstrap", response_model=Dict[str, Any])
+async def get_bootstrap(
+    request: Request,
+    page: Optional[str] = Query(None, description=f"One of: {', '.join(PAGES)}"),
+    include: Optional[str] = Query(None, description=f"Comma-separated sections: {', '.join(SECTIONS)}"),
+    db: AsyncIOMotorDatabase = Depends(get_db),
+    user: Dict[str, Any] = Depends(get_current_user)
+):
+    """The reference data a page needs on first load, in one response with one ETag."""
+    try:
+        if page and page not in PAGES:
+            raise HTTPException(status_code=400, detail=f"Unknown page: {page}")
+        sections = list(PAGES.get(page, []))
+        for name in (part.strip() for part in (include or "").split(",")):
+            if not name:
+                continue
+            if name not in SECTIONS:
+                raise HTTPException(status_code=400, detail=f"Unknown section: {name}")
+            if name not in sections:
+                sections.append(name)
+        if not sections:
+            raise HTTPException(status_code=400, detail="Specify a page or the sections to include")
+        forbidden = [name for name in sections if user["role"] not in SECTIONS[name][2]]
+        if forbidden:
+            raise HTTPException(status_code=403, detail=f"Not allowed to load: {', '.join(forbidden)}")
+
+        # Teachers are scoped to the rosters of their subjectsHandled, as in the marks listings
+        assignments = await assignment_scope(db, user) if "students" in sections else None
+        query = await scoped_query(db, {}, assignments)
+
+        async def build():
+            payloads = await asyncio.gather(*(load_section(db, name, query) for name in sections))
+            logger.info(f"Bootstrap bundle for {page or include}: {', '.join(sections)}")
+            return dict(zip(sections, payloads))
+
+        collections = sorted({collection for name in sections for collection in SECTIONS[name][0]} | ({"db.teachers"} if assignments is not None else set()))
+        return await conditional_json(
+            request,
+            db,
+            collections,
+            build,
+            cache_body=all(SECTIONS[name][3] for name in sections),
+            scope=user["id"] if assignments is not None else ""
+        )
+    except HTTPException as e:
+        raise e
+    except Exception as e:
+        logger.error(f"Error building bootstrap bundle for {page or include}: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
@@ -1,7 +1,6 @@
 from fastapi import APIRouter, Depends, HTTPException
 from motor.motor_asyncio import AsyncIOMotorDatabase
-from dependencies import get_db, get_student_db, get_department_db, get_subject_db
-from database import StudentDB, DepartmentDB, SubjectDB
+from dependencies import get_read_db
 import logging
 
 # Set up logging
@@ -12,10 +11,7 @@ router = APIRouter()
 
 @router.get("/admin/stats")
 async def get_admin_stats(
-    student_db: StudentDB = Depends(get_student_db),
-    department_db: DepartmentDB = Depends(get_department_db),
-    subject_db: SubjectDB = Depends(get_subject_db),
-    db: AsyncIOMotorDatabase = Depends(get_db)
+    db: AsyncIOMotorDatabase = Depends(get_read_db("admin.stats"))
 ):
     """
     Fetch statistics for the admin dashboard, including total teachers, students, subjects, and departments.
@@ -27,15 +23,15 @@ async def get_admin_stats(
         logger.debug(f"Total teachers: {total_teachers}")
 
         # Count total students
-        total_students = await student_db.collection.count_documents({})
+        total_students = await db["students"].count_documents({})
         logger.debug(f"Total students: {total_students}")
 
         # Count total subjects
-        total_subjects = await subject_db.collection.count_documents({})
+        total_subjects = await db["db.subjects"].count_documents({})
         logger.debug(f"Total subjects: {total_subjects}")
 
         # Count total departments
-        total_departments = await department_db.collection.count_documents({})
+        total_departments = await db["db.departments"].count_documents({})
         logger.debug(f"Total departments: {total_departments}")
 
         # Prepare response
@@ -1,8 +1,10 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request, Query
 from pydantic import BaseModel
 from typing import Dict, Any, List
 from database import DepartmentDB, SubjectDB
-from dependencies import get_department_db, get_subject_db
+from dependencies import get_department_db, get_subject_db, require_admin
+from cache import conditional_json
+from counters import reconcile_department_counters
 import logging
 
 # Set up logging
@@ -27,7 +29,7 @@ class Subject(BaseModel):
     credits: int
     totalClasses: int
 
-@router.post("/departments", response_model=Dict[str, Any])
+@router.post("/departments", response_model=Dict[str, Any], dependencies=[Depends(require_admin)])
 async def create_department(department: Department, department_db: DepartmentDB = Depends(get_department_db)):
     try:
         result = await department_db.create_department(department)
@@ -38,11 +40,14 @@ async def create_department(department: Department, department_db: DepartmentDB
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/departments", response_model=List[Dict[str, Any]])
-async def get_departments(department_db: DepartmentDB = Depends(get_department_db)):
-    try:
+async def get_departments(request: Request, department_db: DepartmentDB = Depends(get_department_db)):
+    async def build():
         departments = await department_db.get_departments()
         logger.info(f"Retrieved {len(departments)} departments via API")
         return departments
+
+    try:
+        return await conditional_json(request, department_db.collection.database, ["db.departments"], build, cache_body=True)
     except Exception as e:
         logger.error(f"Error in get_departments: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -63,7 +68,7 @@ async def get_department(id: str, department_db: DepartmentDB = Depends(get_depa
         logger.error(f"Unexpected error in get_department: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.put("/departments/{id}", response_model=Dict[str, Any])
+@router.put("/departments/{id}", response_model=Dict[str, Any], dependencies=[Depends(require_admin)])
 async def update_department(id: str, department: Department, department_db: DepartmentDB = Depends(get_department_db)):
     try:
         result = await department_db.update_department(id, department)
@@ -73,7 +78,7 @@ async def update_department(id: str, department: Department, department_db: Depa
         logger.error(f"Error in update_department: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.delete("/departments/{id}", response_model=Dict[str, Any])
+@router.delete("/departments/{id}", response_model=Dict[str, Any], dependencies=[Depends(require_admin)])
 async def delete_department(id: str, department_db: DepartmentDB = Depends(get_department_db)):
     try:
         result = await department_db.delete_department(id)
@@ -83,7 +88,21 @@ async def delete_department(id: str, department_db: DepartmentDB = Depends(get_d
         logger.error(f"Error in delete_department: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.post("/subjects", response_model=Dict[str, Any])
+@router.post("/departments/reconcile", response_model=Dict[str, Any], dependencies=[Depends(require_admin)])
+async def reconcile_departments(
+    dry_run: bool = Query(False, description="Report drift without fixing it"),
+    department_db: DepartmentDB = Depends(get_department_db)
+):
+    """Recompute totalStudents and totalTeachers from the students and teachers collections."""
+    try:
+        report = await reconcile_department_counters(department_db.collection.database, dry_run=dry_run)
+        logger.info(f"Reconciled department counters: {report['drifted']} drifted, {report['fixed']} fixed")
+        return report
+    except Exception as e:
+        logger.error(f"Error in reconcile_departments: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/subjects", response_model=Dict[str, Any], dependencies=[Depends(require_admin)])
 async def create_subject(subject: Subject, subject_db: SubjectDB = Depends(get_subject_db)):
     try:
         result = await subject_db.create_subject(subject)
@@ -94,11 +113,14 @@ async def create_subject(subject: Subject, subject_db: SubjectDB = Depends(get_s
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/subjects", response_model=List[Dict[str, Any]])
-async def get_subjects(subject_db: SubjectDB = Depends(get_subject_db)):
-    try:
+async def get_subjects(request: Request, subject_db: SubjectDB = Depends(get_subject_db)):
+    async def build():
         subjects = await subject_db.get_subjects()
         logger.info(f"Retrieved {len(subjects)} subjects via API")
         return subjects
+
+    try:
+        return await conditional_json(request, subject_db.collection.database, ["db.subjects"], build, cache_body=True)
     except Exception as e:
         logger.error(f"Error in get_subjects: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -119,7 +141,7 @@ async def get_subject(id: str, subject_db: SubjectDB = Depends(get_subject_db)):
         logger.error(f"Unexpected error in get_subject: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.put("/subjects/{id}", response_model=Dict[str, Any])
+@router.put("/subjects/{id}", response_model=Dict[str, Any], dependencies=[Depends(require_admin)])
 async def update_subject(id: str, subject: Subject, subject_db: SubjectDB = Depends(get_subject_db)):
     try:
         result = await subject_db.update_subject(id, subject)
@@ -129,7 +151,7 @@ async def update_subject(id: str, subject: Subject, subject_db: SubjectDB = Depe
         logger.error(f"Error in update_subject: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.delete("/subjects/{id}", response_model=Dict[str, Any])
+@router.delete("/subjects/{id}", response_model=Dict[str, Any], dependencies=[Depends(require_admin)])
 async def delete_subject(id: str, subject_db: SubjectDB = Depends(get_subject_db)):
     try:
         result = await subject_db.delete_subject(id)
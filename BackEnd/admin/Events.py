@@ -0,0 +1,85 @@
+from fastapi import APIRouter, Depends, HTTPException, Request, Query, Header
+from fastapi.responses import StreamingResponse
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from typing import Optional, AsyncIterator
+from bson import ObjectId
+from dependencies import get_db
+from events import marks_events, format_event
+import asyncio
+import logging
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+# A comment line this often keeps proxies from closing an idle stream
+HEARTBEAT_SECONDS = 15.0
+# How long EventSource waits before reconnecting, in milliseconds
+RECONNECT_MS = 3000
+
+@router.get("/events/marks")
+async def stream_marks_events(
+    request: Request,
+    subject_id: Optional[str] = Query(None, description="Only events of this subject"),
+    section: Optional[str] = Query(None, description="Only events of this section"),
+    last_event_id: Optional[str] = Header(None, alias="Last-Event-ID"),
+    db: AsyncIOMotorDatabase = Depends(get_db)
+):
+    """
+    Server-sent events as teachers save and submit marks: ``internal_marks.saved``
+    and ``sat_marks.saved`` (subject, section, saved and conflicting entries)
+    and ``sat_marks.submitted`` (subject, students locked). A ``resync`` event
+    means events were missed and the listings should be re-fetched.
+
+    The stream needs the bearer token like every other endpoint, so browsers
+    read it with fetch rather than EventSource, which cannot send headers.
+    """
+    try:
+        if subject_id and not ObjectId.is_valid(subject_id):
+            raise HTTPException(status_code=400, detail=f"Invalid subject_id: {subject_id}")
+        subscriber = marks_events.subscribe(db.name, subject_id, section)
+        if subscriber is None:
+            raise HTTPException(status_code=503, detail="Too many live connections; try again later", headers={"Retry-After": "30"})
+        # Subscribed before the replay is read, so nothing falls between the two
+        try:
+            missed = await marks_events.bus.replay(db.name, last_event_id) if last_event_id and marks_events.bus else []
+        except Exception:
+            marks_events.unsubscribe(subscriber)
+            raise
+    except HTTPException as e:
+        raise e
+    except Exception as e:
+        logger.error(f"Error opening marks event stream: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+    async def stream() -> AsyncIterator[str]:
+        replayed = set()
+        try:
+            yield f"retry: {RECONNECT_MS}\n\n"
+            for event in missed:
+                if subscriber.matches(event):
+                    replayed.add(event.get("id"))
+                    yield format_event(event)
+            while True:
+                try:
+                    event = await asyncio.wait_for(subscriber.queue.get(), HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        break
+                    yield ": keep-alive\n\n"
+                    continue
+                if event is None:
+                    break
+                if event.get("id") in replayed:
+                    continue
+                yield format_event(event)
+        finally:
+            marks_events.unsubscribe(subscriber)
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
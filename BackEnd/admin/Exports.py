@@ -0,0 +1,53 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from typing import Dict, Any, Optional, Literal
+from bson import ObjectId
+from dependencies import get_read_db, get_current_user
+from exports import ExportFilters, EXPORT_FORMATS, export_rows
+from jobs import enqueue, accepted
+import logging
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+@router.get("/exports/marks")
+async def export_marks(
+    format: Literal["csv", "xlsx"] = Query("csv"),
+    department: Optional[str] = Query(None, description="Department id"),
+    subject: Optional[str] = Query(None, description="Subject id"),
+    section: Optional[str] = Query(None),
+    academic_year: Optional[str] = Query(None),
+    background: bool = Query(False, description="Queue the export and return 202 with a job whose result points at the file"),
+    db: AsyncIOMotorDatabase = Depends(get_read_db("exports.marks")),
+    user: Dict[str, Any] = Depends(get_current_user)
+):
+    """
+    Internal, SAT and final marks, one row per student and subject, streamed
+    straight from the students cursor as CSV or XLSX. With ``background`` the
+    file is built by a job and downloaded from /api/jobs/{id}/file.
+    """
+    try:
+        for label, value in [("department", department), ("subject", subject)]:
+            if value and not ObjectId.is_valid(value):
+                raise HTTPException(status_code=400, detail=f"Invalid {label} id: {value}")
+        filters = ExportFilters(department=department, subject=subject, section=section, academic_year=academic_year)
+        if background:
+            params = {"format": format, "department": department, "subject": subject, "section": section, "academic_year": academic_year}
+            job_id = await enqueue(db, "marks.export", params, owner=user)
+            return accepted(job_id)
+        media_type, stream = EXPORT_FORMATS[format]
+        logger.info(f"Exporting marks as {format} with filters {filters.student_query()}")
+        return StreamingResponse(
+            stream(export_rows(db, filters)),
+            media_type=media_type,
+            headers={"Content-Disposition": f'attachment; filename="{filters.filename(format)}"'}
+        )
+    except HTTPException as e:
+        raise e
+    except Exception as e:
+        logger.error(f"Error exporting marks: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
@@ -0,0 +1,92 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from typing import List, Dict, Any, Optional
+from bson import ObjectId
+from dependencies import get_db, get_current_user
+from gridfs.errors import NoFile
+from jobs import JOBS_COLLECTION, SUCCEEDED, get_job, job_to_dict, open_job_file, read_job_file
+import logging
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+def can_view(job: Dict[str, Any], user: Dict[str, Any]) -> bool:
+    return user["role"] == "admin" or job.get("owner", {}).get("id") == user["id"]
+
+@router.get("/jobs/{job_id}", response_model=Dict[str, Any])
+async def get_job_status(
+    job_id: str,
+    db: AsyncIOMotorDatabase = Depends(get_db),
+    user: Dict[str, Any] = Depends(get_current_user)
+):
+    """Poll a background job: status, progress percentage and, once finished, its result."""
+    try:
+        if not ObjectId.is_valid(job_id):
+            raise HTTPException(status_code=400, detail=f"Invalid job id: {job_id}")
+        job = await get_job(db, job_id)
+        if not job or not can_view(job, user):
+            raise HTTPException(status_code=404, detail="Job not found")
+        return job_to_dict(job)
+    except HTTPException as e:
+        raise e
+    except Exception as e:
+        logger.error(f"Error fetching job {job_id}: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/jobs/{job_id}/file")
+async def download_job_file(
+    job_id: str,
+    db: AsyncIOMotorDatabase = Depends(get_db),
+    user: Dict[str, Any] = Depends(get_current_user)
+):
+    """The file a finished job produced (an export or a report archive), as pointed at by its result."""
+    try:
+        if not ObjectId.is_valid(job_id):
+            raise HTTPException(status_code=400, detail=f"Invalid job id: {job_id}")
+        job = await get_job(db, job_id)
+        if not job or not can_view(job, user):
+            raise HTTPException(status_code=404, detail="Job not found")
+        result = job.get("result") or {}
+        if job.get("status") != SUCCEEDED:
+            raise HTTPException(status_code=409, detail=f"Job is {job.get('status')}; poll /api/jobs/{job_id} until it succeeds")
+        if not result.get("file_id"):
+            raise HTTPException(status_code=404, detail="Job produced no file")
+        try:
+            download = await open_job_file(db, result["file_id"])
+        except NoFile:
+            raise HTTPException(status_code=410, detail="The file has expired; run the job again")
+        return StreamingResponse(
+            read_job_file(download),
+            media_type=result.get("media_type", "application/octet-stream"),
+            headers={
+                "Content-Disposition": f'attachment; filename="{result.get("filename", job_id)}"',
+                "Content-Length": str(download.length)
+            }
+        )
+    except HTTPException as e:
+        raise e
+    except Exception as e:
+        logger.error(f"Error downloading the file of job {job_id}: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/jobs", response_model=List[Dict[str, Any]])
+async def list_jobs(
+    status: Optional[str] = Query(None),
+    limit: int = Query(50, ge=1, le=500),
+    db: AsyncIOMotorDatabase = Depends(get_db),
+    user: Dict[str, Any] = Depends(get_current_user)
+):
+    """The caller's most recent jobs (all jobs for admins)."""
+    try:
+        query: Dict[str, Any] = {} if user["role"] == "admin" else {"owner.id": user["id"]}
+        if status:
+            query["status"] = status
+        jobs = await db[JOBS_COLLECTION].find(query, {"params": 0}).sort("created_at", -1).limit(limit).to_list(length=limit)
+        return [job_to_dict(job) for job in jobs]
+    except Exception as e:
+        logger.error(f"Error listing jobs: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
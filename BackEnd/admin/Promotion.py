@@ -0,0 +1,57 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pydantic import BaseModel, Field
+from typing import Dict, Any
+from bson import ObjectId
+from dependencies import get_db, get_current_user
+from jobs import enqueue, accepted
+from promotion import promote_cohort, next_term, FINAL_SEMESTER
+import logging
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+class PromotionRequest(BaseModel):
+    department: str
+    yearOfStudy: str
+    semester: str = Field(..., description="The semester the cohort is in now and is promoted out of")
+    dry_run: bool = Field(False, description="Return the diff without writing anything")
+
+@router.post("/promotions", response_model=Dict[str, Any])
+async def promote_students(
+    promotion: PromotionRequest,
+    background: bool = Query(False, description="Queue the promotion and return 202 with a job to poll"),
+    db: AsyncIOMotorDatabase = Depends(get_db),
+    user: Dict[str, Any] = Depends(get_current_user)
+):
+    """
+    Advance a department's year from ``semester`` to the next semester and
+    reassign its courses. Repeating the request promotes nobody: the cohort
+    is no longer in ``semester``.
+    """
+    try:
+        if not ObjectId.is_valid(promotion.department):
+            raise HTTPException(status_code=400, detail=f"Invalid department id: {promotion.department}")
+        department = await db["db.departments"].find_one({"_id": ObjectId(promotion.department)}, {"_id": 1})
+        if not department:
+            raise HTTPException(status_code=404, detail=f"Department {promotion.department} not found")
+        if next_term(promotion.semester) is None and promotion.semester != str(FINAL_SEMESTER):
+            raise HTTPException(status_code=400, detail=f"Invalid semester: {promotion.semester}")
+        if str((int(promotion.semester) + 1) // 2) != promotion.yearOfStudy:
+            raise HTTPException(status_code=400, detail=f"Semester {promotion.semester} is not in year {promotion.yearOfStudy}")
+
+        if background and not promotion.dry_run:
+            job_id = await enqueue(db, "students.promote", {"department": promotion.department, "yearOfStudy": promotion.yearOfStudy, "semester": promotion.semester}, owner=user)
+            return accepted(job_id)
+
+        summary = await promote_cohort(db, promotion.department, promotion.yearOfStudy, promotion.semester, dry_run=promotion.dry_run)
+        logger.info(f"{'Planned' if promotion.dry_run else 'Ran'} promotion of department {promotion.department}, year {promotion.yearOfStudy}, semester {promotion.semester}: {summary['promoted']} students")
+        return summary
+    except HTTPException as e:
+        raise e
+    except Exception as e:
+        logger.error(f"Error promoting department {promotion.department}, year {promotion.yearOfStudy}: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to promote students: {str(e)}")
@@ -0,0 +1,112 @@
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, Query
+from fastapi.responses import StreamingResponse
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from typing import Dict, Any, Optional
+from bson import ObjectId
+from dependencies import get_db, get_read_db, get_current_user, require_staff, require_admin
+from cache import etag_matches
+from reports import transcript_data, marks_sheet_data, department_archive, department_archive_name, render_document
+from jobs import enqueue, accepted
+import logging
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+def pdf_response(request: Request, key: str, document: bytes, filename: str) -> Response:
+    headers = {
+        "ETag": f'"{key}"',
+        "Cache-Control": "private, no-cache",
+        "Content-Disposition": f'inline; filename="{filename}"'
+    }
+    if etag_matches(request, f'"{key}"'):
+        return Response(status_code=304, headers=headers)
+    return Response(content=document, media_type="application/pdf", headers=headers)
+
+def validate_object_id(value: str, label: str) -> None:
+    if not ObjectId.is_valid(value):
+        raise HTTPException(status_code=400, detail=f"Invalid {label}: {value}")
+
+@router.get("/reports/transcripts/{student_id}")
+async def get_transcript(
+    student_id: str,
+    request: Request,
+    db: AsyncIOMotorDatabase = Depends(get_db),
+    user: Dict[str, Any] = Depends(get_current_user)
+):
+    """A student's transcript as PDF; students may only fetch their own."""
+    try:
+        validate_object_id(student_id, "student_id")
+        if user["role"] == "student" and user["id"] != student_id:
+            raise HTTPException(status_code=403, detail="Students may only view their own transcript")
+        data = await transcript_data(db, student_id)
+        if not data:
+            raise HTTPException(status_code=404, detail="Student not found")
+        key, document = await render_document("transcript", data)
+        return pdf_response(request, key, document, f"transcript-{data['student']['registrationNumber']}.pdf")
+    except HTTPException as e:
+        raise e
+    except Exception as e:
+        logger.error(f"Error generating transcript for {student_id}: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/reports/marks-sheets/{subject_id}", dependencies=[Depends(require_staff)])
+async def get_marks_sheet(
+    subject_id: str,
+    request: Request,
+    section: Optional[str] = Query(None),
+    batch: Optional[str] = Query(None, description="Year of joining"),
+    db: AsyncIOMotorDatabase = Depends(get_db)
+):
+    """The marks sheet of one subject, optionally limited to a section and batch, as PDF."""
+    try:
+        validate_object_id(subject_id, "subject_id")
+        data = await marks_sheet_data(db, subject_id, section=section, batch=batch)
+        if not data:
+            raise HTTPException(status_code=404, detail="Subject not found")
+        key, document = await render_document("marks_sheet", data)
+        suffix = "-".join(part for part in [section, batch] if part)
+        return pdf_response(request, key, document, f"marks-{data['subject']['code']}{'-' + suffix if suffix else ''}.pdf")
+    except HTTPException as e:
+        raise e
+    except Exception as e:
+        logger.error(f"Error generating marks sheet for {subject_id}: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/reports/departments/{department_id}", dependencies=[Depends(require_admin)])
+async def get_department_reports(
+    department_id: str,
+    yearOfStudy: Optional[str] = Query(None),
+    transcripts: bool = Query(True),
+    marks_sheets: bool = Query(False),
+    background: bool = Query(False, description="Queue the archive and return 202 with a job whose result points at the zip"),
+    db: AsyncIOMotorDatabase = Depends(get_read_db("reports.departments")),
+    user: Dict[str, Any] = Depends(get_current_user)
+):
+    """
+    Every transcript (and optionally marks sheet) of a department, streamed as
+    a zip while it renders. With ``background`` the zip is built by a job and
+    downloaded from /api/jobs/{id}/file.
+    """
+    try:
+        validate_object_id(department_id, "department_id")
+        filename = await department_archive_name(db, department_id, yearOfStudy)
+        if filename is None:
+            raise HTTPException(status_code=404, detail="Department not found")
+        if background:
+            params = {"department": department_id, "yearOfStudy": yearOfStudy, "transcripts": transcripts, "marks_sheets": marks_sheets}
+            job_id = await enqueue(db, "reports.department", params, owner=user)
+            return accepted(job_id)
+    except HTTPException as e:
+        raise e
+    except Exception as e:
+        logger.error(f"Error preparing reports for department {department_id}: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+    return StreamingResponse(
+        department_archive(db, department_id, yearOfStudy, transcripts, marks_sheets),
+        media_type="application/zip",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
@@ -0,0 +1,33 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from typing import Dict, Any, List, Literal
+from dependencies import get_db
+from search import search_students, search_teachers
+import asyncio
+import logging
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+@router.get("/search", response_model=Dict[str, List[Dict[str, Any]]])
+async def search(
+    q: str = Query(..., min_length=1, max_length=100),
+    type: Literal["all", "students", "teachers"] = Query("all"),
+    limit: int = Query(10, ge=1, le=50),
+    db: AsyncIOMotorDatabase = Depends(get_db)
+):
+    """Prefix autocomplete over names, registration numbers, teacher IDs and emails."""
+    try:
+        students, teachers = await asyncio.gather(
+            search_students(db, q, limit) if type in ("all", "students") else asyncio.sleep(0, result=[]),
+            search_teachers(db, q, limit) if type in ("all", "teachers") else asyncio.sleep(0, result=[])
+        )
+        return {"students": students, "teachers": teachers}
+    except HTTPException as e:
+        raise e
+    except Exception as e:
+        logger.error(f"Error searching for '{q}': {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
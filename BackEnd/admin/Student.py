@@ -1,9 +1,13 @@
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Body
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Body, Request
+from motor.motor_asyncio import AsyncIOMotorDatabase
 from pydantic import ValidationError
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, Union
 from database import StudentDB, DepartmentDB
 from AddStudentModel import AddStudentModel
-from dependencies import get_student_db, get_department_db
+from dependencies import get_student_db, get_department_db, get_read_db, require_admin
+from cache import conditional_json
+from filters import StudentFilters, facet_counts
+from projections import fields_param, parse_fields, DEPARTMENT_NAME_FIELDS
 from bson import ObjectId
 import logging
 import json
@@ -14,7 +18,7 @@ logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
-@router.post("/students", response_model=Dict[str, Any])
+@router.post("/students", response_model=Dict[str, Any], dependencies=[Depends(require_admin)])
 async def create_student(
     student: str = Body(...),
     file: Optional[UploadFile] = File(None),
@@ -41,7 +45,7 @@ async def create_student(
             raise HTTPException(status_code=400, detail=f"Invalid department ID format: {student_model.department}")
         
         logger.debug(f"Querying department with ID: {student_model.department}")
-        dept = await department_db.collection.find_one({'_id': dept_id})
+        dept = await department_db.collection.find_one({'_id': dept_id}, DEPARTMENT_NAME_FIELDS)
         if not dept:
             all_depts = []
             async for d in department_db.collection.find():
@@ -52,7 +56,7 @@ async def create_student(
         logger.info(f"Found department: {dept['name']}, shortName: {dept['shortName']}")
 
         file_content = await file.read() if file else None
-        registration_number = await student_db.generate_registration_number(str(student_model.yearOfJoining), student_model.department)
+        registration_number = await student_db.generate_registration_number(str(student_model.yearOfJoining), student_model.department, dept)
         result = await student_db.create_student(student_model, file_content, registration_number)
         return result
 
@@ -66,16 +70,24 @@ async def create_student(
         logger.error(f"Unexpected error in create_student: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.get("/students", response_model=List[Dict[str, Any]])
+@router.get("/students", response_model=Union[List[Dict[str, Any]], Dict[str, Any]])
 async def get_students(
-    student_db: StudentDB = Depends(get_student_db),
-    department_db: DepartmentDB = Depends(get_department_db)
+    request: Request,
+    filters: StudentFilters = Depends(),
+    fields: Optional[str] = Depends(fields_param),
+    db: AsyncIOMotorDatabase = Depends(get_read_db("students.list"))
 ):
-    try:
+    """Students matching the filters; with ``facets=true`` the list comes wrapped with per department, year and section counts."""
+    student_db = StudentDB(db)
+
+    async def build():
         students = []
-        all_depts = {str(d['_id']): d async for d in department_db.collection.find()}
+        all_depts = {str(d['_id']): d async for d in db["db.departments"].find({}, DEPARTMENT_NAME_FIELDS)}
         logger.info(f"Found {len(all_depts)} departments: {[str(k) + ':' + v.get('name', v.get('shortName', 'N/A')) for k, v in all_depts.items()]}")
-        for student in await student_db.get_students():
+        for student in await student_db.get_students(query, projection):
+            if "department" not in student:
+                students.append(student)
+                continue
             dept_id = student.get("department")
             dept = all_depts.get(dept_id)
             if dept:
@@ -85,20 +97,41 @@ async def get_students(
                 student["department"] = dept_id or "N/A"
             students.append(student)
         logger.info(f"Retrieved {len(students)} students via API")
+        if filters.facets:
+            return {"students": students, "facets": await facet_counts(db, filters)}
         return students
+
+    try:
+        query = await filters.query(db)
+        projection = parse_fields(fields)
+        return await conditional_json(
+            request,
+            db,
+            ["students", "db.departments", "db.subjects"],
+            build
+        )
+    except HTTPException as e:
+        raise e
     except Exception as e:
         logger.error(f"Error in get_students: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/students/{id}", response_model=Dict[str, Any])
-async def get_student(id: str, student_db: StudentDB = Depends(get_student_db), department_db: DepartmentDB = Depends(get_department_db)):
+async def get_student(
+    id: str,
+    fields: Optional[str] = Depends(fields_param),
+    student_db: StudentDB = Depends(get_student_db),
+    department_db: DepartmentDB = Depends(get_department_db)
+):
     try:
-        student = await student_db.get_student(id)
+        student = await student_db.get_student(id, parse_fields(fields))
         if not student:
             logger.warning(f"Student not found for ID: {id}")
             raise HTTPException(status_code=404, detail="Student not found")
+        if "department" not in student:
+            return student
         dept_id = student.get("department")
-        dept = await department_db.collection.find_one({"_id": ObjectId(dept_id)})
+        dept = await department_db.collection.find_one({"_id": ObjectId(dept_id)}, DEPARTMENT_NAME_FIELDS)
         if dept:
             student["department"] = dept.get("name", dept.get("shortName", dept_id))
         else:
@@ -113,7 +146,7 @@ async def get_student(id: str, student_db: StudentDB = Depends(get_student_db),
         logger.error(f"Unexpected error in get_student: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.put("/students/{id}", response_model=Dict[str, Any])
+@router.put("/students/{id}", response_model=Dict[str, Any], dependencies=[Depends(require_admin)])
 async def update_student(
     id: str,
     student: AddStudentModel,
@@ -122,7 +155,7 @@ async def update_student(
 ):
     try:
         logger.debug(f"Querying department with ID: {student.department}")
-        dept = await department_db.collection.find_one({'_id': ObjectId(student.department)})
+        dept = await department_db.collection.find_one({'_id': ObjectId(student.department)}, {'_id': 1})
         if not dept:
             all_depts = []
             async for d in department_db.collection.find():
@@ -132,7 +165,7 @@ async def update_student(
         
         result = await student_db.update_student(id, student)
         dept_id = result.get("department")
-        dept = await department_db.collection.find_one({"_id": ObjectId(dept_id)})
+        dept = await department_db.collection.find_one({"_id": ObjectId(dept_id)}, DEPARTMENT_NAME_FIELDS)
         if dept:
             result["department"] = dept.get("name", dept.get("shortName", dept_id))
         else:
@@ -147,7 +180,7 @@ async def update_student(
         logger.error(f"Unexpected error in update_student: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.delete("/students/{id}", response_model=Dict[str, Any])
+@router.delete("/students/{id}", response_model=Dict[str, Any], dependencies=[Depends(require_admin)])
 async def delete_student(id: str, student_db: StudentDB = Depends(get_student_db)):
     try:
         result = await student_db.delete_student(id)
@@ -160,7 +193,7 @@ async def delete_student(id: str, student_db: StudentDB = Depends(get_student_db
         logger.error(f"Unexpected error in delete_student: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.post("/students/{student_id}/courses/{course_id}", response_model=Dict[str, Any])
+@router.post("/students/{student_id}/courses/{course_id}", response_model=Dict[str, Any], dependencies=[Depends(require_admin)])
 async def assign_course(
     student_id: str,
     course_id: str,
@@ -170,7 +203,7 @@ async def assign_course(
     try:
         result = await student_db.assign_course(student_id, course_id)
         dept_id = result.get("department")
-        dept = await department_db.collection.find_one({"_id": ObjectId(dept_id)})
+        dept = await department_db.collection.find_one({"_id": ObjectId(dept_id)}, DEPARTMENT_NAME_FIELDS)
         if dept:
             result["department"] = dept.get("name", dept.get("shortName", dept_id))
         else:
@@ -185,7 +218,7 @@ async def assign_course(
         logger.error(f"Unexpected error in assign_course: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.delete("/students/{student_id}/courses/{course_id}", response_model=Dict[str, Any])
+@router.delete("/students/{student_id}/courses/{course_id}", response_model=Dict[str, Any], dependencies=[Depends(require_admin)])
 async def remove_course(
     student_id: str,
     course_id: str,
@@ -195,7 +228,7 @@ async def remove_course(
     try:
         result = await student_db.remove_course(student_id, course_id)
         dept_id = result.get("department")
-        dept = await department_db.collection.find_one({"_id": ObjectId(dept_id)})
+        dept = await department_db.collection.find_one({"_id": ObjectId(dept_id)}, DEPARTMENT_NAME_FIELDS)
         if dept:
             result["department"] = dept.get("name", dept.get("shortName", dept_id))
         else:
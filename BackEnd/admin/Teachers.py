@@ -4,6 +4,10 @@ from typing import List, Dict, Any, Optional
 from bson import ObjectId
 from database import StudentDB, DepartmentDB, SubjectDB
 from dependencies import get_student_db, get_department_db, get_subject_db
+from cache import bump_versions
+from counters import move_department_counter
+from search import teacher_search_keys, SEARCH_KEYS_FIELD
+from projections import DEFAULT_PROJECTION, SUBJECT_SUMMARY_FIELDS, fields_param, parse_fields
 import logging
 from datetime import date
 from pydantic import BaseModel
@@ -61,6 +65,8 @@ def sanitize_teacher_data(teacher: Dict[str, Any], subjects: List[Dict[str, Any]
     for key, value in teacher.items():
         if key == "_id":
             sanitized["id"] = str(value)
+        elif key == SEARCH_KEYS_FIELD:
+            continue
         elif key == "department":
             dept = next((d for d in departments if str(d["_id"]) == str(value)), None)
             sanitized[key] = dept.get("shortName", str(value)) if dept else str(value)
@@ -121,19 +127,21 @@ async def create_teacher(
             }
             for assignment in teacher.subjectsHandled
         ]
+        teacher_data[SEARCH_KEYS_FIELD] = teacher_search_keys(teacher_data)
 
         result = await student_db.collection.database["db.teachers"].insert_one(teacher_data)
-        inserted_teacher = await student_db.collection.database["db.teachers"].find_one({"_id": result.inserted_id})
+        inserted_teacher = await student_db.collection.database["db.teachers"].find_one({"_id": result.inserted_id}, DEFAULT_PROJECTION)
 
         # Update department's totalTeachers
         await department_db.collection.update_one(
             {"_id": dept_id},
             {"$inc": {"totalTeachers": 1}}
         )
+        await bump_versions(department_db.collection.database, "db.teachers", "db.departments")
 
         # Fetch all subjects and departments for sanitization
-        all_subjects = [s async for s in subject_db.collection.find()]
-        all_depts = [d async for d in department_db.collection.find()]
+        all_subjects = [s async for s in subject_db.collection.find({}, SUBJECT_SUMMARY_FIELDS)]
+        all_depts = [d async for d in department_db.collection.find({}, {"shortName": 1})]
         return sanitize_teacher_data(inserted_teacher, all_subjects, all_depts)
 
     except HTTPException as e:
@@ -144,17 +152,20 @@ async def create_teacher(
 
 @router.get("/teachers", response_model=List[Dict[str, Any]])
 async def get_teachers(
+    fields: Optional[str] = Depends(fields_param),
     student_db: StudentDB = Depends(get_student_db),
     subject_db: SubjectDB = Depends(get_subject_db),
     department_db: DepartmentDB = Depends(get_department_db)
 ):
     try:
         teachers = []
-        all_subjects = [s async for s in subject_db.collection.find()]
-        all_depts = [d async for d in department_db.collection.find()]
-        async for teacher in student_db.collection.database["db.teachers"].find():
+        all_subjects = [s async for s in subject_db.collection.find({}, SUBJECT_SUMMARY_FIELDS)]
+        all_depts = [d async for d in department_db.collection.find({}, {"shortName": 1})]
+        async for teacher in student_db.collection.database["db.teachers"].find({}, parse_fields(fields)):
             teachers.append(sanitize_teacher_data(teacher, all_subjects, all_depts))
         return teachers
+    except HTTPException as e:
+        raise e
     except Exception as e:
         logger.error(f"Error retrieving teachers: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -162,16 +173,17 @@ async def get_teachers(
 @router.get("/teachers/{teacher_id}", response_model=Dict[str, Any])
 async def get_teacher(
     teacher_id: str,
+    fields: Optional[str] = Depends(fields_param),
     student_db: StudentDB = Depends(get_student_db),
     subject_db: SubjectDB = Depends(get_subject_db),
     department_db: DepartmentDB = Depends(get_department_db)
 ):
     try:
-        teacher = await student_db.collection.database["db.teachers"].find_one({"_id": ObjectId(teacher_id)})
+        teacher = await student_db.collection.database["db.teachers"].find_one({"_id": ObjectId(teacher_id)}, parse_fields(fields))
         if not teacher:
             raise HTTPException(status_code=404, detail="Teacher not found")
-        all_subjects = [s async for s in subject_db.collection.find()]
-        all_depts = [d async for d in department_db.collection.find()]
+        all_subjects = [s async for s in subject_db.collection.find({}, SUBJECT_SUMMARY_FIELDS)]
+        all_depts = [d async for d in department_db.collection.find({}, {"shortName": 1})]
         return sanitize_teacher_data(teacher, all_subjects, all_depts)
     except HTTPException as e:
         raise e
@@ -214,6 +226,10 @@ async def update_teacher(
             }
             for assignment in teacher.subjectsHandled
         ]
+        existing = await student_db.collection.database["db.teachers"].find_one({"_id": ObjectId(teacher_id)}, {"teacherId": 1, "department": 1})
+        if not existing:
+            raise HTTPException(status_code=404, detail="Teacher not found")
+        teacher_data[SEARCH_KEYS_FIELD] = teacher_search_keys({**teacher_data, "teacherId": existing.get("teacherId")})
 
         result = await student_db.collection.database["db.teachers"].update_one(
             {"_id": ObjectId(teacher_id)},
@@ -221,10 +237,12 @@ async def update_teacher(
         )
         if result.matched_count == 0:
             raise HTTPException(status_code=404, detail="Teacher not found")
+        await move_department_counter(department_db.collection.database, "totalTeachers", existing.get("department"), dept_id)
+        await bump_versions(department_db.collection.database, "db.teachers")
 
-        updated_teacher = await student_db.collection.database["db.teachers"].find_one({"_id": ObjectId(teacher_id)})
-        all_subjects = [s async for s in subject_db.collection.find()]
-        all_depts = [d async for d in department_db.collection.find()]
+        updated_teacher = await student_db.collection.database["db.teachers"].find_one({"_id": ObjectId(teacher_id)}, DEFAULT_PROJECTION)
+        all_subjects = [s async for s in subject_db.collection.find({}, SUBJECT_SUMMARY_FIELDS)]
+        all_depts = [d async for d in department_db.collection.find({}, {"shortName": 1})]
         return sanitize_teacher_data(updated_teacher, all_subjects, all_depts)
 
     except HTTPException as e:
@@ -240,7 +258,7 @@ async def delete_teacher(
     department_db: DepartmentDB = Depends(get_department_db)
 ):
     try:
-        teacher = await student_db.collection.database["db.teachers"].find_one({"_id": ObjectId(teacher_id)})
+        teacher = await student_db.collection.database["db.teachers"].find_one({"_id": ObjectId(teacher_id)}, {"department": 1})
         if not teacher:
             raise HTTPException(status_code=404, detail="Teacher not found")
 
@@ -255,6 +273,7 @@ async def delete_teacher(
                 {"_id": ObjectId(dept_id)},
                 {"$inc": {"totalTeachers": -1}}
             )
+        await bump_versions(department_db.collection.database, "db.teachers", "db.departments")
 
         return {"id": teacher_id, "status": "deleted"}
     except HTTPException as e:
@@ -272,7 +291,7 @@ async def assign_teacher(
 ):
     try:
         # Validate teacher
-        teacher = await student_db.collection.database["db.teachers"].find_one({"_id": ObjectId(assignment.teacherId)})
+        teacher = await student_db.collection.database["db.teachers"].find_one({"_id": ObjectId(assignment.teacherId)}, {"_id": 1})
         if not teacher:
             raise HTTPException(status_code=404, detail="Teacher not found")
 
@@ -306,10 +325,11 @@ async def assign_teacher(
         )
         if result.matched_count == 0:
             raise HTTPException(status_code=404, detail="Teacher not found")
+        await bump_versions(department_db.collection.database, "db.teachers")
 
-        updated_teacher = await student_db.collection.database["db.teachers"].find_one({"_id": ObjectId(assignment.teacherId)})
-        all_subjects = [s async for s in subject_db.collection.find()]
-        all_depts = [d async for d in department_db.collection.find()]
+        updated_teacher = await student_db.collection.database["db.teachers"].find_one({"_id": ObjectId(assignment.teacherId)}, DEFAULT_PROJECTION)
+        all_subjects = [s async for s in subject_db.collection.find({}, SUBJECT_SUMMARY_FIELDS)]
+        all_depts = [d async for d in department_db.collection.find({}, {"shortName": 1})]
         return sanitize_teacher_data(updated_teacher, all_subjects, all_depts)
 
     except HTTPException as e:
@@ -328,12 +348,12 @@ async def unassign_subject(
 ):
     try:
         # Validate teacher
-        teacher = await student_db.collection.database["db.teachers"].find_one({"_id": ObjectId(teacher_id)})
+        teacher = await student_db.collection.database["db.teachers"].find_one({"_id": ObjectId(teacher_id)}, {"_id": 1})
         if not teacher:
             raise HTTPException(status_code=404, detail="Teacher not found")
 
         # Validate subject
-        subject = await subject_db.collection.find_one({"code": subject_code})
+        subject = await subject_db.collection.find_one({"code": subject_code}, {"_id": 1})
         if not subject:
             raise HTTPException(status_code=404, detail=f"Subject with code {subject_code} not found")
 
@@ -346,12 +366,13 @@ async def unassign_subject(
             raise HTTPException(status_code=404, detail="Teacher not found")
         if result.modified_count == 0:
             raise HTTPException(status_code=400, detail=f"Subject {subject_code} not assigned to teacher")
+        await bump_versions(department_db.collection.database, "db.teachers")
 
         # Fetch updated teacher
-        updated_teacher = await student_db.collection.database["db.teachers"].find_one({"_id": ObjectId(teacher_id)})
+        updated_teacher = await student_db.collection.database["db.teachers"].find_one({"_id": ObjectId(teacher_id)}, DEFAULT_PROJECTION)
         # Fetch all subjects and departments for sanitization
-        all_subjects = [s async for s in subject_db.collection.find()]
-        all_depts = [d async for d in department_db.collection.find()]
+        all_subjects = [s async for s in subject_db.collection.find({}, SUBJECT_SUMMARY_FIELDS)]
+        all_depts = [d async for d in department_db.collection.find({}, {"shortName": 1})]
         return sanitize_teacher_data(updated_teacher, all_subjects, all_depts)
 
     except HTTPException as e:
@@ -0,0 +1,142 @@
+from motor.motor_asyncio import AsyncIOMotorDatabase, AsyncIOMotorCollection
+from pymongo import UpdateOne
+from bson import ObjectId
+from typing import Dict, Any, List, Optional, Callable, Awaitable
+import logging
+from cache import bump_versions, cached_reference
+from optimistic import version_filter, current_version
+from results import refresh_results
+from jobs import job_handler, enqueue_once, JobContext
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Stored next to fat1-3 and assignments in internal_marks.<subject_id>
+INTERNAL_SCORE_FIELD = "internal"
+RECOMPUTE_BATCH_SIZE = 500
+
+# How the internal score is aggregated; kept in the mark_criteria document and edited with POST /mark-criteria
+DEFAULT_INTERNAL_RULES = {"fat_best_of": 2, "fat_weight": 70, "assignment_weight": 30}
+
+def _numbers(values: List[Any]) -> List[float]:
+    return [float(value) for value in values if isinstance(value, (int, float)) and not isinstance(value, bool)]
+
+def internal_rules_of(criteria: Optional[Dict[str, Any]]) -> Dict[str, int]:
+    criteria = criteria or {}
+    return {key: int(criteria.get(key, default)) for key, default in DEFAULT_INTERNAL_RULES.items()}
+
+async def get_internal_rules(db: AsyncIOMotorDatabase) -> Dict[str, int]:
+    async def load() -> Dict[str, int]:
+        return internal_rules_of(await db["mark_criteria"].find_one({}, {key: 1 for key in DEFAULT_INTERNAL_RULES}))
+    return await cached_reference(db, "internal_rules", ["mark_criteria"], load)
+
+def aggregate_internal(entry: Optional[Dict[str, Any]], rules: Dict[str, int]) -> Optional[float]:
+    """
+    The internal score of one internal_marks entry on the 0-100 scale marks are
+    entered in: the mean of the best ``fat_best_of`` FATs and the assignment
+    average, weighted by ``fat_weight`` and ``assignment_weight``. A component
+    with nothing recorded yet is left out and the other carries its weight.
+    """
+    entry = entry or {}
+    fats = sorted(_numbers([entry.get("fat1"), entry.get("fat2"), entry.get("fat3")]), reverse=True)[:max(1, rules["fat_best_of"])]
+    assignments = _numbers(entry.get("assignments", []) or [])
+    parts = []
+    if fats:
+        parts.append((sum(fats) / len(fats), rules["fat_weight"]))
+    if assignments:
+        parts.append((sum(assignments) / len(assignments), rules["assignment_weight"]))
+    weight = sum(part_weight for _, part_weight in parts)
+    if not weight:
+        return None
+    return round(sum(value * part_weight for value, part_weight in parts) / weight, 1)
+
+async def store_internal_score(
+    collection: AsyncIOMotorCollection,
+    student_oid: ObjectId,
+    subject_id: str,
+    entry: Dict[str, Any],
+    rules: Dict[str, int]
+) -> Optional[float]:
+    """
+    Write the aggregate of an entry just saved. The score is derived data, so it
+    does not bump the entry's version; it is only written while the entry is
+    still at the version it was computed from, so a later save always wins.
+    """
+    score = aggregate_internal(entry, rules)
+    await collection.update_one(
+        {"_id": student_oid, **version_filter("internal_marks", subject_id, current_version(entry))},
+        {"$set": {f"internal_marks.{subject_id}.{INTERNAL_SCORE_FIELD}": score}}
+    )
+    return score
+
+async def recompute_internal_scores(
+    db: AsyncIOMotorDatabase,
+    missing_only: bool = False,
+    progress: Optional[Callable[[float, Optional[str]], Awaitable[None]]] = None
+) -> int:
+    """
+    Re-aggregate stored internal scores in bulk: every entry after the rules
+    change, or with ``missing_only`` the entries saved before scores were stored.
+    """
+    rules = await get_internal_rules(db)
+    total = await db["students"].count_documents({"internal_marks": {"$exists": True}})
+    seen = 0
+    updated = 0
+    operations: List[UpdateOne] = []
+    changed_students = set()
+
+    async def flush():
+        nonlocal updated, operations
+        if operations:
+            result = await db["students"].bulk_write(operations, ordered=False)
+            updated += result.modified_count
+            operations = []
+        if changed_students:
+            await refresh_results(db, changed_students)
+            changed_students.clear()
+
+    async for student in db["students"].find({"internal_marks": {"$exists": True}}, {"internal_marks": 1}):
+        seen += 1
+        for subject_id, entry in (student.get("internal_marks") or {}).items():
+            if not isinstance(entry, dict) or (missing_only and INTERNAL_SCORE_FIELD in entry):
+                continue
+            score = aggregate_internal(entry, rules)
+            if entry.get(INTERNAL_SCORE_FIELD, "missing") == score:
+                continue
+            operations.append(UpdateOne(
+                {"_id": student["_id"], **version_filter("internal_marks", subject_id, current_version(entry))},
+                {"$set": {f"internal_marks.{subject_id}.{INTERNAL_SCORE_FIELD}": score}}
+            ))
+            changed_students.add(student["_id"])
+        if len(operations) >= RECOMPUTE_BATCH_SIZE:
+            await flush()
+            if progress and total:
+                await progress(100.0 * seen / total, f"Recomputed {seen} of {total} students")
+    await flush()
+    if updated:
+        await bump_versions(db, "students")
+        logger.info(f"Recomputed {updated} internal scores with {rules}")
+    return updated
+
+async def backfill_internal_scores(db: AsyncIOMotorDatabase) -> None:
+    """
+    Store the internal score on entries saved before it was maintained on
+    write. The scan runs as a job enqueued once across all workers and
+    restarts; a change to the rules in POST /mark-criteria recomputes every
+    score anyway.
+    """
+    try:
+        await enqueue_once(db, "internal_marks.backfill")
+    except Exception as e:
+        logger.error(f"Failed to enqueue the internal score backfill: {str(e)}")
+
+@job_handler("internal_marks.backfill")
+async def run_backfill_internal_scores_job(job: JobContext) -> Dict[str, Any]:
+    updated_count = await recompute_internal_scores(job.db, missing_only=True, progress=job.progress)
+    return {"updated_count": updated_count}
+
+@job_handler("internal_marks.recompute")
+async def run_recompute_internal_scores_job(job: JobContext) -> Dict[str, Any]:
+    updated_count = await recompute_internal_scores(job.db, progress=job.progress)
+    return {"updated_count": updated_count}
@@ -1,10 +1,15 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
 from pydantic import BaseModel, Field
 from typing import Dict, Any, Optional
 from bson import ObjectId
 from database import StudentDB, Database
-from dependencies import get_student_db, get_db
+from dependencies import get_student_db, get_db, get_current_user, require_admin
+from auth.security import create_token, hash_password, verify_password
+from auth.throttle import login_throttle
+from tenants import tenant_of
+import hmac
 import logging
+import os
 from datetime import datetime
 
 # Set up logging
@@ -13,6 +18,12 @@ logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+ADMIN_EMAIL = "admin@gmail.com"
+ADMIN_PASSWORD = "123456"
+DEFAULT_PASSWORD = "123456"
+# Only trust X-Forwarded-For when the API sits behind our own reverse proxy
+TRUST_FORWARDED_FOR = os.getenv("LOGIN_TRUST_FORWARDED_FOR", "false").lower() == "true"
+
 class LoginRequest(BaseModel):
     role: str = Field(..., pattern="^(admin|teacher|student)$")
     email: Optional[str] = None  # For admin
@@ -32,6 +43,8 @@ class LoginResponse(BaseModel):
     fullName: Optional[str] = None
     email: Optional[str] = None
     requiresPasswordChange: bool = False
+    access_token: str
+    token_type: str = "bearer"
 
 def is_valid_object_id(oid: str) -> bool:
     """Check if the string is a valid MongoDB ObjectId."""
@@ -41,23 +54,50 @@ def is_valid_object_id(oid: str) -> bool:
     except Exception:
         return False
 
+def client_address(request: Request) -> str:
+    if TRUST_FORWARDED_FOR:
+        forwarded = request.headers.get("x-forwarded-for")
+        if forwarded:
+            return forwarded.split(",")[0].strip()
+    return request.client.host if request.client else "unknown"
+
+def account_key(login_data: LoginRequest, tenant: str) -> str:
+    identifier = login_data.email or login_data.teacherId or login_data.studentId or ""
+    return f"{tenant}:{login_data.role}:{identifier.strip().lower()}"
+
 @router.post("/login", response_model=LoginResponse)
 async def login(
     login_data: LoginRequest,
+    request: Request,
     student_db: StudentDB = Depends(get_student_db),
     db: Database = Depends(get_db)
 ):
-    logger.debug(f"Login attempt: role={login_data.role}, data={login_data.dict()}")
+    logger.debug(f"Login attempt: role={login_data.role}")
+    account = account_key(login_data, tenant_of(request))
     try:
+        # Reject throttled clients and accounts before touching the database
+        retry_after = login_throttle.check(client_address(request), account)
+        if retry_after is not None:
+            logger.warning(f"Login throttled: account={account}, client={client_address(request)}")
+            raise HTTPException(
+                status_code=429,
+                detail="Too many login attempts. Please try again later.",
+                headers={"Retry-After": str(retry_after)}
+            )
+
         if login_data.role == "admin":
-            if login_data.email != "admin@gmail.com" or login_data.password != "123456":
+            valid_email = hmac.compare_digest((login_data.email or "").encode("utf-8"), ADMIN_EMAIL.encode("utf-8"))
+            valid_password = hmac.compare_digest(login_data.password.encode("utf-8"), ADMIN_PASSWORD.encode("utf-8"))
+            if not (valid_email and valid_password):
                 logger.warning(f"Invalid admin credentials: email={login_data.email}")
                 raise HTTPException(status_code=401, detail="Invalid email or password")
+            login_throttle.record_success()
             return LoginResponse(
                 role="admin",
                 id="admin",
                 email=login_data.email,
-                requiresPasswordChange=False
+                requiresPasswordChange=False,
+                access_token=create_token("admin", "admin", login_data.email, tenant=tenant_of(request))
             )
 
         elif login_data.role == "teacher":
@@ -65,59 +105,83 @@ async def login(
                 raise HTTPException(status_code=400, detail="Teacher ID and name are required")
             
             teacher_collection = db.db["teachers"]
-            teacher = await teacher_collection.find_one({
-                "teacherId": login_data.teacherId,
-                "fullName": login_data.teacherName
-            })
+            teacher = await teacher_collection.find_one(
+                {"teacherId": login_data.teacherId, "fullName": login_data.teacherName},
+                {"password": 1, "requiresPasswordChange": 1}
+            )
             
             if not teacher:
                 logger.warning(f"Teacher not found: teacherId={login_data.teacherId}, fullName={login_data.teacherName}")
                 raise HTTPException(status_code=401, detail="Invalid teacher ID or name")
             
             teacher_id = str(teacher["_id"])
-            stored_password = teacher.get("password", "123456")  # Default password
+            stored_password = teacher.get("password", DEFAULT_PASSWORD)
             requires_password_change = teacher.get("requiresPasswordChange", True)
             
-            if login_data.password != stored_password:
+            matches, needs_rehash = await verify_password(login_data.password, stored_password)
+            if not matches:
                 logger.warning(f"Invalid password for teacher: teacherId={login_data.teacherId}")
                 raise HTTPException(status_code=401, detail="Invalid password")
+            if needs_rehash and "password" in teacher:
+                # Upgrade legacy plaintext passwords on first successful login
+                await teacher_collection.update_one(
+                    {"_id": teacher["_id"]},
+                    {"$set": {"password": await hash_password(login_data.password)}}
+                )
             
+            login_throttle.record_success()
             return LoginResponse(
                 role="teacher",
                 id=login_data.teacherId,
                 fullName=login_data.teacherName,
-                requiresPasswordChange=requires_password_change
+                requiresPasswordChange=requires_password_change,
+                access_token=create_token(teacher_id, "teacher", login_data.teacherId, login_data.teacherName, tenant=tenant_of(request))
             )
 
         elif login_data.role == "student":
             if not login_data.studentId:
                 raise HTTPException(status_code=400, detail="Student ID is required")
             
-            student = await student_db.collection.find_one({"registrationNumber": login_data.studentId})
+            student = await student_db.collection.find_one(
+                {"registrationNumber": login_data.studentId},
+                {"fullName": 1, "password": 1, "requiresPasswordChange": 1}
+            )
             
             if not student:
                 logger.warning(f"Student not found: registrationNumber={login_data.studentId}")
                 raise HTTPException(status_code=401, detail="Invalid student ID")
             
             student_id = str(student["_id"])
-            stored_password = student.get("password", "123456")  # Default password
+            stored_password = student.get("password", DEFAULT_PASSWORD)
             requires_password_change = student.get("requiresPasswordChange", True)
             
-            if login_data.password != stored_password:
+            matches, needs_rehash = await verify_password(login_data.password, stored_password)
+            if not matches:
                 logger.warning(f"Invalid password for student: registrationNumber={login_data.studentId}")
                 raise HTTPException(status_code=401, detail="Invalid password")
+            if needs_rehash and "password" in student:
+                # Upgrade legacy plaintext passwords on first successful login
+                await student_db.collection.update_one(
+                    {"_id": student["_id"]},
+                    {"$set": {"password": await hash_password(login_data.password)}}
+                )
             
+            full_name = student.get("fullName", "Unknown")
+            login_throttle.record_success()
             return LoginResponse(
                 role="student",
                 id=login_data.studentId,
-                fullName=student.get("fullName", "Unknown"),
-                requiresPasswordChange=requires_password_change
+                fullName=full_name,
+                requiresPasswordChange=requires_password_change,
+                access_token=create_token(student_id, "student", login_data.studentId, full_name, tenant=tenant_of(request))
             )
 
         else:
             raise HTTPException(status_code=400, detail="Invalid role")
 
     except HTTPException as e:
+        if e.status_code == 401:
+            login_throttle.record_failure(account)
         logger.error(f"Login error: {e.detail}")
         raise e
     except Exception as e:
@@ -128,13 +192,18 @@ async def login(
 async def change_password(
     password_data: ChangePasswordRequest,
     student_db: StudentDB = Depends(get_student_db),
-    db: Database = Depends(get_db)
+    db: Database = Depends(get_db),
+    user: Dict[str, Any] = Depends(get_current_user)
 ):
     logger.debug(f"Change password request: role={password_data.role}, id={password_data.id}")
     try:
+        if user.get("role") != "admin" and (user.get("role") != password_data.role or user.get("login_id") != password_data.id):
+            raise HTTPException(status_code=403, detail="Cannot change another user's password")
+        new_password_hash = await hash_password(password_data.newPassword)
+
         if password_data.role == "teacher":
             teacher_collection = db.db["teachers"]
-            teacher = await teacher_collection.find_one({"teacherId": password_data.id})
+            teacher = await teacher_collection.find_one({"teacherId": password_data.id}, {"_id": 1})
             
             if not teacher:
                 logger.warning(f"Teacher not found: teacherId={password_data.id}")
@@ -144,7 +213,7 @@ async def change_password(
                 {"teacherId": password_data.id},
                 {
                     "$set": {
-                        "password": password_data.newPassword,
+                        "password": new_password_hash,
                         "requiresPasswordChange": False,
                         "updated_at": datetime.utcnow().isoformat()
                     }
@@ -159,7 +228,7 @@ async def change_password(
             return {"status": "Password changed successfully"}
 
         elif password_data.role == "student":
-            student = await student_db.collection.find_one({"registrationNumber": password_data.id})
+            student = await student_db.collection.find_one({"registrationNumber": password_data.id}, {"_id": 1})
             
             if not student:
                 logger.warning(f"Student not found: registrationNumber={password_data.id}")
@@ -169,7 +238,7 @@ async def change_password(
                 {"registrationNumber": password_data.id},
                 {
                     "$set": {
-                        "password": password_data.newPassword,
+                        "password": new_password_hash,
                         "requiresPasswordChange": False,
                         "updated_at": datetime.utcnow().isoformat()
                     }
@@ -191,4 +260,9 @@ async def change_password(
         raise e
     except Exception as e:
         logger.error(f"Unexpected error during password change: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"Unexpected error: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Unexpected error: {str(e)}")
+
+@router.get("/login/throttle-stats", response_model=Dict[str, int], dependencies=[Depends(require_admin)])
+async def get_login_throttle_stats():
+    """Counters for monitoring login throttling in this worker."""
+    return login_throttle.stats()
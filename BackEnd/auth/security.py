@@ -0,0 +1,154 @@
+from concurrent.futures import ThreadPoolExecutor
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Tuple
+import asyncio
+import base64
+import hashlib
+import hmac
+import json
+import logging
+import os
+import secrets
+import time
+from tenants import DEFAULT_TENANT
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+DEFAULT_SECRET_KEY = "satscore-development-secret-change-me"
+SECRET_KEY = os.getenv("AUTH_SECRET_KEY", DEFAULT_SECRET_KEY).encode("utf-8")
+TOKEN_TTL_SECONDS = int(os.getenv("AUTH_TOKEN_TTL_SECONDS", str(12 * 60 * 60)))
+PRINCIPAL_CACHE_SIZE = int(os.getenv("AUTH_PRINCIPAL_CACHE_SIZE", "10000"))
+
+# scrypt parameters: ~16 MiB and tens of milliseconds per hash
+SCRYPT_N = 2 ** 14
+SCRYPT_R = 8
+SCRYPT_P = 1
+SCRYPT_PREFIX = "scrypt"
+
+def development_key_allowed() -> bool:
+    """Only local development (``python main.py`` or APP_DEBUG) may sign tokens with the key published in this repository."""
+    return any(os.getenv(name, "false").lower() in ("1", "true", "yes") for name in ("APP_DEBUG", "AUTH_ALLOW_DEVELOPMENT_KEY"))
+
+def require_secret_key() -> None:
+    """
+    Refuse to start without AUTH_SECRET_KEY: anyone who has read the source
+    could sign an admin token with the development key. Called from the
+    application lifespan and by serve.py before it forks its workers.
+    """
+    if SECRET_KEY != DEFAULT_SECRET_KEY.encode("utf-8"):
+        return
+    if not development_key_allowed():
+        raise RuntimeError("AUTH_SECRET_KEY is not set; set it to a long random value (APP_DEBUG=true allows the development key)")
+    logger.warning("AUTH_SECRET_KEY is not set; using the development signing key")
+
+# Password hashing is CPU bound; hashlib releases the GIL, so a thread pool keeps the event loop free
+hash_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("AUTH_HASH_WORKERS", str(min(4, os.cpu_count() or 1)))),
+    thread_name_prefix="password-hash"
+)
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+def _b64decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+def _sign(payload: bytes) -> bytes:
+    return hmac.new(SECRET_KEY, payload, hashlib.sha256).digest()
+
+def create_token(user_id: str, role: str, login_id: str, name: Optional[str] = None, tenant: Optional[str] = None) -> str:
+    """Issue a signed, self-contained session token: base64url(payload).base64url(hmac)."""
+    payload = json.dumps({
+        "sub": user_id,
+        "role": role,
+        "lid": login_id,
+        "name": name,
+        "tid": tenant,
+        "exp": int(time.time()) + TOKEN_TTL_SECONDS
+    }, separators=(",", ":")).encode("utf-8")
+    return f"{_b64encode(payload)}.{_b64encode(_sign(payload))}"
+
+class PrincipalCache:
+    """Small LRU of token -> principal so repeat requests skip signature checks and JSON decoding."""
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self.entries: "OrderedDict[str, Tuple[Dict[str, Any], int]]" = OrderedDict()
+
+    def get(self, token: str) -> Optional[Dict[str, Any]]:
+        entry = self.entries.get(token)
+        if entry is None:
+            return None
+        principal, expires_at = entry
+        if expires_at <= time.time():
+            del self.entries[token]
+            return None
+        self.entries.move_to_end(token)
+        return principal
+
+    def put(self, token: str, principal: Dict[str, Any], expires_at: int) -> None:
+        self.entries[token] = (principal, expires_at)
+        self.entries.move_to_end(token)
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+
+principal_cache = PrincipalCache(PRINCIPAL_CACHE_SIZE)
+
+def verify_token(token: str) -> Dict[str, Any]:
+    """Return the principal for a valid token, raising ValueError otherwise. Never touches the database."""
+    principal = principal_cache.get(token)
+    if principal is not None:
+        return principal
+    try:
+        encoded_payload, encoded_signature = token.split(".", 1)
+        payload = _b64decode(encoded_payload)
+        signature = _b64decode(encoded_signature)
+    except Exception:
+        raise ValueError("Malformed token")
+    if not hmac.compare_digest(signature, _sign(payload)):
+        raise ValueError("Invalid token signature")
+    claims = json.loads(payload)
+    if claims.get("exp", 0) <= time.time():
+        raise ValueError("Token expired")
+    principal = {
+        "id": claims["sub"],
+        "role": claims["role"],
+        "login_id": claims.get("lid"),
+        "name": claims.get("name"),
+        "tenant": claims.get("tid") or DEFAULT_TENANT,
+    }
+    principal_cache.put(token, principal, claims["exp"])
+    return principal
+
+def _hash_password_sync(password: str, salt: bytes) -> str:
+    digest = hashlib.scrypt(password.encode("utf-8"), salt=salt, n=SCRYPT_N, r=SCRYPT_R, p=SCRYPT_P)
+    return f"{SCRYPT_PREFIX}${SCRYPT_N}${SCRYPT_R}${SCRYPT_P}${_b64encode(salt)}${_b64encode(digest)}"
+
+def _verify_password_sync(password: str, stored: str) -> bool:
+    try:
+        _, n, r, p, salt, expected = stored.split("$")
+        digest = hashlib.scrypt(password.encode("utf-8"), salt=_b64decode(salt), n=int(n), r=int(r), p=int(p))
+    except Exception as e:
+        logger.error(f"Unreadable password hash: {str(e)}")
+        return False
+    return hmac.compare_digest(digest, _b64decode(expected))
+
+def is_password_hash(stored: Optional[str]) -> bool:
+    return isinstance(stored, str) and stored.startswith(f"{SCRYPT_PREFIX}$")
+
+async def hash_password(password: str) -> str:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(hash_executor, _hash_password_sync, password, secrets.token_bytes(16))
+
+async def verify_password(password: str, stored: Optional[str]) -> Tuple[bool, bool]:
+    """
+    Check a password against a stored scrypt hash or a legacy plaintext value.
+    Returns (matches, needs_rehash); legacy plaintext passwords need rehashing.
+    """
+    if is_password_hash(stored):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(hash_executor, _verify_password_sync, password, stored), False
+    matches = stored is not None and hmac.compare_digest(password.encode("utf-8"), stored.encode("utf-8"))
+    return matches, matches
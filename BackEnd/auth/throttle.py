@@ -0,0 +1,118 @@
+from collections import OrderedDict
+from typing import Dict, Optional
+import logging
+import os
+import time
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+class TokenBucket:
+    __slots__ = ("tokens", "updated")
+
+    def __init__(self, capacity: float):
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def refill(self, capacity: float, rate: float, now: float) -> None:
+        self.tokens = min(capacity, self.tokens + (now - self.updated) * rate)
+        self.updated = now
+
+class BucketTable:
+    """
+    Token buckets keyed by client or account, bounded to ``max_keys`` entries.
+    The least recently used keys are evicted first; an evicted key simply
+    starts again with a full bucket.
+    """
+
+    def __init__(self, capacity: float, refill_per_second: float, max_keys: int):
+        self.capacity = capacity
+        self.rate = refill_per_second
+        self.max_keys = max_keys
+        self.buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+
+    def _bucket(self, key: str) -> TokenBucket:
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            bucket = self.buckets[key] = TokenBucket(self.capacity)
+            if len(self.buckets) > self.max_keys:
+                self.buckets.popitem(last=False)
+        else:
+            self.buckets.move_to_end(key)
+            bucket.refill(self.capacity, self.rate, time.monotonic())
+        return bucket
+
+    def has_token(self, key: str) -> bool:
+        return self._bucket(key).tokens >= 1
+
+    def take(self, key: str) -> bool:
+        bucket = self._bucket(key)
+        if bucket.tokens < 1:
+            return False
+        bucket.tokens -= 1
+        return True
+
+    def retry_after(self, key: str) -> int:
+        bucket = self.buckets.get(key)
+        if bucket is None or bucket.tokens >= 1 or self.rate <= 0:
+            return 1
+        return max(1, int((1 - bucket.tokens) / self.rate + 0.999))
+
+class LoginThrottle:
+    """
+    In-memory login throttling, checked before any database access.
+
+    Every attempt spends a token from the client's bucket; only failed
+    attempts spend from the account's bucket, so a valid user is never
+    locked out by their own successful logins while password guessing
+    against one account is slowed regardless of how many clients are used.
+    """
+
+    def __init__(self):
+        self.clients = BucketTable(
+            capacity=float(os.getenv("LOGIN_CLIENT_BURST", "60")),
+            refill_per_second=float(os.getenv("LOGIN_CLIENT_PER_SECOND", "5")),
+            max_keys=int(os.getenv("LOGIN_THROTTLE_MAX_KEYS", "100000"))
+        )
+        self.accounts = BucketTable(
+            capacity=float(os.getenv("LOGIN_ACCOUNT_BURST", "5")),
+            refill_per_second=float(os.getenv("LOGIN_ACCOUNT_PER_SECOND", str(1 / 60))),
+            max_keys=int(os.getenv("LOGIN_THROTTLE_MAX_KEYS", "100000"))
+        )
+        self.counters: Dict[str, int] = {
+            "attempts": 0,
+            "allowed": 0,
+            "rejected_client": 0,
+            "rejected_account": 0,
+            "failures": 0,
+            "successes": 0,
+        }
+
+    def check(self, client: str, account: str) -> Optional[int]:
+        """Return None if the attempt may proceed, otherwise the Retry-After seconds."""
+        self.counters["attempts"] += 1
+        if not self.accounts.has_token(account):
+            self.counters["rejected_account"] += 1
+            return self.accounts.retry_after(account)
+        if not self.clients.take(client):
+            self.counters["rejected_client"] += 1
+            return self.clients.retry_after(client)
+        self.counters["allowed"] += 1
+        return None
+
+    def record_failure(self, account: str) -> None:
+        self.counters["failures"] += 1
+        self.accounts.take(account)
+
+    def record_success(self) -> None:
+        self.counters["successes"] += 1
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            **self.counters,
+            "tracked_clients": len(self.clients.buckets),
+            "tracked_accounts": len(self.accounts.buckets),
+        }
+
+login_throttle = LoginThrottle()
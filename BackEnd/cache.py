@@ -0,0 +1,262 @@
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import UpdateOne
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional, Callable, Awaitable, Tuple
+import gzip
+import hashlib
+import json
+import logging
+import os
+import time
+from tenants import TENANT_HEADER
+from readprefs import reads_secondaries
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+VERSIONS_COLLECTION = "collection_versions"
+# Query parameters the frontend used purely as cache busters; they never change the payload
+IGNORED_QUERY_PARAMS = {"t", "_"}
+MIN_GZIP_BYTES = 1024
+MAX_CACHED_BODIES = 256
+# Upper bound on how stale a worker's view of a version counter may be, even if invalidations are lost
+VERSION_CACHE_MAX_STALENESS = float(os.getenv("VERSION_CACHE_MAX_STALENESS", "5"))
+
+class VersionCache:
+    """
+    Per-worker copy of the version counters, so conditional GETs need no
+    database read. Entries are dropped by local writes and by the
+    invalidation bus (see invalidation.py); while the bus is not connected
+    nothing is cached, so other workers' writes are never missed.
+    """
+
+    def __init__(self, max_staleness: float):
+        self.max_staleness = max_staleness
+        self.entries: Dict[Tuple[str, str], Tuple[int, float]] = {}
+        self.invalidated_at: Dict[Tuple[str, str], float] = {}
+        self.enabled = False
+        self.publisher: Optional[Callable[[AsyncIOMotorDatabase, Tuple[str, ...]], Awaitable[None]]] = None
+
+    def lookup(self, db_name: str, collections: List[str]) -> Optional[Dict[str, int]]:
+        if not self.enabled:
+            return None
+        now = time.monotonic()
+        versions = {}
+        for name in collections:
+            entry = self.entries.get((db_name, name))
+            if entry is None or now - entry[1] > self.max_staleness:
+                return None
+            versions[name] = entry[0]
+        return versions
+
+    def store(self, db_name: str, versions: Dict[str, int], fetched_at: float) -> None:
+        if not self.enabled:
+            return
+        for name, version in versions.items():
+            key = (db_name, name)
+            # Never let a read that started before an invalidation repopulate the entry
+            if self.invalidated_at.get(key, 0.0) > fetched_at or self.invalidated_at.get((db_name, "*"), 0.0) > fetched_at:
+                continue
+            self.entries[key] = (version, fetched_at)
+
+    def invalidate(self, db_name: str, name: Optional[str] = None) -> None:
+        now = time.monotonic()
+        if name is None:
+            self.invalidated_at[(db_name, "*")] = now
+            for key in [key for key in self.entries if key[0] == db_name]:
+                del self.entries[key]
+        else:
+            self.invalidated_at[(db_name, name)] = now
+            self.entries.pop((db_name, name), None)
+
+    def set_enabled(self, enabled: bool) -> None:
+        self.enabled = enabled
+        if not enabled:
+            self.entries.clear()
+
+version_cache = VersionCache(VERSION_CACHE_MAX_STALENESS)
+
+async def get_versions(db: AsyncIOMotorDatabase, collections: List[str]) -> Dict[str, int]:
+    """Current version counter of each collection; collections never written have version 0."""
+    # A secondary's counters may lag the primary's, so they neither come from nor go into the shared cache
+    cacheable = not reads_secondaries(db)
+    cached = version_cache.lookup(db.name, collections) if cacheable else None
+    if cached is not None:
+        return cached
+    fetched_at = time.monotonic()
+    versions = {name: 0 for name in collections}
+    async for doc in db[VERSIONS_COLLECTION].find({"_id": {"$in": collections}}):
+        versions[doc["_id"]] = doc.get("version", 0)
+    if cacheable:
+        version_cache.store(db.name, versions, fetched_at)
+    return versions
+
+async def bump_versions(db: AsyncIOMotorDatabase, *collections: str) -> None:
+    """Called by every write path after it changes one of the collections."""
+    try:
+        await db[VERSIONS_COLLECTION].bulk_write(
+            [UpdateOne({"_id": name}, {"$inc": {"version": 1}}, upsert=True) for name in collections],
+            ordered=False
+        )
+        for name in collections:
+            version_cache.invalidate(db.name, name)
+        if version_cache.publisher is not None:
+            await version_cache.publisher(db, collections)
+    except Exception as e:
+        # A missed bump only means a stale ETag; never fail the write that triggered it
+        logger.error(f"Failed to bump versions for {collections}: {str(e)}")
+
+class CachedBody:
+    __slots__ = ("etag", "body", "gzip_body")
+
+    def __init__(self, etag: str, body: bytes, gzip_body: Optional[bytes]):
+        self.etag = etag
+        self.body = body
+        self.gzip_body = gzip_body
+
+class ResponseCache:
+    """Serialized (and compressed) bodies of reference endpoints, one entry per URL, replaced on version change."""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self.entries: "OrderedDict[str, CachedBody]" = OrderedDict()
+
+    def get(self, key: str, etag: str) -> Optional[CachedBody]:
+        entry = self.entries.get(key)
+        if entry is None or entry.etag != etag:
+            return None
+        self.entries.move_to_end(key)
+        return entry
+
+    def put(self, key: str, entry: CachedBody) -> None:
+        self.entries[key] = entry
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def clear(self) -> None:
+        self.entries.clear()
+
+response_cache = ResponseCache(MAX_CACHED_BODIES)
+
+class ReferenceCache:
+    """
+    Loaded reference payloads (departments, subjects, mark criteria, ...)
+    shared by every response that embeds them, reused while the version
+    counters they were loaded under are unchanged. Payloads are shared
+    between requests and must be treated as read-only.
+    """
+
+    def __init__(self):
+        self.entries: Dict[Tuple[str, str], Tuple[Dict[str, int], Any]] = {}
+
+    def get(self, key: Tuple[str, str], versions: Dict[str, int]) -> Optional[Any]:
+        entry = self.entries.get(key)
+        if entry is None or entry[0] != versions:
+            return None
+        return entry[1]
+
+    def put(self, key: Tuple[str, str], versions: Dict[str, int], payload: Any) -> None:
+        self.entries[key] = (versions, payload)
+
+reference_cache = ReferenceCache()
+
+async def cached_reference(
+    db: AsyncIOMotorDatabase,
+    name: str,
+    collections: List[str],
+    load: Callable[[], Awaitable[Any]]
+) -> Any:
+    if reads_secondaries(db):
+        # The load may be served by a member behind the one that answered the versions
+        return await load()
+    # Versions are read before loading, so a write that races the load only costs one extra reload
+    versions = await get_versions(db, collections)
+    key = (db.name, name)
+    payload = reference_cache.get(key, versions)
+    if payload is None:
+        payload = await load()
+        reference_cache.put(key, versions, payload)
+    return payload
+
+def variant_key(request: Request) -> str:
+    params = sorted((key, value) for key, value in request.query_params.multi_items() if key not in IGNORED_QUERY_PARAMS)
+    query = "&".join(f"{key}={value}" for key, value in params)
+    return f"{request.url.path}?{query}"
+
+def make_etag(key: str, versions: Dict[str, int], scope: str = "") -> str:
+    fingerprint = "|".join([key, scope] + [f"{name}:{versions[name]}" for name in sorted(versions)])
+    return '"' + hashlib.sha1(fingerprint.encode("utf-8")).hexdigest()[:20] + '"'
+
+def etag_matches(request: Request, *etags: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    candidates = {value.strip().removeprefix("W/") for value in header.split(",")}
+    return "*" in candidates or any(etag in candidates for etag in etags)
+
+def accepts_gzip(request: Request) -> bool:
+    return "gzip" in request.headers.get("accept-encoding", "").lower()
+
+def serialize(data: Any) -> bytes:
+    return json.dumps(jsonable_encoder(data), separators=(",", ":")).encode("utf-8")
+
+async def conditional_json(
+    request: Request,
+    db: AsyncIOMotorDatabase,
+    collections: List[str],
+    build: Callable[[], Awaitable[Any]],
+    cache_body: bool = False,
+    scope: str = ""
+) -> Response:
+    """
+    Serve a JSON payload with a strong ETag derived from the version counters
+    of the collections it is built from. Answers 304 when If-None-Match still
+    matches, and with ``cache_body`` reuses the serialized and gzipped body
+    for as long as the versions are unchanged. ``scope`` distinguishes
+    payloads that depend on the caller rather than the URL.
+
+    When ``db`` may read from secondaries (see readprefs.py) the ETag is a
+    hash of the payload instead: consecutive reads may hit members at
+    different points of replication, and a version-derived ETag could keep
+    answering 304 to a payload built from a lagging member.
+    """
+    # Tenants share this worker's caches, so entries and ETags are keyed by database too
+    key = f"{db.name}:{variant_key(request)}"
+    if reads_secondaries(db):
+        return await replica_json(request, key, build, scope)
+    versions = await get_versions(db, collections)
+    etag = make_etag(key, versions, scope)
+    gzip_etag = etag[:-1] + '-gz"'
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache", "Vary": f"Accept-Encoding, Authorization, {TENANT_HEADER}"}
+
+    if etag_matches(request, etag, gzip_etag):
+        if accepts_gzip(request):
+            headers["ETag"] = gzip_etag
+        return Response(status_code=304, headers=headers)
+
+    entry = response_cache.get(f"{scope}|{key}", etag) if cache_body else None
+    if entry is None:
+        body = serialize(await build())
+        gzip_body = gzip.compress(body, compresslevel=6) if cache_body and len(body) >= MIN_GZIP_BYTES else None
+        entry = CachedBody(etag, body, gzip_body)
+        if cache_body:
+            response_cache.put(f"{scope}|{key}", entry)
+
+    if entry.gzip_body is not None and accepts_gzip(request):
+        headers["ETag"] = gzip_etag
+        headers["Content-Encoding"] = "gzip"
+        return Response(content=entry.gzip_body, media_type="application/json", headers=headers)
+    return Response(content=entry.body, media_type="application/json", headers=headers)
+
+async def replica_json(request: Request, key: str, build: Callable[[], Awaitable[Any]], scope: str = "") -> Response:
+    """conditional_json for reads routed to secondaries: the payload is always built, then fingerprinted."""
+    body = serialize(await build())
+    etag = '"' + hashlib.sha1(f"{key}|{scope}|".encode("utf-8") + body).hexdigest()[:20] + '"'
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache", "Vary": f"Accept-Encoding, Authorization, {TENANT_HEADER}"}
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
@@ -0,0 +1,147 @@
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, Any, List, Optional
+import gzip
+import json
+import logging
+import os
+import threading
+import time
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+REDACTED = "***"
+SENSITIVE_KEYS = {"password", "newpassword", "token", "access_token", "authorization"}
+MAX_BODY_BYTES = 1024 * 1024
+FLUSH_EVERY = 200
+
+def redact(value: Any) -> Any:
+    """Recursively replace secrets in a JSON body so captures can be shared."""
+    if isinstance(value, dict):
+        return {
+            key: REDACTED if key.lower() in SENSITIVE_KEYS else redact(val)
+            for key, val in value.items()
+        }
+    if isinstance(value, list):
+        return [redact(item) for item in value]
+    return value
+
+class TrafficRecorder:
+    """
+    Appends sanitized request records to a gzip-compressed JSON-lines file.
+
+    Records are buffered in memory and written from a worker thread, so the
+    event loop never waits on disk; one thread keeps the batches in order
+    and close() waits for the ones still being written. ``{pid}`` in the
+    path is replaced by the worker's process id so several workers never
+    share a file.
+    """
+
+    def __init__(self, path: str):
+        self.path_template = path
+        self.path: Optional[str] = None
+        self.started = time.monotonic()
+        self.buffer: List[Dict[str, Any]] = []
+        self.lock = threading.Lock()
+        self.file = None
+        self.recorded = 0
+        self.executor: Optional[ThreadPoolExecutor] = None
+
+    def start(self) -> None:
+        self.path = self.path_template.format(pid=os.getpid())
+        self.started = time.monotonic()
+        self.file = gzip.open(self.path, "at", encoding="utf-8")
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="traffic-capture")
+        logger.info(f"Capturing API traffic to {self.path}")
+
+    def record(self, entry: Dict[str, Any]) -> None:
+        if self.file is None:
+            return
+        self.buffer.append(entry)
+        self.recorded += 1
+        if len(self.buffer) >= FLUSH_EVERY:
+            batch, self.buffer = self.buffer, []
+            self.executor.submit(self._write, batch).add_done_callback(self._written)
+
+    def _written(self, future: Future) -> None:
+        # Usually runs on the writer thread, so it only logs
+        if future.exception() is not None:
+            logger.error(f"Failed to write captured traffic: {str(future.exception())}")
+
+    def _write(self, batch: List[Dict[str, Any]]) -> None:
+        with self.lock:
+            for entry in batch:
+                self.file.write(json.dumps(entry, separators=(",", ":")) + "\n")
+            self.file.flush()
+
+    def close(self) -> None:
+        if self.file is None:
+            return
+        # Batches handed to the writer thread land before the remainder and the close
+        self.executor.shutdown(wait=True)
+        self.executor = None
+        batch, self.buffer = self.buffer, []
+        self._write(batch)
+        with self.lock:
+            self.file.close()
+            self.file = None
+        logger.info(f"Traffic capture closed after {self.recorded} requests")
+
+class TrafficCaptureMiddleware:
+    """ASGI middleware recording method, path, JSON body, status and timing of API requests."""
+
+    def __init__(self, app, recorder: TrafficRecorder, path_prefix: str = "/api"):
+        self.app = app
+        self.recorder = recorder
+        self.path_prefix = path_prefix
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not scope["path"].startswith(self.path_prefix):
+            await self.app(scope, receive, send)
+            return
+
+        headers = {key.decode("latin-1").lower(): value.decode("latin-1") for key, value in scope["headers"]}
+        content_type = headers.get("content-type", "")
+        chunks: List[bytes] = []
+        size = 0
+        status: Optional[int] = None
+
+        async def receive_wrapper():
+            nonlocal size
+            message = await receive()
+            if message["type"] == "http.request":
+                body = message.get("body", b"")
+                size += len(body)
+                if size <= MAX_BODY_BYTES:
+                    chunks.append(body)
+            return message
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        started = time.monotonic()
+        try:
+            await self.app(scope, receive_wrapper, send_wrapper)
+        finally:
+            entry: Dict[str, Any] = {
+                "t": round(started - self.recorder.started, 4),
+                "method": scope["method"],
+                "path": scope["path"],
+                "query": scope.get("query_string", b"").decode("latin-1"),
+                "status": status,
+                "duration_ms": round((time.monotonic() - started) * 1000, 2),
+            }
+            if size and size <= MAX_BODY_BYTES and content_type.startswith("application/json"):
+                try:
+                    entry["body"] = redact(json.loads(b"".join(chunks)))
+                except ValueError:
+                    entry["body_omitted"] = "invalid json"
+            elif size:
+                # Multipart uploads and oversized bodies carry personal data or files; keep only the shape
+                entry["body_omitted"] = content_type or "unknown"
+                entry["body_bytes"] = size
+            self.recorder.record(entry)
@@ -0,0 +1,102 @@
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import UpdateOne
+from bson import ObjectId
+from typing import Dict, Any
+import logging
+import os
+from cache import bump_versions
+from jobs import job_handler, schedule, JobContext
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Denormalized counter on db.departments -> the collection it counts
+COUNTERS = {"totalStudents": "students", "totalTeachers": "db.teachers"}
+# How often the reconciler runs across all workers; 0 disables the schedule
+RECONCILE_INTERVAL_SECONDS = float(os.getenv("RECONCILE_INTERVAL_SECONDS", "3600"))
+
+async def move_department_counter(db: AsyncIOMotorDatabase, counter: str, old_department: Any, new_department: Any) -> None:
+    """Move one unit of ``counter`` between departments when a student or teacher changes department."""
+    if old_department is None or new_department is None or str(old_department) == str(new_department):
+        return
+    await db["db.departments"].bulk_write([
+        UpdateOne({"_id": ObjectId(str(old_department))}, {"$inc": {counter: -1}}),
+        UpdateOne({"_id": ObjectId(str(new_department))}, {"$inc": {counter: 1}}),
+    ], ordered=False)
+    await bump_versions(db, "db.departments")
+
+async def actual_counts(db: AsyncIOMotorDatabase, collection: str) -> Dict[str, int]:
+    """Documents per department, from one $group over the collection."""
+    counts: Dict[str, int] = {}
+    async for bucket in db[collection].aggregate([{"$group": {"_id": "$department", "count": {"$sum": 1}}}], allowDiskUse=True):
+        # Departments are ObjectIds, though some older writes stored the id string
+        key = str(bucket["_id"])
+        counts[key] = counts.get(key, 0) + bucket["count"]
+    return counts
+
+async def reconcile_department_counters(db: AsyncIOMotorDatabase, dry_run: bool = False) -> Dict[str, Any]:
+    """
+    Recompute totalStudents and totalTeachers for every department, report
+    the ones that drifted and, unless ``dry_run``, fix them with one bulk
+    write. A fix only applies while the counter still holds the value that
+    was compared.
+
+    The counters are read before the documents are counted: a write whose
+    $inc lands in between then changes the stored value and its fix no longer
+    applies. Counted first, the $inc would already be in the value read and
+    the fix would set the counter back to a count that missed the write.
+
+    That only protects writes whose document change and $inc are atomic:
+    creating and deleting a student on a replica set (see transactions.py).
+    On a standalone server, and for teacher writes and department moves, the
+    $inc is a separate write; a run that counts between the two can apply a
+    fix the pending $inc then throws off by one, until the next run.
+    """
+    departments = await db["db.departments"].find({}, {"name": 1, "shortName": 1, **{counter: 1 for counter in COUNTERS}}).to_list(length=None)
+    actual = {counter: await actual_counts(db, collection) for counter, collection in COUNTERS.items()}
+    drift = []
+    operations = []
+    for department in departments:
+        for counter in COUNTERS:
+            stored = department.get(counter)
+            expected = actual[counter].get(str(department["_id"]), 0)
+            if stored == expected:
+                continue
+            drift.append({
+                "department": str(department["_id"]),
+                "shortName": department.get("shortName", "N/A"),
+                "counter": counter,
+                "stored": stored,
+                "actual": expected,
+            })
+            operations.append(UpdateOne({"_id": department["_id"], counter: stored}, {"$set": {counter: expected}}))
+
+    known = {str(department["_id"]) for department in departments}
+    orphaned = {
+        counter: {department: count for department, count in counts.items() if department not in known}
+        for counter, counts in actual.items()
+    }
+    fixed = 0
+    if operations and not dry_run:
+        result = await db["db.departments"].bulk_write(operations, ordered=False)
+        fixed = result.modified_count
+        await bump_versions(db, "db.departments")
+    if drift:
+        logger.warning(f"Department counters drifted in {len(drift)} places; {'dry run' if dry_run else f'fixed {fixed}'}")
+    return {
+        "checked": len(departments),
+        "drifted": len(drift),
+        "fixed": fixed,
+        "dry_run": dry_run,
+        "drift": drift,
+        # Students or teachers pointing at a department that no longer exists
+        "orphaned": {counter: counts for counter, counts in orphaned.items() if counts},
+    }
+
+@job_handler("departments.reconcile")
+async def run_reconcile_job(job: JobContext) -> Dict[str, Any]:
+    return await reconcile_department_counters(job.db, dry_run=bool(job.params.get("dry_run", False)))
+
+if RECONCILE_INTERVAL_SECONDS > 0:
+    schedule("departments.reconcile", RECONCILE_INTERVAL_SECONDS)
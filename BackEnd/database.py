@@ -3,7 +3,16 @@ from bson import ObjectId
 from typing import Dict, Any, Optional, List
 import logging
 import base64
+import os
 from AddStudentModel import AddStudentModel
+from cache import bump_versions
+from search import student_search_keys, SEARCH_KEYS_FIELD
+from results import refresh_results
+from counters import move_department_counter
+from rosters import ROSTERS_COLLECTION, ROSTER_STUDENT_FIELDS, class_of, course_ids, join_operations, leave_operations, apply_roster_changes, move_student
+from transactions import run_in_transaction
+from tenants import TenantRegistry, parse_tenants
+from projections import DEFAULT_PROJECTION, DEPARTMENT_NAME_FIELDS, SUBJECT_SUMMARY_FIELDS
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
@@ -38,14 +47,19 @@ class Database:
     def __init__(self):
         self.client: Optional[AsyncIOMotorClient] = None
         self.db: Optional[AsyncIOMotorDatabase] = None
-        self.MONGODB_URL = "mongodb://localhost:27017"
-        self.DATABASE_NAME = "satscore"
+        self.tenants: Optional[TenantRegistry] = None
+        self.MONGODB_URL = os.getenv("MONGODB_URL", "mongodb://localhost:27017")
+        self.DATABASE_NAME = os.getenv("DATABASE_NAME", "satscore")
+        self.MAX_POOL_SIZE = int(os.getenv("MONGODB_MAX_POOL_SIZE", "100"))
+        self.TENANTS = parse_tenants(os.getenv("TENANTS", ""), self.DATABASE_NAME)
 
     async def startup(self):
         try:
-            self.client = AsyncIOMotorClient(self.MONGODB_URL)
+            # One pool per worker process, shared by every request
+            self.client = AsyncIOMotorClient(self.MONGODB_URL, maxPoolSize=self.MAX_POOL_SIZE)
             self.db = self.client[self.DATABASE_NAME]
-            logger.info(f"MongoDB connection established to {self.DATABASE_NAME} database")
+            self.tenants = TenantRegistry(self.client, self.TENANTS)
+            logger.info(f"MongoDB connection established to {self.DATABASE_NAME} database, {len(self.TENANTS)} tenants")
         except Exception as e:
             logger.error(f"Failed to connect to MongoDB: {str(e)}")
             raise
@@ -55,15 +69,29 @@ class Database:
             self.client.close()
             logger.info("MongoDB connection closed")
 
+async def ensure_indexes(db: AsyncIOMotorDatabase) -> None:
+    """Create the indexes the query paths rely on; creating an existing index is a no-op."""
+    await db["students"].create_index(SEARCH_KEYS_FIELD)
+    await db["students"].create_index("registrationNumber")
+    await db["students"].create_index([("department", 1), ("yearOfStudy", 1), ("section", 1), ("semester", 1)])
+    await db["students"].create_index([("yearOfStudy", 1), ("section", 1)])
+    # Listings filtered by subject, section and batch
+    await db["students"].create_index([("courses", 1), ("section", 1), ("yearOfJoining", 1)])
+    await db[ROSTERS_COLLECTION].create_index([("subject_id", 1), ("batch", 1), ("section", 1)])
+    await db["db.teachers"].create_index(SEARCH_KEYS_FIELD)
+    await db["db.teachers"].create_index("teacherId")
+    logger.info("Database indexes ensured")
+
 class StudentDB:
     def __init__(self, db: AsyncIOMotorDatabase):
         self.collection = db["students"]
         self.department_collection = db["db.departments"]
         self.subject_collection = db["db.subjects"]
 
-    async def generate_registration_number(self, year: str, department_id: str) -> str:
+    async def generate_registration_number(self, year: str, department_id: str, dept: Optional[Dict[str, Any]] = None) -> str:
         try:
-            dept = await self.department_collection.find_one({"_id": ObjectId(department_id)})
+            # Callers that already loaded the department (name and shortName) pass it in
+            dept = dept or await self.department_collection.find_one({"_id": ObjectId(department_id)}, DEPARTMENT_NAME_FIELDS)
             if not dept:
                 raise ValueError(f"Department with ID {department_id} not found")
             short_name = dept.get("shortName", "")
@@ -82,7 +110,7 @@ class StudentDB:
                 "department": ObjectId(department_id),
                 "yearOfStudy": year_of_study,
                 "semester": semester
-            }):
+            }, SUBJECT_SUMMARY_FIELDS):
                 courses.append({
                     "id": str(subject["_id"]),
                     "code": sanitize_string(subject.get("code", "")),
@@ -95,8 +123,14 @@ class StudentDB:
             raise
 
     async def create_student(self, student: AddStudentModel, file_content: Optional[bytes], registration_number: str) -> Dict[str, Any]:
+        """
+        Insert the student, count them in their department and add them to
+        their course rosters in one transaction (see transactions.py). The
+        response is built from the document written rather than re-read.
+        """
         try:
             student_data = student.dict(by_alias=True)
+            student_data["_id"] = ObjectId()
             student_data["registrationNumber"] = registration_number
             student_data["department"] = ObjectId(student_data["department"])
             
@@ -107,105 +141,96 @@ class StudentDB:
                 student_data["semester"]
             )
             student_data["courses"] = [course["id"] for course in courses] if courses else []
+            student_data[SEARCH_KEYS_FIELD] = student_search_keys(student_data)
 
             if file_content:
                 student_data["fileContent"] = file_content
-            result = await self.collection.insert_one(student_data)
-            student_id = str(result.inserted_id)
-            await self.department_collection.update_one(
-                {"_id": ObjectId(student.department)},
-                {"$inc": {"totalStudents": 1}}
-            )
-            inserted_student = await self.collection.find_one({"_id": ObjectId(student_id)})
-            if inserted_student:
-                sanitized_student = {}
-                for key, value in inserted_student.items():
-                    if key == "_id":
-                        sanitized_student["id"] = str(value)
-                    elif key == "department":
-                        sanitized_student[key] = sanitize_string(value)
-                    elif key == "fileContent" and value:
-                        sanitized_student[key] = base64.b64encode(value).decode('utf-8')
-                    elif key == "courses":
-                        sanitized_student[key] = [
-                            {
-                                "id": str(course_id),
-                                "code": course["code"],
-                                "name": course["name"]
-                            } for course_id in value
-                            for course in courses if course["id"] == str(course_id)
-                        ]
-                    else:
-                        sanitized_student[key] = sanitize_string(value)
-                if "_id" in sanitized_student:
-                    del sanitized_student["_id"]
+            db = self.collection.database
+            roster_operations = join_operations(student_data["_id"], course_ids(student_data["courses"]), *class_of(student_data))
+
+            async def enroll(session):
+                await self.collection.insert_one(student_data, session=session)
+                await self.department_collection.update_one(
+                    {"_id": student_data["department"]},
+                    {"$inc": {"totalStudents": 1}},
+                    session=session
+                )
+                if roster_operations:
+                    # Ordered, so a roster exists before the student is pushed into it
+                    await db[ROSTERS_COLLECTION].bulk_write(roster_operations, ordered=True, session=session)
+
+            await run_in_transaction(db, enroll)
+            student_id = str(student_data["_id"])
+            await bump_versions(db, "students", "db.departments")
+            await refresh_results(db, [student_data["_id"]])
+
+            summaries = {course["id"]: course for course in courses}
+            sanitized_student = {}
+            for key, value in student_data.items():
+                if key in ("password", SEARCH_KEYS_FIELD):
+                    continue
+                if key == "_id":
+                    sanitized_student["id"] = str(value)
+                elif key == "department":
+                    sanitized_student[key] = sanitize_string(value)
+                elif key == "fileContent" and value:
+                    sanitized_student[key] = base64.b64encode(value).decode('utf-8')
+                elif key == "courses":
+                    sanitized_student[key] = [summaries[course_id] for course_id in value if course_id in summaries]
+                else:
+                    sanitized_student[key] = sanitize_string(value)
             logger.info(f"Student created with ID: {student_id}, updated department {student.department}, assigned {len(courses)} courses")
             return sanitized_student
         except Exception as e:
             logger.error(f"Error creating student: {str(e)}")
             raise
 
-    async def get_students(self) -> List[Dict[str, Any]]:
+    async def course_summaries(self, course_ids: List[Any]) -> Dict[str, Dict[str, str]]:
+        """Code and name of every given course, fetched with a single query."""
+        ids = list({ObjectId(str(cid)) for cid in course_ids if ObjectId.is_valid(str(cid))})
+        summaries = {}
+        if ids:
+            async for subject in self.subject_collection.find({"_id": {"$in": ids}}, SUBJECT_SUMMARY_FIELDS):
+                summaries[str(subject["_id"])] = {
+                    "id": str(subject["_id"]),
+                    "code": sanitize_string(subject.get("code", "")),
+                    "name": sanitize_string(subject.get("name", ""))
+                }
+        return summaries
+
+    def sanitize_student(self, student: Dict[str, Any], summaries: Dict[str, Dict[str, str]]) -> Dict[str, Any]:
+        sanitized_student = {}
+        for key, value in student.items():
+            if key == "_id":
+                sanitized_student["id"] = str(value)
+            elif key == "department":
+                sanitized_student[key] = sanitize_string(value)
+            elif key == "courses":
+                sanitized_student[key] = [summaries[str(cid)] for cid in value if str(cid) in summaries]
+            else:
+                sanitized_student[key] = sanitize_string(value)
+        return sanitized_student
+
+    async def get_students(self, query: Optional[Dict[str, Any]] = None, projection: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
         try:
-            students = []
-            async for student in self.collection.find({}, {"fileContent": 0, "photo": 0}):
-                # Fetch course details for each student
-                courses = []
-                if student.get("courses"):
-                    async for subject in self.subject_collection.find({"_id": {"$in": [ObjectId(cid) for cid in student["courses"]]}}):
-                        courses.append({
-                            "id": str(subject["_id"]),
-                            "code": sanitize_string(subject.get("code", "")),
-                            "name": sanitize_string(subject.get("name", ""))
-                        })
-                sanitized_student = {}
-                for key, value in student.items():
-                    if key == "_id":
-                        sanitized_student["id"] = str(value)
-                    elif key == "department":
-                        sanitized_student[key] = sanitize_string(value)
-                    elif key == "courses":
-                        sanitized_student[key] = courses
-                    else:
-                        sanitized_student[key] = sanitize_string(value)
-                if "_id" in sanitized_student:
-                    del sanitized_student["_id"]
-                students.append(sanitized_student)
-                logger.debug(f"Sanitized student: {sanitized_student['id']}")
-            logger.info(f"Retrieved {len(students)} students via API")
-            return students
+            students = await self.collection.find(query or {}, projection or DEFAULT_PROJECTION).to_list(length=None)
+            # Course details for the whole page in one query instead of one per student
+            summaries = await self.course_summaries([cid for student in students for cid in student.get("courses", [])])
+            sanitized = [self.sanitize_student(student, summaries) for student in students]
+            logger.info(f"Retrieved {len(sanitized)} students via API")
+            return sanitized
         except Exception as e:
             logger.error(f"Error retrieving students: {str(e)}")
             raise
 
-    async def get_student(self, id: str) -> Optional[Dict[str, Any]]:
+    async def get_student(self, id: str, projection: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
         try:
-            student = await self.collection.find_one({"_id": ObjectId(id)}, {"fileContent": 0, "photo": 0})
+            student = await self.collection.find_one({"_id": ObjectId(id)}, projection or DEFAULT_PROJECTION)
             if not student:
                 return None
-            # Fetch course details
-            courses = []
-            if student.get("courses"):
-                async for subject in self.subject_collection.find({"_id": {"$in": [ObjectId(cid) for cid in student["courses"]]}}):
-                    courses.append({
-                        "id": str(subject["_id"]),
-                        "code": sanitize_string(subject.get("code", "")),
-                        "name": sanitize_string(subject.get("name", ""))
-                    })
-            sanitized_student = {}
-            for key, value in student.items():
-                if key == "_id":
-                    sanitized_student["id"] = str(value)
-                elif key == "department":
-                    sanitized_student[key] = sanitize_string(value)
-                elif key == "courses":
-                    sanitized_student[key] = courses
-                else:
-                    sanitized_student[key] = sanitize_string(value)
-            if "_id" in sanitized_student:
-                del sanitized_student["_id"]
+            summaries = await self.course_summaries(student.get("courses", []))
             logger.info(f"Retrieved student: {id}")
-            return sanitized_student
+            return self.sanitize_student(student, summaries)
         except Exception as e:
             logger.error(f"Error retrieving student {id}: {str(e)}")
             raise
@@ -214,35 +239,25 @@ class StudentDB:
         try:
             student_data = student.dict(by_alias=True)
             student_data["department"] = ObjectId(student_data["department"])
+            current = await self.collection.find_one({"_id": ObjectId(id)}, {"registrationNumber": 1, "department": 1, **ROSTER_STUDENT_FIELDS})
+            if not student_data.get("registrationNumber"):
+                # The edit form may omit the generated registration number; keep the stored one searchable
+                student_data["registrationNumber"] = current.get("registrationNumber") if current else None
+            student_data[SEARCH_KEYS_FIELD] = student_search_keys(student_data)
             result = await self.collection.update_one(
                 {"_id": ObjectId(id)},
                 {"$set": student_data}
             )
             if result.matched_count == 0:
                 raise ValueError(f"Student with ID {id} not found")
-            updated_student = await self.collection.find_one({"_id": ObjectId(id)}, {"fileContent": 0})
+            updated_student = await self.collection.find_one({"_id": ObjectId(id)}, DEFAULT_PROJECTION)
+            await move_student(self.collection.database, id, current, updated_student)
+            if current:
+                await move_department_counter(self.collection.database, "totalStudents", current.get("department"), student_data["department"])
+            await bump_versions(self.collection.database, "students")
+            await refresh_results(self.collection.database, [id])
             if updated_student:
-                # Fetch course details
-                courses = []
-                if updated_student.get("courses"):
-                    async for subject in self.subject_collection.find({"_id": {"$in": [ObjectId(cid) for cid in updated_student["courses"]]}}):
-                        courses.append({
-                            "id": str(subject["_id"]),
-                            "code": sanitize_string(subject.get("code", "")),
-                            "name": sanitize_string(subject.get("name", ""))
-                        })
-                sanitized_student = {}
-                for key, value in updated_student.items():
-                    if key == "_id":
-                        sanitized_student["id"] = str(value)
-                    elif key == "department":
-                        sanitized_student[key] = sanitize_string(value)
-                    elif key == "courses":
-                        sanitized_student[key] = courses
-                    else:
-                        sanitized_student[key] = sanitize_string(value)
-                if "_id" in sanitized_student:
-                    del sanitized_student["_id"]
+                sanitized_student = self.sanitize_student(updated_student, await self.course_summaries(updated_student.get("courses", [])))
                 logger.info(f"Student updated with ID: {id}")
                 return sanitized_student
         except Exception as e:
@@ -250,34 +265,38 @@ class StudentDB:
             raise
 
     async def delete_student(self, id: str) -> Dict[str, Any]:
+        """
+        Delete the student, uncount them in their department and take them off
+        their course rosters in one transaction, as create_student enrolls them.
+        """
         try:
-            student = await self.collection.find_one({"_id": ObjectId(id)})
+            student = await self.collection.find_one({"_id": ObjectId(id)}, {"department": 1, **ROSTER_STUDENT_FIELDS})
             if not student:
                 raise ValueError(f"Student with ID {id} not found")
-            result = await self.collection.delete_one({"_id": ObjectId(id)})
-            # Attempt to update department's totalStudents
-            try:
-                department_id = student.get("department")
-                if department_id:
-                    # Validate department_id as ObjectId
-                    try:
-                        dept_object_id = ObjectId(department_id)
-                        dept = await self.department_collection.find_one({"_id": dept_object_id})
-                        if dept:
-                            await self.department_collection.update_one(
-                                {"_id": dept_object_id},
-                                {"$inc": {"totalStudents": -1}}
-                            )
-                            logger.info(f"Updated totalStudents for department {dept['name']}")
-                        else:
-                            logger.warning(f"Department with ID {department_id} not found for student {id}")
-                    except Exception as e:
-                        logger.error(f"Invalid department ID {department_id} for student {id}: {str(e)}")
-                else:
-                    logger.warning(f"No department ID found for student {id}")
-            except Exception as e:
-                logger.error(f"Failed to update department for student {id}: {str(e)}")
-                # Continue with deletion despite department update failure
+            db = self.collection.database
+            department_id = student.get("department")
+            department_oid = ObjectId(str(department_id)) if department_id and ObjectId.is_valid(str(department_id)) else None
+            if department_oid is None:
+                logger.warning(f"No valid department ID found for student {id}: {department_id}")
+            roster_operations = leave_operations(ObjectId(id), course_ids(student.get("courses")), *class_of(student))
+
+            async def withdraw(session):
+                result = await self.collection.delete_one({"_id": ObjectId(id)}, session=session)
+                # Deleted concurrently: the other request uncounted them
+                if result.deleted_count == 0:
+                    return
+                if department_oid is not None:
+                    await self.department_collection.update_one(
+                        {"_id": department_oid},
+                        {"$inc": {"totalStudents": -1}},
+                        session=session
+                    )
+                if roster_operations:
+                    await db[ROSTERS_COLLECTION].bulk_write(roster_operations, ordered=True, session=session)
+
+            await run_in_transaction(db, withdraw)
+            await bump_versions(db, "students", "db.departments")
+            await refresh_results(db, [id])
             logger.info(f"Student deleted with ID: {id}")
             return {"id": id, "status": "deleted"}
         except Exception as e:
@@ -286,10 +305,10 @@ class StudentDB:
 
     async def assign_course(self, student_id: str, course_id: str) -> Dict[str, Any]:
         try:
-            student = await self.collection.find_one({"_id": ObjectId(student_id)})
+            student = await self.collection.find_one({"_id": ObjectId(student_id)}, {"yearOfJoining": 1, "section": 1})
             if not student:
                 raise ValueError(f"Student with ID {student_id} not found")
-            course = await self.subject_collection.find_one({"_id": ObjectId(course_id)})
+            course = await self.subject_collection.find_one({"_id": ObjectId(course_id)}, {"_id": 1})
             if not course:
                 raise ValueError(f"Course with ID {course_id} not found")
             result = await self.collection.update_one(
@@ -298,6 +317,9 @@ class StudentDB:
             )
             if result.matched_count == 0:
                 raise ValueError(f"Student with ID {student_id} not found")
+            await apply_roster_changes(self.collection.database, join_operations(student["_id"], [ObjectId(course_id)], *class_of(student)))
+            await bump_versions(self.collection.database, "students")
+            await refresh_results(self.collection.database, [student_id])
             updated_student = await self.get_student(student_id)
             logger.info(f"Assigned course {course_id} to student {student_id}")
             return updated_student
@@ -307,18 +329,21 @@ class StudentDB:
 
     async def remove_course(self, student_id: str, course_id: str) -> Dict[str, Any]:
         try:
-            student = await self.collection.find_one({"_id": ObjectId(student_id)})
+            student = await self.collection.find_one({"_id": ObjectId(student_id)}, {"yearOfJoining": 1, "section": 1})
             if not student:
                 raise ValueError(f"Student with ID {student_id} not found")
-            course = await self.subject_collection.find_one({"_id": ObjectId(course_id)})
+            course = await self.subject_collection.find_one({"_id": ObjectId(course_id)}, {"_id": 1})
             if not course:
                 raise ValueError(f"Course with ID {course_id} not found")
             result = await self.collection.update_one(
                 {"_id": ObjectId(student_id)},
-                {"$pull": {"courses": ObjectId(course_id)}}
+                {"$pull": {"courses": {"$in": [ObjectId(course_id), course_id]}}}
             )
             if result.matched_count == 0:
                 raise ValueError(f"Student with ID {student_id} not found")
+            await apply_roster_changes(self.collection.database, leave_operations(student["_id"], [ObjectId(course_id)], *class_of(student)))
+            await bump_versions(self.collection.database, "students")
+            await refresh_results(self.collection.database, [student_id])
             updated_student = await self.get_student(student_id)
             logger.info(f"Removed course {course_id} from student {student_id}")
             return updated_student
@@ -326,6 +351,10 @@ class StudentDB:
             logger.error(f"Error removing course {course_id} from student {student_id}: {str(e)}")
             raise
 
+class TeacherDB:
+    def __init__(self, db: AsyncIOMotorDatabase):
+        self.collection = db["db.teachers"]
+
 class DepartmentDB:
     def __init__(self, db: AsyncIOMotorDatabase):
         self.collection = db["db.departments"]
@@ -335,6 +364,7 @@ class DepartmentDB:
             department_data = department.dict()
             result = await self.collection.insert_one(department_data)
             department_id = str(result.inserted_id)
+            await bump_versions(self.collection.database, "db.departments")
             inserted_department = await self.collection.find_one({"_id": ObjectId(department_id)})
             if inserted_department:
                 inserted_department["id"] = str(inserted_department["_id"])
@@ -378,6 +408,7 @@ class DepartmentDB:
             )
             if result.matched_count == 0:
                 raise ValueError(f"Department with ID {id} not found")
+            await bump_versions(self.collection.database, "db.departments")
             updated_department = await self.collection.find_one({"_id": ObjectId(id)})
             if updated_department:
                 updated_department["id"] = str(updated_department["_id"])
@@ -393,6 +424,7 @@ class DepartmentDB:
             result = await self.collection.delete_one({"_id": ObjectId(id)})
             if result.deleted_count == 0:
                 raise ValueError(f"Department with ID {id} not found")
+            await bump_versions(self.collection.database, "db.departments")
             logger.info(f"Department deleted with ID: {id}")
             return {"id": id, "status": "deleted"}
         except Exception as e:
@@ -408,6 +440,7 @@ class SubjectDB:
             subject_data = subject.dict()
             result = await self.collection.insert_one(subject_data)
             subject_id = str(result.inserted_id)
+            await bump_versions(self.collection.database, "db.subjects")
             inserted_subject = await self.collection.find_one({"_id": ObjectId(subject_id)})
             if inserted_subject:
                 inserted_subject["id"] = str(inserted_subject["_id"])
@@ -451,6 +484,7 @@ class SubjectDB:
             )
             if result.matched_count == 0:
                 raise ValueError(f"Subject with ID {id} not found")
+            await bump_versions(self.collection.database, "db.subjects")
             updated_subject = await self.collection.find_one({"_id": ObjectId(id)})
             if updated_subject:
                 updated_subject["id"] = str(updated_subject["_id"])
@@ -466,6 +500,7 @@ class SubjectDB:
             result = await self.collection.delete_one({"_id": ObjectId(id)})
             if result.deleted_count == 0:
                 raise ValueError(f"Subject with ID {id} not found")
+            await bump_versions(self.collection.database, "db.subjects")
             logger.info(f"Subject deleted with ID: {id}")
             return {"id": id, "status": "deleted"}
         except Exception as e:
@@ -1,26 +1,26 @@
-from fastapi import Depends
-from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
-from typing import AsyncGenerator
+from fastapi import Depends, HTTPException, Request
+from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from typing import Dict, Any, Optional
 import logging
-from database import StudentDB, DepartmentDB, SubjectDB
+from database import StudentDB, DepartmentDB, SubjectDB, TeacherDB
+from auth.security import verify_token
+from tenants import tenant_of, DEFAULT_TENANT
+from readprefs import routed
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# MongoDB connection settings
-MONGODB_URL = "mongodb://localhost:27017"
-DATABASE_NAME = "satscore"
+async def get_db(request: Request) -> AsyncIOMotorDatabase:
+    """The database of the request's tenant, on the worker's shared connection pool opened in the application lifespan."""
+    return request.app.tenants.database(tenant_of(request))
 
-async def get_db() -> AsyncGenerator[AsyncIOMotorDatabase, None]:
-    client = AsyncIOMotorClient(MONGODB_URL)
-    try:
-        db = client[DATABASE_NAME]
-        logger.info(f"MongoDB connection established to {DATABASE_NAME} database")
-        yield db
-    finally:
-        client.close()
-        logger.info("MongoDB connection closed")
+def get_read_db(endpoint: str):
+    """get_db for a read-only endpoint, with the read preference and read concern configured for it in readprefs.py."""
+    async def dependency(db: AsyncIOMotorDatabase = Depends(get_db)) -> AsyncIOMotorDatabase:
+        return routed(db, endpoint)
+    return dependency
 
 async def get_student_db(db: AsyncIOMotorDatabase = Depends(get_db)) -> StudentDB:
     student_db = StudentDB(db)
@@ -35,4 +35,41 @@ async def get_department_db(db: AsyncIOMotorDatabase = Depends(get_db)) -> Depar
 async def get_subject_db(db: AsyncIOMotorDatabase = Depends(get_db)) -> SubjectDB:
     subject_db = SubjectDB(db)
     logger.info("SubjectDB initialized")
-    return subject_db
\ No newline at end of file
+    return subject_db
+
+async def get_teacher_db(db: AsyncIOMotorDatabase = Depends(get_db)) -> TeacherDB:
+    teacher_db = TeacherDB(db)
+    logger.info("TeacherDB initialized")
+    return teacher_db
+
+bearer_scheme = HTTPBearer(auto_error=False)
+
+async def get_current_user(
+    request: Request,
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(bearer_scheme)
+) -> Dict[str, Any]:
+    """Resolve the caller from the signed bearer token; verified in memory without a database read."""
+    if credentials is None:
+        raise HTTPException(status_code=401, detail="Not authenticated", headers={"WWW-Authenticate": "Bearer"})
+    try:
+        principal = verify_token(credentials.credentials)
+    except ValueError as e:
+        logger.warning(f"Rejected token: {str(e)}")
+        raise HTTPException(status_code=401, detail="Invalid or expired token", headers={"WWW-Authenticate": "Bearer"})
+    # A token is only valid at the college that issued it
+    if principal.get("tenant", DEFAULT_TENANT) != tenant_of(request):
+        logger.warning(f"Rejected token of tenant {principal.get('tenant')} at tenant {tenant_of(request)}")
+        raise HTTPException(status_code=401, detail="Invalid or expired token", headers={"WWW-Authenticate": "Bearer"})
+    return principal
+
+def require_roles(*roles: str):
+    async def dependency(user: Dict[str, Any] = Depends(get_current_user)) -> Dict[str, Any]:
+        if user.get("role") not in roles:
+            raise HTTPException(status_code=403, detail=f"Requires role: {', '.join(roles)}")
+        return user
+    return dependency
+
+require_admin = require_roles("admin")
+require_teacher = require_roles("teacher")
+require_student = require_roles("student")
+require_staff = require_roles("admin", "teacher")
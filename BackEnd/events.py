@@ -0,0 +1,243 @@
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import CursorType
+from pymongo.errors import OperationFailure, CollectionInvalid
+from bson import ObjectId
+from datetime import datetime, timezone, timedelta
+from typing import Dict, Any, List, Optional, Set, Tuple
+import asyncio
+import json
+import logging
+import os
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Marks save and submit events, pushed to connected admins over server-sent
+# events (see admin/Events.py). Writers append to a capped collection in the
+# control database; every worker tails it once and fans each event out to its
+# own subscribers, so an event reaches every admin whichever worker served the
+# write, and reconnecting clients can replay what they missed.
+EVENTS_COLLECTION = "marks_events"
+EVENTS_SIZE_BYTES = 4 * 1024 * 1024
+# Events a slow subscriber may fall behind by before it is told to resync
+SUBSCRIBER_QUEUE_SIZE = int(os.getenv("MARKS_EVENTS_QUEUE_SIZE", "256"))
+MAX_SUBSCRIBERS = int(os.getenv("MARKS_EVENTS_MAX_SUBSCRIBERS", "1000"))
+MAX_REPLAY_EVENTS = 1000
+# ObjectIds come from each worker's clock; replay looks this far before the last event seen to allow for skew
+REPLAY_CLOCK_SKEW = timedelta(seconds=60)
+RETRY_DELAY_SECONDS = 1.0
+# Sent in place of the events a subscriber could not keep up with; the client re-fetches the listings
+RESYNC_EVENT = {"type": "resync"}
+
+class Subscriber:
+    """One connected client: its filter and a bounded queue of events waiting to be written to it."""
+    __slots__ = ("db_name", "subject_id", "section", "queue", "dropped")
+
+    def __init__(self, db_name: str, subject_id: Optional[str], section: Optional[str]):
+        self.db_name = db_name
+        self.subject_id = subject_id
+        self.section = section
+        self.queue: "asyncio.Queue[Optional[Dict[str, Any]]]" = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        self.dropped = 0
+
+    def matches(self, event: Dict[str, Any]) -> bool:
+        if self.subject_id and event.get("subject_id") != self.subject_id:
+            return False
+        # Submissions cover every section of the subject
+        if self.section and event.get("section") not in (None, self.section):
+            return False
+        return True
+
+    def offer(self, event: Optional[Dict[str, Any]]) -> None:
+        """Queue without waiting; a full queue is replaced by one resync event so a slow client never holds up the rest."""
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.dropped += self.queue.qsize()
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(None if event is None else RESYNC_EVENT)
+
+class MarksEventHub:
+    """Per-worker fan-out of marks events to the subscribers of each tenant database."""
+
+    def __init__(self, max_subscribers: int):
+        self.max_subscribers = max_subscribers
+        self.subscribers: Dict[str, Set[Subscriber]] = {}
+        self.count = 0
+        self.bus: Optional["MarksEventBus"] = None
+
+    def subscribe(self, db_name: str, subject_id: Optional[str] = None, section: Optional[str] = None) -> Optional[Subscriber]:
+        """A new subscriber, or None when the worker already serves max_subscribers."""
+        if self.count >= self.max_subscribers:
+            return None
+        subscriber = Subscriber(db_name, subject_id, section)
+        self.subscribers.setdefault(db_name, set()).add(subscriber)
+        self.count += 1
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber) -> None:
+        subscribers = self.subscribers.get(subscriber.db_name)
+        if subscribers and subscriber in subscribers:
+            subscribers.discard(subscriber)
+            self.count -= 1
+            if subscriber.dropped:
+                logger.info(f"Marks events subscriber left after {subscriber.dropped} events were dropped for being slow")
+
+    def dispatch(self, db_name: str, event: Dict[str, Any]) -> None:
+        for subscriber in self.subscribers.get(db_name, ()):
+            if subscriber.matches(event):
+                subscriber.offer(event)
+
+    def resync(self) -> None:
+        """Tell every subscriber to re-fetch; used when this worker missed events."""
+        for subscribers in self.subscribers.values():
+            for subscriber in subscribers:
+                subscriber.offer(RESYNC_EVENT)
+
+    def close(self) -> None:
+        """End every open stream; called when the worker shuts down."""
+        for subscribers in self.subscribers.values():
+            for subscriber in subscribers:
+                subscriber.offer(None)
+
+marks_events = MarksEventHub(MAX_SUBSCRIBERS)
+
+def event_payload(doc: Dict[str, Any]) -> Dict[str, Any]:
+    event = {key: value for key, value in doc.items() if key not in ("_id", "db")}
+    event["id"] = str(doc["_id"])
+    if isinstance(event.get("at"), datetime):
+        event["at"] = event["at"].isoformat()
+    return event
+
+def format_event(event: Dict[str, Any]) -> str:
+    """One server-sent event; its id lets a reconnecting EventSource resume with Last-Event-ID."""
+    lines = [f"event: {event['type']}"]
+    if "id" in event:
+        lines.insert(0, f"id: {event['id']}")
+    lines.append(f"data: {json.dumps(event, separators=(',', ':'), default=str)}")
+    return "\n".join(lines) + "\n\n"
+
+class MarksEventBus:
+    """Carries marks events between workers through a tailed capped collection in the control database."""
+
+    def __init__(self, db: AsyncIOMotorDatabase, hub: MarksEventHub):
+        self.db = db
+        self.hub = hub
+        self.task: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        try:
+            await self.db.create_collection(EVENTS_COLLECTION, capped=True, size=EVENTS_SIZE_BYTES)
+        except CollectionInvalid:
+            pass
+        except OperationFailure as e:
+            # Another worker created it first
+            if e.code != 48:
+                raise
+        self.hub.bus = self
+        self.task = asyncio.create_task(self._run())
+        logger.info("Marks event bus started")
+
+    async def stop(self) -> None:
+        self.hub.bus = None
+        self.hub.close()
+        if self.task:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+        logger.info("Marks event bus stopped")
+
+    async def publish(self, db: AsyncIOMotorDatabase, event: Dict[str, Any]) -> None:
+        await self.db[EVENTS_COLLECTION].insert_one({**event, "db": db.name})
+
+    async def replay(self, db_name: str, after: str) -> List[Dict[str, Any]]:
+        """Events of a tenant written after the event ``after``, as far back as the capped collection reaches."""
+        if not ObjectId.is_valid(after):
+            return []
+        collection = self.db[EVENTS_COLLECTION]
+        anchor = ObjectId(after)
+        if await collection.find_one({"_id": anchor}, {"_id": 1}) is None:
+            # Rolled out of the collection: the client missed too much and must resync
+            return [RESYNC_EVENT]
+        events = []
+        seen = False
+        since = ObjectId.from_datetime(anchor.generation_time - REPLAY_CLOCK_SKEW)
+        # Capped collections keep insertion order, which ObjectIds from several workers do not
+        async for doc in collection.find({"db": db_name, "_id": {"$gte": since}}).sort("$natural", 1):
+            if seen:
+                events.append(event_payload(doc))
+            elif doc["_id"] == anchor:
+                seen = True
+        if len(events) > MAX_REPLAY_EVENTS:
+            return [RESYNC_EVENT]
+        return events
+
+    async def _run(self) -> None:
+        # The last event dispatched. Like replay, a (re)started cursor reads from
+        # REPLAY_CLOCK_SKEW before it in insertion order and skips everything up
+        # to and including it: ObjectIds from several workers are not ordered,
+        # so resuming with "_id > anchor" could skip events written later.
+        anchor: Optional[ObjectId] = None
+        while True:
+            try:
+                collection = self.db[EVENTS_COLLECTION]
+                if anchor is not None and await collection.find_one({"_id": anchor}, {"_id": 1}) is None:
+                    # Rolled out of the capped collection while disconnected: events were lost
+                    logger.warning("Marks event bus fell behind the capped collection; telling subscribers to resync")
+                    self.hub.resync()
+                    anchor = None
+                if anchor is None:
+                    latest = await collection.find_one({}, sort=[("$natural", -1)])
+                    anchor = latest["_id"] if latest else None
+                query = {"_id": {"$gte": ObjectId.from_datetime(anchor.generation_time - REPLAY_CLOCK_SKEW)}} if anchor is not None else {}
+                seen = anchor is None
+                cursor = collection.find(query, cursor_type=CursorType.TAILABLE_AWAIT).sort("$natural", 1)
+                while cursor.alive:
+                    async for doc in cursor:
+                        if not seen:
+                            # Already dispatched before the cursor was (re)started
+                            seen = doc["_id"] == anchor
+                            continue
+                        anchor = doc["_id"]
+                        self.hub.dispatch(doc.get("db", self.db.name), event_payload(doc))
+                    # Tailable cursors return empty batches while idle
+                    await asyncio.sleep(0.05)
+                await asyncio.sleep(0.1)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Marks event bus disconnected: {str(e)}")
+                await asyncio.sleep(RETRY_DELAY_SECONDS)
+
+async def publish_marks_event(db: AsyncIOMotorDatabase, event_type: str, **fields: Any) -> None:
+    """Announce a marks write to the admins watching. Like bump_versions, a failure is logged and never fails the write."""
+    event = {"type": event_type, **fields, "at": datetime.now(timezone.utc)}
+    try:
+        if marks_events.bus is not None:
+            await marks_events.bus.publish(db, event)
+        else:
+            # No bus (scripts, or the bus is not started): only this worker's subscribers can hear it
+            marks_events.dispatch(db.name, {**event, "at": event["at"].isoformat()})
+    except Exception as e:
+        logger.error(f"Failed to publish {event_type} event: {str(e)}")
+
+async def publish_class_saves(
+    db: AsyncIOMotorDatabase,
+    event_type: str,
+    saved: Dict[Tuple[str, Optional[str]], int],
+    conflicts: Dict[Tuple[str, Optional[str]], int]
+) -> None:
+    """One event per class (subject and section) a save request touched, with its saved and conflicting entries."""
+    for subject_id, section in dict.fromkeys(list(saved) + list(conflicts)):
+        await publish_marks_event(
+            db,
+            event_type,
+            subject_id=subject_id,
+            section=section,
+            saved=saved.get((subject_id, section), 0),
+            conflicts=conflicts.get((subject_id, section), 0)
+        )
@@ -0,0 +1,212 @@
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from bson import ObjectId
+from typing import Dict, Any, List, Optional, AsyncIterator
+from xml.sax.saxutils import escape
+import csv
+import io
+import logging
+import re
+import zipfile
+from reports import subject_marks
+from zipstream import ZipStream
+from readprefs import routed
+from jobs import job_handler, JobContext, store_job_file
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+CURSOR_BATCH_SIZE = 500
+ROWS_PER_CHUNK = 500
+
+COLUMNS = [
+    "registrationNumber", "fullName", "department", "yearOfStudy", "section", "academic_year",
+    "subject_code", "subject_name", "fat1", "fat2", "fat3", "assignments", "internal", "sat", "sat_submitted", "final"
+]
+INVALID_XML_CHARS = re.compile(r"[\x00-\x08\x0b\x0c\x0e-\x1f]")
+
+class ExportFilters:
+    def __init__(
+        self,
+        department: Optional[str] = None,
+        subject: Optional[str] = None,
+        section: Optional[str] = None,
+        academic_year: Optional[str] = None
+    ):
+        self.department = department
+        self.subject = subject
+        self.section = section
+        self.academic_year = academic_year
+
+    def student_query(self) -> Dict[str, Any]:
+        query: Dict[str, Any] = {}
+        if self.department:
+            query["department"] = ObjectId(self.department)
+        if self.subject:
+            # create_student stores course ids as strings, other writes as ObjectIds
+            query["courses"] = {"$in": [ObjectId(self.subject), self.subject]}
+        if self.section:
+            query["section"] = self.section
+        if self.academic_year:
+            query["academic_year"] = self.academic_year
+        return query
+
+    def projection(self) -> Dict[str, Any]:
+        projection = {field: 1 for field in ["registrationNumber", "fullName", "department", "yearOfStudy", "section", "academic_year", "courses"]}
+        if self.subject:
+            # Only the exported subject's marks leave the database
+            projection.update({f"internal_marks.{self.subject}": 1, f"sat_marks.{self.subject}": 1, f"marks.{self.subject}": 1})
+        else:
+            projection.update({"internal_marks": 1, "sat_marks": 1, "marks": 1})
+        return projection
+
+    def filename(self, extension: str) -> str:
+        parts = ["marks"] + [part for part in [self.department, self.subject, self.section, self.academic_year] if part]
+        return "-".join(re.sub(r"[^A-Za-z0-9_.-]", "_", part) for part in parts) + f".{extension}"
+
+async def export_rows(db: AsyncIOMotorDatabase, filters: ExportFilters) -> AsyncIterator[List[Any]]:
+    """One row per (student, subject), read from a single cursor in registration-number order."""
+    subjects = {
+        str(subject["_id"]): subject
+        for subject in await db["db.subjects"].find({}, {"code": 1, "name": 1}).to_list(length=None)
+    }
+    departments = {
+        department["_id"]: department.get("shortName") or department.get("name", "N/A")
+        for department in await db["db.departments"].find({}, {"shortName": 1, "name": 1}).to_list(length=None)
+    }
+    cursor = db["students"].find(filters.student_query(), filters.projection()).sort("registrationNumber", 1).batch_size(CURSOR_BATCH_SIZE)
+    async for student in cursor:
+        subject_ids = [filters.subject] if filters.subject else [str(course) for course in student.get("courses", [])]
+        for subject_id in subject_ids:
+            subject = subjects.get(subject_id)
+            if not subject:
+                continue
+            marks = subject_marks(student, subject_id)
+            yield [
+                student.get("registrationNumber", ""),
+                student.get("fullName", ""),
+                departments.get(student.get("department"), str(student.get("department", ""))),
+                student.get("yearOfStudy", ""),
+                student.get("section", ""),
+                student.get("academic_year", ""),
+                subject.get("code", ""),
+                subject.get("name", ""),
+                marks["fat1"], marks["fat2"], marks["fat3"], marks["assignments"], marks["internal"], marks["sat"],
+                marks["sat_submitted"],
+                marks["final"],
+            ]
+
+async def stream_csv(rows: AsyncIterator[List[Any]]) -> AsyncIterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    # BOM so spreadsheet applications detect UTF-8 names
+    buffer.write("\ufeff")
+    writer.writerow(COLUMNS)
+    count = 0
+    async for row in rows:
+        writer.writerow(["" if value is None else value for value in row])
+        count += 1
+        if count % ROWS_PER_CHUNK == 0:
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode("utf-8")
+    logger.info(f"Exported {count} rows as CSV")
+
+XLSX_CONTENT_TYPES = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">
+<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>
+<Default Extension="xml" ContentType="application/xml"/>
+<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>
+<Override PartName="/xl/worksheets/sheet1.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>
+<Override PartName="/xl/styles.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>
+</Types>"""
+
+XLSX_ROOT_RELS = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">
+<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>
+</Relationships>"""
+
+XLSX_WORKBOOK = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">
+<sheets><sheet name="Marks" sheetId="1" r:id="rId1"/></sheets>
+</workbook>"""
+
+XLSX_WORKBOOK_RELS = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">
+<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" Target="worksheets/sheet1.xml"/>
+<Relationship Id="rId2" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" Target="styles.xml"/>
+</Relationships>"""
+
+# Style 1 is bold, used for the header row
+XLSX_STYLES = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">
+<fonts count="2"><font><sz val="11"/><name val="Calibri"/></font><font><b/><sz val="11"/><name val="Calibri"/></font></fonts>
+<fills count="2"><fill><patternFill patternType="none"/></fill><fill><patternFill patternType="gray125"/></fill></fills>
+<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>
+<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>
+<cellXfs count="2"><xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/><xf numFmtId="0" fontId="1" fillId="0" borderId="0" xfId="0" applyFont="1"/></cellXfs>
+</styleSheet>"""
+
+XLSX_SHEET_START = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetViews><sheetView workbookViewId="0"><pane ySplit="1" topLeftCell="A2" activePane="bottomLeft" state="frozen"/></sheetView></sheetViews><sheetData>"""
+
+XLSX_SHEET_END = "</sheetData></worksheet>"
+
+def xlsx_cell(value: Any, style: int = 0) -> str:
+    style_attribute = f' s="{style}"' if style else ""
+    if value is None or value == "":
+        return "<c/>"
+    if isinstance(value, bool):
+        return f'<c t="b"{style_attribute}><v>{int(value)}</v></c>'
+    if isinstance(value, (int, float)):
+        return f"<c{style_attribute}><v>{value}</v></c>"
+    text = escape(INVALID_XML_CHARS.sub("", str(value)))
+    return f'<c t="inlineStr"{style_attribute}><is><t xml:space="preserve">{text}</t></is></c>'
+
+def xlsx_row(values: List[Any], style: int = 0) -> str:
+    return "<row>" + "".join(xlsx_cell(value, style) for value in values) + "</row>"
+
+async def stream_xlsx(rows: AsyncIterator[List[Any]]) -> AsyncIterator[bytes]:
+    """A single-sheet workbook written as zipped SpreadsheetML with inline strings, so no shared-string table is held in memory."""
+    archive = ZipStream(compression=zipfile.ZIP_DEFLATED)
+    for name, content in [
+        ("[Content_Types].xml", XLSX_CONTENT_TYPES),
+        ("_rels/.rels", XLSX_ROOT_RELS),
+        ("xl/workbook.xml", XLSX_WORKBOOK),
+        ("xl/_rels/workbook.xml.rels", XLSX_WORKBOOK_RELS),
+        ("xl/styles.xml", XLSX_STYLES),
+    ]:
+        yield archive.add(name, content.encode("utf-8"))
+
+    sheet = archive.open("xl/worksheets/sheet1.xml", force_zip64=True)
+    sheet.write((XLSX_SHEET_START + xlsx_row(COLUMNS, style=1)).encode("utf-8"))
+    count = 0
+    chunk: List[str] = []
+    async for row in rows:
+        chunk.append(xlsx_row(row))
+        count += 1
+        if len(chunk) >= ROWS_PER_CHUNK:
+            sheet.write("".join(chunk).encode("utf-8"))
+            chunk.clear()
+            yield archive.drain()
+    sheet.write(("".join(chunk) + XLSX_SHEET_END).encode("utf-8"))
+    sheet.close()
+    yield archive.close()
+    logger.info(f"Exported {count} rows as XLSX")
+
+EXPORT_FORMATS = {
+    "csv": ("text/csv; charset=utf-8", stream_csv),
+    "xlsx": ("application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", stream_xlsx),
+}
+
+EXPORT_FILTER_PARAMS = ("department", "subject", "section", "academic_year")
+
+@job_handler("marks.export")
+async def run_export_job(job: JobContext) -> Dict[str, Any]:
+    """The same export as GET /api/exports/marks, written to a job file instead of the response."""
+    filters = ExportFilters(**{name: job.params.get(name) for name in EXPORT_FILTER_PARAMS})
+    export_format = job.params.get("format", "csv")
+    media_type, stream = EXPORT_FORMATS[export_format]
+    rows = export_rows(routed(job.db, "exports.marks"), filters)
+    return await store_job_file(job, filters.filename(export_format), media_type, stream(rows))
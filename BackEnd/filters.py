@@ -0,0 +1,204 @@
+from fastapi import HTTPException, Query
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from bson import ObjectId
+from typing import Dict, Any, List, Optional, Literal, Set
+import logging
+from rosters import roster_members, class_of
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Facet name -> student field; counted by one $facet aggregation
+FACET_FIELDS = {"department": "department", "year": "yearOfStudy", "section": "section"}
+
+class StudentFilters:
+    """
+    Query parameters shared by the student and marks listings, used as
+    ``filters: StudentFilters = Depends()``. Every filter becomes a Mongo
+    predicate so the (department, yearOfStudy, section, semester) index
+    narrows the scan instead of the browser filtering the full list.
+    """
+
+    def __init__(
+        self,
+        department: Optional[str] = Query(None, description="Department id, short name or name"),
+        year: Optional[str] = Query(None, description="Year of study"),
+        section: Optional[str] = Query(None),
+        semester: Optional[str] = Query(None),
+        batch: Optional[str] = Query(None, description="Batch, i.e. year of joining"),
+        subject: Optional[str] = Query(None, description="Subject id the students are enrolled in"),
+        status: Optional[Literal["submitted", "pending"]] = Query(None, description="SAT submission status for `subject`"),
+        facets: bool = Query(False, description="Also return per department, year and section counts")
+    ):
+        self.department = department
+        self.year = year
+        self.section = section
+        self.semester = semester
+        self.batch = batch
+        self.subject = subject
+        self.status = status
+        self.facets = facets
+
+    async def clauses(self, db: AsyncIOMotorDatabase) -> Dict[str, Dict[str, Any]]:
+        """One predicate per active filter, keyed by filter name so facets can leave their own out."""
+        clauses: Dict[str, Dict[str, Any]] = {}
+        if self.department:
+            clauses["department"] = {"department": await resolve_department(db, self.department)}
+        if self.year:
+            clauses["year"] = {"yearOfStudy": self.year}
+        if self.section:
+            clauses["section"] = {"section": self.section}
+        if self.semester:
+            clauses["semester"] = {"semester": self.semester}
+        if self.batch:
+            clauses["batch"] = {"yearOfJoining": batch_value(self.batch)}
+        if self.status and not self.subject:
+            raise HTTPException(status_code=400, detail="The status filter requires a subject")
+        if self.subject:
+            if not ObjectId.is_valid(self.subject):
+                raise HTTPException(status_code=400, detail=f"Invalid subject ID: {self.subject}")
+            # create_student stores course ids as strings, other writes as ObjectIds
+            clauses["subject"] = {"courses": {"$in": [ObjectId(self.subject), self.subject]}}
+            if self.status == "submitted":
+                clauses["status"] = {f"sat_marks.{self.subject}.isSubmitted": True}
+            elif self.status == "pending":
+                clauses["status"] = {f"sat_marks.{self.subject}.isSubmitted": {"$ne": True}}
+        return clauses
+
+    async def query(self, db: AsyncIOMotorDatabase) -> Dict[str, Any]:
+        return combine(list((await self.clauses(db)).values()))
+
+    def includes_subject(self, subject_id: str) -> bool:
+        """
+        Whether a per-subject marks entry belongs in a filtered marks listing.
+        ``status`` is not checked per entry: it is the student's SAT submission
+        state, already applied by the query, and internal marks entries carry
+        no isSubmitted of their own.
+        """
+        return not self.subject or subject_id == self.subject
+
+def batch_value(batch: str) -> Any:
+    # Students store yearOfJoining as an int; teacher assignments store the batch as a string
+    return int(batch) if batch.isdigit() else batch
+
+def combine(clauses: List[Dict[str, Any]]) -> Dict[str, Any]:
+    query: Dict[str, Any] = {}
+    for clause in clauses:
+        query.update(clause)
+    return query
+
+async def resolve_department(db: AsyncIOMotorDatabase, department: str) -> ObjectId:
+    if ObjectId.is_valid(department):
+        return ObjectId(department)
+    dept = await db["db.departments"].find_one(
+        {"$or": [{"shortName": department}, {"shortName": department.lower()}, {"name": department}]},
+        {"_id": 1}
+    )
+    if not dept:
+        raise HTTPException(status_code=400, detail=f"Department {department} not found")
+    return dept["_id"]
+
+async def facet_counts(
+    db: AsyncIOMotorDatabase,
+    filters: StudentFilters,
+    assignments: Optional[List[Dict[str, Any]]] = None
+) -> Dict[str, Any]:
+    """
+    Counts per department, year and section in a single aggregation. Each
+    facet applies every filter except its own, so the counts show what
+    choosing another value would return. A teacher's ``assignments`` (see
+    assignment_scope) limit every count to the students of their classes.
+    """
+    clauses = await filters.clauses(db)
+    shared = await scoped_query(db, combine([clause for name, clause in clauses.items() if name not in FACET_FIELDS]), assignments)
+    pipeline_facets: Dict[str, List[Dict[str, Any]]] = {
+        "total": [{"$match": combine([clause for name, clause in clauses.items() if name in FACET_FIELDS])}, {"$count": "count"}]
+    }
+    for name, field in FACET_FIELDS.items():
+        pipeline_facets[name] = [
+            {"$match": combine([clause for other, clause in clauses.items() if other in FACET_FIELDS and other != name])},
+            {"$group": {"_id": f"${field}", "count": {"$sum": 1}}},
+            {"$sort": {"_id": 1}},
+        ]
+    result = await db["students"].aggregate([{"$match": shared}, {"$facet": pipeline_facets}]).to_list(length=1)
+    counts = result[0] if result else {}
+
+    departments = {
+        dept["_id"]: dept.get("name", dept.get("shortName", "N/A"))
+        async for dept in db["db.departments"].find({}, {"name": 1, "shortName": 1})
+    }
+    facets: Dict[str, Any] = {"total": (counts.get("total") or [{}])[0].get("count", 0)}
+    for name in FACET_FIELDS:
+        buckets = []
+        for bucket in counts.get(name, []):
+            entry = {"value": str(bucket["_id"]) if bucket["_id"] is not None else None, "count": bucket["count"]}
+            if name == "department":
+                entry["name"] = departments.get(bucket["_id"], "N/A")
+            buckets.append(entry)
+        facets[name] = buckets
+    return facets
+
+async def assignment_scope(db: AsyncIOMotorDatabase, user: Dict[str, Any], filters: Optional[StudentFilters] = None) -> Optional[List[Dict[str, Any]]]:
+    """
+    The classes (subject, batch, section) a teacher's listing covers: their
+    subjectsHandled, narrowed by the subject, batch and section filters when
+    given. Admins are not scoped and get None.
+    """
+    if user["role"] != "teacher":
+        return None
+    teacher = await db["db.teachers"].find_one({"_id": ObjectId(user["id"])}, {"subjectsHandled": 1})
+    assignments = []
+    for assignment in (teacher or {}).get("subjectsHandled", []):
+        subject_id = str(assignment.get("subject_id"))
+        if filters and filters.subject and subject_id != filters.subject:
+            continue
+        if filters and filters.batch and str(assignment.get("batch")) != filters.batch:
+            continue
+        if filters and filters.section and assignment.get("section") != filters.section:
+            continue
+        assignments.append({"subject_id": subject_id, "batch": str(assignment.get("batch", "")), "section": assignment.get("section")})
+    if not assignments and filters and (filters.subject or filters.batch or filters.section):
+        raise HTTPException(status_code=403, detail="Not assigned to the requested subject, batch or section")
+    return assignments
+
+async def scoped_query(db: AsyncIOMotorDatabase, query: Dict[str, Any], assignments: Optional[List[Dict[str, Any]]]) -> Dict[str, Any]:
+    """Restrict a student query to the members of the given classes, read from their rosters."""
+    if assignments is None:
+        return query
+    members = {"_id": {"$in": await roster_members(db, assignments)}}
+    return {"$and": [query, members]} if query else members
+
+def scoped_subjects(filters: StudentFilters, assignments: Optional[List[Dict[str, Any]]]) -> Optional[Set[str]]:
+    """Subjects whose marks a scoped listing returns; None means every subject."""
+    if assignments is not None:
+        return {assignment["subject_id"] for assignment in assignments}
+    if filters.subject:
+        return {filters.subject}
+    return None
+
+def class_subjects(student: Dict[str, Any], subjects: Optional[Set[str]], assignments: Optional[List[Dict[str, Any]]]) -> Optional[Set[str]]:
+    """
+    Subjects whose marks a scoped listing returns for one student: those of
+    the assignments matching the student's batch and section, so a teacher of
+    subject A in one section and B in another never sees the first section's
+    B marks. ``subjects`` is the listing's scoped_subjects.
+    """
+    if assignments is None:
+        return subjects
+    batch, section = class_of(student)
+    return {
+        assignment["subject_id"]
+        for assignment in assignments
+        if (not assignment["batch"] or assignment["batch"] == batch)
+        and (not assignment.get("section") or assignment["section"] == section)
+    }
+
+def marks_projection(field: str, base: Dict[str, Any], subjects: Optional[Set[str]]) -> Dict[str, Any]:
+    """Only the marks of the scoped subjects leave the database."""
+    projection = dict(base)
+    if subjects is None:
+        projection[field] = 1
+    else:
+        projection.update({f"{field}.{subject_id}": 1 for subject_id in subjects})
+    return projection
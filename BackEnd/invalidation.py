@@ -0,0 +1,165 @@
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import CursorType
+from pymongo.errors import OperationFailure, CollectionInvalid
+from bson import ObjectId
+from datetime import timedelta
+from typing import Optional, Tuple, List
+from cache import version_cache, VERSIONS_COLLECTION
+import asyncio
+import logging
+import os
+import time
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Collections whose in-process caches must stay coherent across workers
+WATCHED_COLLECTIONS = ["db.departments", "db.subjects", "mark_criteria", "students", "db.teachers"]
+CAPPED_COLLECTION = "cache_invalidations"
+CAPPED_SIZE_BYTES = 1024 * 1024
+RETRY_DELAY_SECONDS = 1.0
+CHANGE_STREAMS_UNSUPPORTED = {40573, 40324}  # standalone server / unknown $changeStream stage
+# ObjectIds come from each worker's clock; a restarted tail reads this far before the last invalidation seen
+CLOCK_SKEW = timedelta(seconds=60)
+
+class InvalidationBus:
+    """
+    Broadcasts cache invalidations to every worker.
+
+    On a replica set (a local single-node one is enough) each worker tails a
+    change stream over the watched collections and ``collection_versions``,
+    so every write, by any worker or tool, drops the matching cached entries.
+    On a standalone server it falls back to a capped collection that
+    ``bump_versions`` appends to and every worker tails.
+
+    Staleness is bounded: while connected, an entry is at most
+    VERSION_CACHE_MAX_STALENESS seconds old even if an event were lost; while
+    disconnected, caching is disabled and every request reads the counters.
+    """
+
+    def __init__(self, db: AsyncIOMotorDatabase, mode: str = "auto", databases: Optional[List[str]] = None):
+        self.db = db
+        # Tenant databases served by this worker; one stream or capped collection (in ``db``) covers them all
+        self.databases = databases or [db.name]
+        self.mode = mode
+        self.active_mode: Optional[str] = None
+        self.task: Optional[asyncio.Task] = None
+        self.events = 0
+        self.last_event_at: Optional[float] = None
+
+    async def start(self) -> None:
+        if self.mode in ("auto", "change_stream") and await self._change_streams_supported():
+            self.active_mode = "change_stream"
+        else:
+            self.active_mode = "capped"
+            await self._ensure_capped_collection()
+            version_cache.publisher = self.publish
+        self.task = asyncio.create_task(self._run())
+        logger.info(f"Cache invalidation bus started in {self.active_mode} mode")
+
+    async def stop(self) -> None:
+        version_cache.set_enabled(False)
+        version_cache.publisher = None
+        if self.task:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+        logger.info("Cache invalidation bus stopped")
+
+    async def publish(self, db: AsyncIOMotorDatabase, collections: Tuple[str, ...]) -> None:
+        """Capped-collection mode only: announce a write to the other workers."""
+        await self.db[CAPPED_COLLECTION].insert_one({"db": db.name, "collections": list(collections), "pid": os.getpid()})
+
+    def _invalidate(self, db_name: str, name: str) -> None:
+        self.events += 1
+        self.last_event_at = time.monotonic()
+        version_cache.invalidate(db_name, name)
+
+    async def _change_streams_supported(self) -> bool:
+        try:
+            async with self.db.watch([], max_await_time_ms=1):
+                return True
+        except OperationFailure as e:
+            if e.code in CHANGE_STREAMS_UNSUPPORTED:
+                logger.info("Change streams unavailable (not a replica set); using capped collection invalidations")
+                return False
+            raise
+
+    async def _ensure_capped_collection(self) -> None:
+        try:
+            await self.db.create_collection(CAPPED_COLLECTION, capped=True, size=CAPPED_SIZE_BYTES)
+        except CollectionInvalid:
+            pass
+        except OperationFailure as e:
+            # Another worker created it first
+            if e.code != 48:
+                raise
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                if self.active_mode == "change_stream":
+                    await self._tail_change_stream()
+                else:
+                    await self._tail_capped_collection()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Invalidation bus disconnected: {str(e)}")
+            # Anything may have changed while disconnected
+            version_cache.set_enabled(False)
+            await asyncio.sleep(RETRY_DELAY_SECONDS)
+
+    async def _tail_change_stream(self) -> None:
+        pipeline = [{"$match": {"ns.coll": {"$in": WATCHED_COLLECTIONS + [VERSIONS_COLLECTION]}}}]
+        if len(self.databases) > 1:
+            pipeline[0]["$match"]["ns.db"] = {"$in": self.databases}
+        source = self.db.client if len(self.databases) > 1 else self.db
+        async with source.watch(pipeline) as stream:
+            # Only trust the cache once the stream is open, so no write can slip between read and subscribe
+            version_cache.set_enabled(True)
+            async for change in stream:
+                namespace = change.get("ns", {})
+                name = namespace.get("coll")
+                if name == VERSIONS_COLLECTION:
+                    name = change.get("documentKey", {}).get("_id")
+                if change.get("operationType") in ("drop", "dropDatabase", "rename", "invalidate") or not name:
+                    version_cache.invalidate(namespace.get("db", self.db.name))
+                    continue
+                self._invalidate(namespace.get("db", self.db.name), name)
+
+    async def _tail_capped_collection(self) -> None:
+        collection = self.db[CAPPED_COLLECTION]
+        latest = await collection.find_one({}, sort=[("$natural", -1)])
+        # The last invalidation applied. As in events.py, a restarted cursor
+        # reads from CLOCK_SKEW before it in insertion order and skips up to and
+        # including it: ObjectIds from several workers are not ordered, so
+        # resuming with "_id > anchor" could skip invalidations written later.
+        anchor: Optional[ObjectId] = latest["_id"] if latest else None
+        version_cache.set_enabled(True)
+        while True:
+            if anchor is not None and await collection.find_one({"_id": anchor}, {"_id": 1}) is None:
+                # Rolled out of the capped collection: invalidations may have been missed
+                logger.warning("Invalidation bus fell behind the capped collection; dropping cached versions")
+                for db_name in self.databases:
+                    version_cache.invalidate(db_name)
+                latest = await collection.find_one({}, sort=[("$natural", -1)])
+                anchor = latest["_id"] if latest else None
+            query = {"_id": {"$gte": ObjectId.from_datetime(anchor.generation_time - CLOCK_SKEW)}} if anchor is not None else {}
+            seen = anchor is None
+            cursor = collection.find(query, cursor_type=CursorType.TAILABLE_AWAIT).sort("$natural", 1)
+            while cursor.alive:
+                async for doc in cursor:
+                    if not seen:
+                        # Already applied before the cursor was (re)started
+                        seen = doc["_id"] == anchor
+                        continue
+                    anchor = doc["_id"]
+                    for name in doc.get("collections", []):
+                        self._invalidate(doc.get("db", self.db.name), name)
+                # Tailable cursors return empty batches while idle
+                await asyncio.sleep(0.05)
+            await asyncio.sleep(0.1)
@@ -0,0 +1,387 @@
+from fastapi.responses import JSONResponse
+from motor.motor_asyncio import AsyncIOMotorDatabase, AsyncIOMotorGridFSBucket, AsyncIOMotorGridOut
+from pymongo import ReturnDocument, ASCENDING
+from pymongo.errors import DuplicateKeyError
+from bson import ObjectId
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Any, Optional, Callable, Awaitable, Tuple, AsyncIterator
+import asyncio
+import logging
+import os
+import socket
+import uuid
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+JOBS_COLLECTION = "jobs"
+JOB_CONCURRENCY = int(os.getenv("JOB_CONCURRENCY", "2"))
+JOB_LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", "60"))
+JOB_POLL_SECONDS = float(os.getenv("JOB_POLL_SECONDS", "1"))
+JOB_RETRY_BASE_SECONDS = 5.0
+SCHEDULES_COLLECTION = "job_schedules"
+SCHEDULE_POLL_SECONDS = float(os.getenv("SCHEDULE_POLL_SECONDS", "30"))
+DEFAULT_MAX_ATTEMPTS = 3
+# Files a job produces (exports, report archives) are kept in GridFS; the job result points at them
+JOB_FILES_BUCKET = "job_files"
+JOB_FILE_RETENTION_HOURS = float(os.getenv("JOB_FILE_RETENTION_HOURS", "24"))
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+class JobContext:
+    """Handed to a job handler: its parameters, the database and a way to report progress."""
+
+    def __init__(self, runner: "JobRunner", job: Dict[str, Any]):
+        self.runner = runner
+        self.job = job
+        self.id: ObjectId = job["_id"]
+        self.params: Dict[str, Any] = job.get("params", {})
+        self.owner: Dict[str, Any] = job.get("owner", {})
+        self.db = runner.db
+
+    async def progress(self, percent: float, message: Optional[str] = None) -> None:
+        """Record progress (0-100); also renews the lease so long jobs are not taken over."""
+        await self.runner.renew(self.id, progress=max(0.0, min(100.0, round(percent, 1))), message=message)
+
+JobHandler = Callable[[JobContext], Awaitable[Optional[Dict[str, Any]]]]
+HANDLERS: Dict[str, JobHandler] = {}
+
+# This worker's runner for each tenant database, set while it is started
+runners: Dict[str, "JobRunner"] = {}
+
+def job_handler(job_type: str):
+    """Register the coroutine that runs jobs of ``job_type``; it returns the job's result (or a pointer to it)."""
+    def register(handler: JobHandler) -> JobHandler:
+        HANDLERS[job_type] = handler
+        return handler
+    return register
+
+# Job type -> (interval in seconds, params) of the jobs enqueued periodically
+SCHEDULES: Dict[str, Tuple[float, Dict[str, Any]]] = {}
+
+def schedule(job_type: str, interval_seconds: float, params: Optional[Dict[str, Any]] = None) -> None:
+    """Enqueue a ``job_type`` job every ``interval_seconds``, once across all workers."""
+    SCHEDULES[job_type] = (interval_seconds, params or {})
+
+def utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+async def enqueue(
+    db: AsyncIOMotorDatabase,
+    job_type: str,
+    params: Dict[str, Any],
+    owner: Optional[Dict[str, Any]] = None,
+    max_attempts: int = DEFAULT_MAX_ATTEMPTS
+) -> str:
+    if job_type not in HANDLERS:
+        raise ValueError(f"Unknown job type: {job_type}")
+    now = utcnow()
+    result = await db[JOBS_COLLECTION].insert_one({
+        "type": job_type,
+        "params": params,
+        "owner": {"id": owner.get("id"), "role": owner.get("role")} if owner else {},
+        "status": QUEUED,
+        "progress": 0.0,
+        "message": None,
+        "result": None,
+        "error": None,
+        "attempts": 0,
+        "max_attempts": max_attempts,
+        "run_after": now,
+        "lease_owner": None,
+        "lease_expires_at": None,
+        "created_at": now,
+        "updated_at": now,
+        "started_at": None,
+        "finished_at": None
+    })
+    job_id = str(result.inserted_id)
+    logger.info(f"Enqueued {job_type} job {job_id}")
+    runner = runners.get(db.name)
+    if runner is not None:
+        runner.wake()
+    return job_id
+
+async def enqueue_once(db: AsyncIOMotorDatabase, job_type: str, params: Optional[Dict[str, Any]] = None) -> Optional[str]:
+    """
+    Enqueue ``job_type`` unless it has been claimed before, by any worker: the
+    first to insert its marker into the schedules collection wins and the
+    others get a duplicate key error. For backfills every worker would
+    otherwise start on boot; the marker stays until release_once.
+    """
+    try:
+        await db[SCHEDULES_COLLECTION].insert_one({"_id": f"once:{job_type}", "claimed_at": utcnow()})
+    except DuplicateKeyError:
+        return None
+    try:
+        return await enqueue(db, job_type, params or {})
+    except Exception:
+        await release_once(db, job_type)
+        raise
+
+async def release_once(db: AsyncIOMotorDatabase, job_type: str) -> None:
+    """Let enqueue_once claim ``job_type`` again."""
+    await db[SCHEDULES_COLLECTION].delete_one({"_id": f"once:{job_type}"})
+
+def accepted(job_id: str) -> JSONResponse:
+    """The 202 Accepted reply for an endpoint that handed its work to the job queue."""
+    status_url = f"/api/jobs/{job_id}"
+    return JSONResponse(
+        status_code=202,
+        content={"job_id": job_id, "status": QUEUED, "status_url": status_url},
+        headers={"Location": status_url}
+    )
+
+async def get_job(db: AsyncIOMotorDatabase, job_id: str) -> Optional[Dict[str, Any]]:
+    return await db[JOBS_COLLECTION].find_one({"_id": ObjectId(job_id)})
+
+def job_to_dict(job: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "id": str(job["_id"]),
+        "type": job.get("type"),
+        "status": job.get("status"),
+        "progress": job.get("progress", 0.0),
+        "message": job.get("message"),
+        "result": job.get("result"),
+        "error": job.get("error"),
+        "attempts": job.get("attempts", 0),
+        "max_attempts": job.get("max_attempts", DEFAULT_MAX_ATTEMPTS),
+        "created_at": job.get("created_at"),
+        "started_at": job.get("started_at"),
+        "finished_at": job.get("finished_at"),
+    }
+
+class JobRunner:
+    """
+    Runs queued jobs in the background of every API worker.
+
+    A worker leases a job by atomically flipping it to ``running`` with an
+    expiry; the lease is renewed on every progress report and by a heartbeat.
+    If the worker dies, the lease lapses and another worker picks the job up
+    again, so jobs survive restarts. Failed attempts are retried with
+    exponential backoff up to ``max_attempts``.
+    """
+
+    def __init__(self, db: AsyncIOMotorDatabase, concurrency: int = JOB_CONCURRENCY):
+        self.db = db
+        self.collection = db[JOBS_COLLECTION]
+        self.concurrency = concurrency
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self.loop_task: Optional[asyncio.Task] = None
+        self.schedule_task: Optional[asyncio.Task] = None
+        self.running: Dict[ObjectId, asyncio.Task] = {}
+        self.wakeup = asyncio.Event()
+
+    async def start(self) -> None:
+        await self.collection.create_index([("status", ASCENDING), ("run_after", ASCENDING)])
+        await self.collection.create_index([("status", ASCENDING), ("lease_expires_at", ASCENDING)])
+        await self.collection.create_index([("owner.id", ASCENDING), ("created_at", ASCENDING)])
+        runners[self.db.name] = self
+        self.loop_task = asyncio.create_task(self._run())
+        if SCHEDULES:
+            self.schedule_task = asyncio.create_task(self._run_schedules())
+        logger.info(f"Job runner {self.worker_id} started with concurrency {self.concurrency}")
+
+    async def stop(self, timeout: float = 10.0) -> None:
+        runners.pop(self.db.name, None)
+        for task in (self.loop_task, self.schedule_task):
+            if task:
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+        if self.running:
+            done, pending = await asyncio.wait(list(self.running.values()), timeout=timeout)
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+        logger.info(f"Job runner {self.worker_id} stopped")
+
+    def wake(self) -> None:
+        self.wakeup.set()
+
+    async def lease(self) -> Optional[Dict[str, Any]]:
+        now = utcnow()
+        return await self.collection.find_one_and_update(
+            {"$or": [
+                {"status": QUEUED, "run_after": {"$lte": now}},
+                # Abandoned by a worker that stopped renewing its lease
+                {"status": RUNNING, "lease_expires_at": {"$lt": now}}
+            ]},
+            {
+                "$set": {
+                    "status": RUNNING,
+                    "lease_owner": self.worker_id,
+                    "lease_expires_at": now + timedelta(seconds=JOB_LEASE_SECONDS),
+                    "started_at": now,
+                    "updated_at": now
+                },
+                "$inc": {"attempts": 1}
+            },
+            sort=[("run_after", ASCENDING)],
+            return_document=ReturnDocument.AFTER
+        )
+
+    async def renew(self, job_id: ObjectId, progress: Optional[float] = None, message: Optional[str] = None) -> bool:
+        now = utcnow()
+        update: Dict[str, Any] = {"lease_expires_at": now + timedelta(seconds=JOB_LEASE_SECONDS), "updated_at": now}
+        if progress is not None:
+            update["progress"] = progress
+        if message is not None:
+            update["message"] = message
+        result = await self.collection.update_one({"_id": job_id, "lease_owner": self.worker_id, "status": RUNNING}, {"$set": update})
+        if result.matched_count == 0:
+            logger.warning(f"Lost the lease on job {job_id}")
+            return False
+        return True
+
+    async def _finish(self, job_id: ObjectId, update: Dict[str, Any]) -> None:
+        update.update({"lease_owner": None, "lease_expires_at": None, "updated_at": utcnow()})
+        await self.collection.update_one({"_id": job_id, "lease_owner": self.worker_id}, {"$set": update})
+
+    async def _heartbeat(self, job_id: ObjectId) -> None:
+        while True:
+            await asyncio.sleep(JOB_LEASE_SECONDS / 3)
+            await self.renew(job_id)
+
+    async def _execute(self, job: Dict[str, Any]) -> None:
+        job_id = job["_id"]
+        handler = HANDLERS.get(job["type"])
+        if handler is None:
+            await self._finish(job_id, {"status": FAILED, "error": f"No handler for job type {job['type']}", "finished_at": utcnow()})
+            return
+        if job["attempts"] > job.get("max_attempts", DEFAULT_MAX_ATTEMPTS):
+            # The previous attempt's worker died mid-run too many times
+            await self._finish(job_id, {"status": FAILED, "error": "Exceeded maximum attempts", "finished_at": utcnow()})
+            return
+
+        heartbeat = asyncio.create_task(self._heartbeat(job_id))
+        try:
+            logger.info(f"Running {job['type']} job {job_id} (attempt {job['attempts']})")
+            result = await handler(JobContext(self, job))
+            await self._finish(job_id, {"status": SUCCEEDED, "progress": 100.0, "result": result, "error": None, "finished_at": utcnow()})
+            logger.info(f"Job {job_id} succeeded")
+        except asyncio.CancelledError:
+            # Shutting down: hand the job back without spending an attempt
+            await asyncio.shield(self.collection.update_one(
+                {"_id": job_id, "lease_owner": self.worker_id},
+                {"$set": {"status": QUEUED, "lease_owner": None, "lease_expires_at": None, "updated_at": utcnow()}, "$inc": {"attempts": -1}}
+            ))
+            raise
+        except Exception as e:
+            logger.error(f"Job {job_id} failed on attempt {job['attempts']}: {str(e)}")
+            if job["attempts"] < job.get("max_attempts", DEFAULT_MAX_ATTEMPTS):
+                delay = JOB_RETRY_BASE_SECONDS * (2 ** (job["attempts"] - 1))
+                await self._finish(job_id, {"status": QUEUED, "error": str(e), "run_after": utcnow() + timedelta(seconds=delay)})
+            else:
+                await self._finish(job_id, {"status": FAILED, "error": str(e), "finished_at": utcnow()})
+        finally:
+            heartbeat.cancel()
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                while len(self.running) < self.concurrency:
+                    job = await self.lease()
+                    if job is None:
+                        break
+                    task = asyncio.create_task(self._execute(job))
+                    self.running[job["_id"]] = task
+                    task.add_done_callback(lambda _, job_id=job["_id"]: (self.running.pop(job_id, None), self.wake()))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Job runner failed to lease a job: {str(e)}")
+            self.wakeup.clear()
+            try:
+                await asyncio.wait_for(self.wakeup.wait(), timeout=JOB_POLL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+
+    async def claim_schedule(self, job_type: str, interval_seconds: float) -> bool:
+        """
+        Atomically move a schedule's next run forward if it is due. Only the
+        worker whose update matched enqueues the job; the others hit the
+        existing document and get a duplicate key error from the upsert.
+        """
+        now = utcnow()
+        try:
+            await self.db[SCHEDULES_COLLECTION].find_one_and_update(
+                {"_id": job_type, "next_run_at": {"$lte": now}},
+                {"$set": {"next_run_at": now + timedelta(seconds=interval_seconds), "claimed_by": self.worker_id, "claimed_at": now}},
+                upsert=True
+            )
+            return True
+        except DuplicateKeyError:
+            return False
+
+    async def _run_schedules(self) -> None:
+        while True:
+            for job_type, (interval_seconds, params) in SCHEDULES.items():
+                try:
+                    if await self.claim_schedule(job_type, interval_seconds):
+                        await enqueue(self.db, job_type, params)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    logger.error(f"Failed to run schedule {job_type}: {str(e)}")
+            await asyncio.sleep(SCHEDULE_POLL_SECONDS)
+
+def job_files(db: AsyncIOMotorDatabase) -> AsyncIOMotorGridFSBucket:
+    return AsyncIOMotorGridFSBucket(db, bucket_name=JOB_FILES_BUCKET)
+
+async def store_job_file(job: JobContext, filename: str, media_type: str, chunks: AsyncIterator[bytes]) -> Dict[str, Any]:
+    """
+    Write a job's output to GridFS as it is produced, so it is never held in
+    memory whole, and return the job result pointing at it. A failed attempt
+    removes what it wrote; the retry starts a new file.
+    """
+    upload = job_files(job.db).open_upload_stream(filename, metadata={"job_id": job.id, "media_type": media_type})
+    size = 0
+    try:
+        async for chunk in chunks:
+            if chunk:
+                await upload.write(chunk)
+                size += len(chunk)
+        await upload.close()
+    except BaseException:
+        await asyncio.shield(upload.abort())
+        raise
+    return {
+        "file_id": str(upload._id),
+        "filename": filename,
+        "media_type": media_type,
+        "size": size,
+        "download_url": f"/api/jobs/{job.id}/file",
+    }
+
+async def open_job_file(db: AsyncIOMotorDatabase, file_id: str) -> AsyncIOMotorGridOut:
+    """Raises gridfs.errors.NoFile once the file has been cleaned up."""
+    return await job_files(db).open_download_stream(ObjectId(file_id))
+
+async def read_job_file(download: AsyncIOMotorGridOut) -> AsyncIterator[bytes]:
+    while True:
+        chunk = await download.readchunk()
+        if not chunk:
+            break
+        yield chunk
+
+@job_handler("job_files.cleanup")
+async def run_job_files_cleanup(job: JobContext) -> Dict[str, Any]:
+    """Delete job files older than JOB_FILE_RETENTION_HOURS."""
+    cutoff = utcnow() - timedelta(hours=JOB_FILE_RETENTION_HOURS)
+    bucket = job_files(job.db)
+    removed = 0
+    async for file in job.db[f"{JOB_FILES_BUCKET}.files"].find({"uploadDate": {"$lt": cutoff}}, {"_id": 1}):
+        await bucket.delete(file["_id"])
+        removed += 1
+    if removed:
+        logger.info(f"Removed {removed} expired job files")
+    return {"removed": removed}
+
+schedule("job_files.cleanup", 3600)
@@ -0,0 +1,152 @@
+"""
+Check that a write through one worker is visible on every other worker's cached endpoints.
+
+Starts ``--workers`` API processes on consecutive ports against the same
+database, warms each worker's version cache with GET /api/departments, then
+repeatedly renames a department through one worker and polls the others until
+their ETag changes. Fails (exit code 1) if any worker takes longer than
+``--max-seconds`` to observe a write, which defaults to the
+VERSION_CACHE_MAX_STALENESS bound the cache promises.
+
+Usage (from the BackEnd directory, with MongoDB running and at least one department):
+
+    python -m loadtest.coherence --workers 3 --rounds 10
+    CACHE_INVALIDATION_MODE=capped python -m loadtest.coherence --workers 3
+
+Use a replica set (even a single-node one) to exercise change streams; a
+standalone server exercises the capped-collection fallback.
+"""
+from typing import Dict, Any, List, Optional
+import argparse
+import asyncio
+import logging
+import os
+import secrets
+import subprocess
+import sys
+import time
+import httpx
+from loadtest.run import percentile
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+ADMIN_EMAIL = "admin@gmail.com"
+DEFAULT_PASSWORD = "123456"
+POLL_INTERVAL_SECONDS = 0.02
+
+def start_workers(count: int, first_port: int, extra_env: Optional[Dict[str, str]] = None) -> List[subprocess.Popen]:
+    env = {**os.environ, **(extra_env or {})}
+    # The harness logs in once per worker from one address
+    env.setdefault("LOGIN_CLIENT_BURST", "1000")
+    # Tokens issued by one worker are used on the others, so they share a key for this run
+    env.setdefault("AUTH_SECRET_KEY", secrets.token_urlsafe(32))
+    return [
+        subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(first_port + index), "--log-level", "warning"],
+            env=env
+        )
+        for index in range(count)
+    ]
+
+async def wait_ready(client: httpx.AsyncClient, base_url: str, timeout: float) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if (await client.get(f"{base_url}/")).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        await asyncio.sleep(0.1)
+    raise RuntimeError(f"Worker at {base_url} did not start within {timeout}s")
+
+async def departments_etag(client: httpx.AsyncClient, base_url: str, headers: Dict[str, str]) -> str:
+    response = await client.get(f"{base_url}/api/departments", headers=headers)
+    response.raise_for_status()
+    return response.headers["etag"]
+
+async def wait_for_change(client: httpx.AsyncClient, base_url: str, headers: Dict[str, str], old_etag: str, timeout: float) -> float:
+    """Seconds until the worker serves a new ETag, or -1 on timeout."""
+    started = time.monotonic()
+    while time.monotonic() - started < timeout:
+        if await departments_etag(client, base_url, headers) != old_etag:
+            return time.monotonic() - started
+        await asyncio.sleep(POLL_INTERVAL_SECONDS)
+    return -1.0
+
+async def check(base_urls: List[str], rounds: int, max_seconds: float) -> bool:
+    async with httpx.AsyncClient(timeout=30.0) as client:
+        for base_url in base_urls:
+            await wait_ready(client, base_url, timeout=30.0)
+        response = await client.post(f"{base_urls[0]}/api/login", json={"role": "admin", "email": ADMIN_EMAIL, "password": DEFAULT_PASSWORD})
+        response.raise_for_status()
+        headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+        departments = (await client.get(f"{base_urls[0]}/api/departments", headers=headers)).json()
+        if not departments:
+            raise RuntimeError("No departments found; seed the database first (python -m loadtest.seed)")
+        department: Dict[str, Any] = departments[0]
+        original_name = department["name"]
+        fields = ["code", "name", "shortName", "numberOfClasses", "totalTeachers", "totalStudents"]
+
+        delays: List[float] = []
+        failures = 0
+        try:
+            for round_number in range(rounds):
+                writer = base_urls[round_number % len(base_urls)]
+                readers = [base_url for base_url in base_urls if base_url != writer]
+                # Warm every reader so the next read would be served from its version cache
+                etags = {base_url: await departments_etag(client, base_url, headers) for base_url in readers}
+                for base_url in readers:
+                    await departments_etag(client, base_url, headers)
+
+                payload = {field: department[field] for field in fields}
+                payload["name"] = f"{original_name} ({round_number})"
+                response = await client.put(f"{writer}/api/departments/{department['id']}", json=payload, headers=headers)
+                response.raise_for_status()
+
+                results = await asyncio.gather(*(wait_for_change(client, base_url, headers, etags[base_url], max_seconds) for base_url in readers))
+                for base_url, delay in zip(readers, results):
+                    if delay < 0:
+                        failures += 1
+                        logger.error(f"Round {round_number}: {base_url} still served the old ETag after {max_seconds}s")
+                    else:
+                        delays.append(delay)
+        finally:
+            payload = {field: department[field] for field in fields}
+            await client.put(f"{base_urls[0]}/api/departments/{department['id']}", json=payload, headers=headers)
+
+    delays.sort()
+    logger.info(
+        f"Propagation over {len(delays)} observations: "
+        f"p50={percentile(delays, 0.50) * 1000:.1f}ms p99={percentile(delays, 0.99) * 1000:.1f}ms "
+        f"max={(delays[-1] if delays else 0) * 1000:.1f}ms failures={failures}"
+    )
+    return failures == 0
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Verify cross-worker cache invalidation")
+    parser.add_argument("--workers", type=int, default=3)
+    parser.add_argument("--port", type=int, default=8100, help="Port of the first worker")
+    parser.add_argument("--rounds", type=int, default=10)
+    parser.add_argument("--max-seconds", type=float, default=float(os.getenv("VERSION_CACHE_MAX_STALENESS", "5")))
+    return parser.parse_args()
+
+def main() -> int:
+    args = parse_args()
+    if args.workers < 2:
+        logger.error("At least two workers are needed")
+        return 2
+    workers = start_workers(args.workers, args.port)
+    try:
+        base_urls = [f"http://127.0.0.1:{args.port + index}" for index in range(args.workers)]
+        return 0 if asyncio.run(check(base_urls, args.rounds, args.max_seconds)) else 1
+    finally:
+        for worker in workers:
+            worker.terminate()
+        for worker in workers:
+            worker.wait(timeout=10)
+
+if __name__ == "__main__":
+    sys.exit(main())
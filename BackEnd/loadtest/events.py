@@ -0,0 +1,83 @@
+"""
+Measure fan-out of marks events to many connected admins on one worker.
+
+Subscribes ``--subscribers`` clients to the in-process hub, of which
+``--slow`` never read, publishes ``--events`` events and reports how long
+each dispatch took and how long until every reading subscriber had the event.
+Slow subscribers must end up with a bounded queue that starts with a resync
+event rather than an unbounded backlog, and must not delay the others.
+
+Usage (from the BackEnd directory; no MongoDB or API needed):
+
+    python -m loadtest.events --subscribers 500 --slow 50 --events 2000
+"""
+from typing import List
+import argparse
+import asyncio
+import logging
+import sys
+import time
+from events import MarksEventHub, Subscriber, RESYNC_EVENT, SUBSCRIBER_QUEUE_SIZE
+from loadtest.run import percentile
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+async def reader(subscriber: Subscriber, expected: int, delivered: List[float]) -> None:
+    for _ in range(expected):
+        event = await subscriber.queue.get()
+        if "sent" not in event:
+            # Told to resync: this reader fell behind
+            return
+        delivered.append(time.perf_counter() - event["sent"])
+
+def pending(subscriber: Subscriber) -> List[dict]:
+    events = []
+    while not subscriber.queue.empty():
+        events.append(subscriber.queue.get_nowait())
+    return events
+
+async def run(subscribers: int, slow: int, events: int) -> bool:
+    hub = MarksEventHub(max_subscribers=subscribers)
+    readers = [hub.subscribe("satscore") for _ in range(subscribers - slow)]
+    idle = [hub.subscribe("satscore") for _ in range(slow)]
+    delivered: List[float] = []
+    tasks = [asyncio.create_task(reader(subscriber, events, delivered)) for subscriber in readers]
+
+    dispatch: List[float] = []
+    for index in range(events):
+        started = time.perf_counter()
+        hub.dispatch("satscore", {"type": "sat_marks.saved", "subject_id": "s", "section": "A", "saved": 1, "sent": started})
+        dispatch.append(time.perf_counter() - started)
+        if index % 64 == 0:
+            # Let readers drain, as the event loop would between tailed batches
+            await asyncio.sleep(0)
+    await asyncio.gather(*tasks)
+
+    dispatch.sort()
+    delivered.sort()
+    logger.info(
+        f"{subscribers} subscribers ({slow} not reading), {events} events: "
+        f"dispatch p50={percentile(dispatch, 0.50) * 1e6:.0f}us p99={percentile(dispatch, 0.99) * 1e6:.0f}us; "
+        f"delivery p50={percentile(delivered, 0.50) * 1000:.2f}ms p99={percentile(delivered, 0.99) * 1000:.2f}ms"
+    )
+    bounded = all(subscriber.queue.qsize() <= SUBSCRIBER_QUEUE_SIZE for subscriber in idle)
+    told_to_resync = events <= SUBSCRIBER_QUEUE_SIZE or all(pending(subscriber)[0] == RESYNC_EVENT for subscriber in idle)
+    if not (bounded and told_to_resync):
+        logger.error("Slow subscribers were not bounded and told to resync")
+    return len(delivered) == events * len(readers) and bounded and told_to_resync
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark the marks event fan-out hub")
+    parser.add_argument("--subscribers", type=int, default=500)
+    parser.add_argument("--slow", type=int, default=50, help="Subscribers that never read")
+    parser.add_argument("--events", type=int, default=2000)
+    return parser.parse_args()
+
+def main() -> int:
+    args = parse_args()
+    return 0 if asyncio.run(run(args.subscribers, min(args.slow, args.subscribers), args.events)) else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
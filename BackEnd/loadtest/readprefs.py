@@ -0,0 +1,116 @@
+"""
+Check which replica set member serves each read-routed endpoint.
+
+Connects directly to every member, snapshots its query/getmore/command
+opcounters, calls each endpoint ``--requests`` times through the API and
+reports how the extra operations split between the primary and the
+secondaries. Endpoints routed to secondaries (see readprefs.py) should leave
+the primary nearly idle; ``--expect-secondary`` fails the run (exit code 1)
+if the primary served more than ``--max-primary-share`` of an endpoint's
+operations. Endpoints configured to read from the primary (the students
+and marks listings, by default) are reported but not checked. Run it with
+the same READ_PREFERENCES as the API.
+
+A local three-member replica set:
+
+    mkdir -p /tmp/rs/0 /tmp/rs/1 /tmp/rs/2
+    mongod --replSet rs0 --port 27017 --dbpath /tmp/rs/0 --fork --logpath /tmp/rs/0.log
+    mongod --replSet rs0 --port 27018 --dbpath /tmp/rs/1 --fork --logpath /tmp/rs/1.log
+    mongod --replSet rs0 --port 27019 --dbpath /tmp/rs/2 --fork --logpath /tmp/rs/2.log
+    mongosh --port 27017 --eval 'rs.initiate({_id: "rs0", members: [
+        {_id: 0, host: "localhost:27017"}, {_id: 1, host: "localhost:27018"}, {_id: 2, host: "localhost:27019"}]})'
+
+Then, from the BackEnd directory, with the API started against
+MONGODB_URL=mongodb://localhost:27017,localhost:27018,localhost:27019/?replicaSet=rs0
+and a seeded database:
+
+    python -m loadtest.readprefs --members localhost:27017,localhost:27018,localhost:27019 --expect-secondary
+"""
+from motor.motor_asyncio import AsyncIOMotorClient
+from typing import Dict, List
+import argparse
+import asyncio
+import logging
+import sys
+import httpx
+from readprefs import ENDPOINT_READS
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+ADMIN_EMAIL = "admin@gmail.com"
+DEFAULT_PASSWORD = "123456"
+COUNTED_OPERATIONS = ("query", "getmore", "command")
+# Endpoint name in readprefs.ENDPOINT_READS -> request made through the API
+ENDPOINTS = {
+    "students.list": "/api/students",
+    "internal_marks.list": "/api/internal-marks",
+    "sat_marks.list": "/api/sat-marks",
+    "exports.marks": "/api/exports/marks?format=csv",
+    "admin.stats": "/api/admin/stats",
+}
+
+async def member_operations(clients: Dict[str, AsyncIOMotorClient]) -> Dict[str, int]:
+    counts = {}
+    for member, client in clients.items():
+        status = await client.admin.command("serverStatus")
+        counts[member] = sum(status["opcounters"].get(name, 0) for name in COUNTED_OPERATIONS)
+    return counts
+
+async def primary_of(clients: Dict[str, AsyncIOMotorClient]) -> str:
+    for member, client in clients.items():
+        hello = await client.admin.command("hello")
+        if hello.get("isWritablePrimary"):
+            return member
+    raise RuntimeError("No member reports itself as primary; is the replica set initiated?")
+
+async def check(base_url: str, members: List[str], requests: int, expect_secondary: bool, max_primary_share: float) -> bool:
+    clients = {member: AsyncIOMotorClient(f"mongodb://{member}/?directConnection=true") for member in members}
+    try:
+        primary = await primary_of(clients)
+        async with httpx.AsyncClient(base_url=base_url, timeout=120.0) as client:
+            response = await client.post("/api/login", json={"role": "admin", "email": ADMIN_EMAIL, "password": DEFAULT_PASSWORD})
+            response.raise_for_status()
+            headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+            passed = True
+            for endpoint, path in ENDPOINTS.items():
+                before = await member_operations(clients)
+                for _ in range(requests):
+                    (await client.get(path, headers=headers)).raise_for_status()
+                after = await member_operations(clients)
+                # serverStatus itself counts as one command on every member
+                delta = {member: max(0, after[member] - before[member] - 1) for member in members}
+                total = sum(delta.values()) or 1
+                share = delta[primary] / total
+                logger.info(
+                    f"{endpoint:<22} primary={delta[primary]} secondaries={total - delta[primary]} "
+                    f"({share * 100:.0f}% on the primary) {delta}"
+                )
+                if expect_secondary and ENDPOINT_READS[endpoint][0] != "primary" and share > max_primary_share:
+                    logger.error(f"{endpoint} served {share * 100:.0f}% of its reads from the primary")
+                    passed = False
+            return passed
+    finally:
+        for client in clients.values():
+            client.close()
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Report which replica set members serve the read-routed endpoints")
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--members", required=True, help="Comma-separated host:port of every member")
+    parser.add_argument("--requests", type=int, default=20, help="Requests per endpoint")
+    parser.add_argument("--expect-secondary", action="store_true", help="Fail when an endpoint mostly reads from the primary")
+    # The job runners and the invalidation bus keep polling the primary during the run
+    parser.add_argument("--max-primary-share", type=float, default=0.2)
+    return parser.parse_args()
+
+def main() -> int:
+    args = parse_args()
+    members = [member.strip() for member in args.members.split(",") if member.strip()]
+    passed = asyncio.run(check(args.url, members, args.requests, args.expect_secondary, args.max_primary_share))
+    return 0 if passed else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
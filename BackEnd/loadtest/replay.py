@@ -0,0 +1,153 @@
+"""
+Replay a traffic capture against a local instance and report latency deltas.
+
+Captures are written by ``capture.TrafficCaptureMiddleware`` when the API runs
+with ``TRAFFIC_CAPTURE_FILE`` set, e.g.
+
+    TRAFFIC_CAPTURE_FILE=/tmp/exam-week-{pid}.jsonl.gz uvicorn main:app
+
+Requests are re-issued at their recorded offsets divided by ``--speed``
+(1 for real time, N for N times faster, 0 for as fast as ``--concurrency``
+allows). Redacted passwords are replaced by ``--password``. The report
+compares replayed latency with the recorded latency per route.
+
+    python -m loadtest.replay /tmp/exam-week-1234.jsonl.gz --speed 4
+"""
+from typing import Dict, Any, List, Optional
+import argparse
+import asyncio
+import gzip
+import json
+import logging
+import re
+import sys
+import time
+import httpx
+from capture import REDACTED
+from loadtest.run import percentile
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+OBJECT_ID_PATTERN = re.compile(r"/[0-9a-f]{24}(?=/|$)")
+
+def route_of(entry: Dict[str, Any]) -> str:
+    """Group requests by route so /api/students/<id> calls share one line in the report."""
+    return f"{entry['method']} {OBJECT_ID_PATTERN.sub('/{id}', entry['path'])}"
+
+def restore_secrets(value: Any, password: str) -> Any:
+    if isinstance(value, dict):
+        return {key: restore_secrets(val, password) for key, val in value.items()}
+    if isinstance(value, list):
+        return [restore_secrets(item, password) for item in value]
+    return password if value == REDACTED else value
+
+def load_capture(paths: List[str]) -> List[Dict[str, Any]]:
+    entries = []
+    for path in paths:
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    entries.append(json.loads(line))
+    entries.sort(key=lambda entry: entry["t"])
+    return entries
+
+async def replay(
+    entries: List[Dict[str, Any]],
+    base_url: str,
+    speed: float,
+    concurrency: int,
+    password: str,
+    headers: Dict[str, str]
+) -> List[Dict[str, Any]]:
+    results: List[Dict[str, Any]] = []
+    semaphore = asyncio.Semaphore(concurrency)
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=60.0, limits=limits, headers=headers) as client:
+        async def issue(entry: Dict[str, Any], started: float) -> None:
+            if speed > 0:
+                delay = entry["t"] / speed - (time.perf_counter() - started)
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            async with semaphore:
+                url = entry["path"] + (f"?{entry['query']}" if entry.get("query") else "")
+                body = restore_secrets(entry["body"], password) if "body" in entry else None
+                request_started = time.perf_counter()
+                status: Optional[int] = None
+                try:
+                    response = await client.request(entry["method"], url, json=body)
+                    status = response.status_code
+                except httpx.HTTPError as e:
+                    logger.debug(f"Replay of {url} failed: {str(e)}")
+                results.append({
+                    "route": route_of(entry),
+                    "recorded_ms": entry.get("duration_ms", 0.0),
+                    "replayed_ms": (time.perf_counter() - request_started) * 1000,
+                    "recorded_status": entry.get("status"),
+                    "status": status,
+                })
+
+        started = time.perf_counter()
+        offset = entries[0]["t"] if entries else 0.0
+        for entry in entries:
+            entry["t"] -= offset
+        await asyncio.gather(*(issue(entry, started) for entry in entries if "body_omitted" not in entry))
+    return results
+
+def report(results: List[Dict[str, Any]]) -> Dict[str, Any]:
+    routes: Dict[str, List[Dict[str, Any]]] = {}
+    for result in results:
+        routes.setdefault(result["route"], []).append(result)
+    summary = {}
+    for route, items in sorted(routes.items()):
+        recorded = sorted(item["recorded_ms"] for item in items)
+        replayed = sorted(item["replayed_ms"] for item in items)
+        summary[route] = {
+            "requests": len(items),
+            "status_mismatches": sum(1 for item in items if item["status"] != item["recorded_status"]),
+        }
+        for name, fraction in [("p50", 0.50), ("p95", 0.95), ("p99", 0.99)]:
+            before = percentile(recorded, fraction)
+            after = percentile(replayed, fraction)
+            summary[route][f"{name}_recorded_ms"] = round(before, 2)
+            summary[route][f"{name}_replayed_ms"] = round(after, 2)
+            summary[route][f"{name}_delta_pct"] = round((after - before) / before * 100, 1) if before > 0 else None
+    return summary
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Replay captured API traffic")
+    parser.add_argument("capture", nargs="+", help="One or more .jsonl.gz capture files")
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--speed", type=float, default=1.0, help="1 = real time, N = N times faster, 0 = as fast as possible")
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--password", default="123456", help="Substituted for redacted passwords")
+    parser.add_argument("--header", action="append", default=[], help="Extra header as 'Name: value'; repeatable")
+    parser.add_argument("--output", help="Write the JSON report to this file")
+    return parser.parse_args()
+
+async def main() -> int:
+    args = parse_args()
+    entries = load_capture(args.capture)
+    headers = dict(header.split(":", 1) for header in args.header)
+    headers = {key.strip(): value.strip() for key, value in headers.items()}
+    skipped = sum(1 for entry in entries if "body_omitted" in entry)
+    logger.info(f"Replaying {len(entries) - skipped} requests ({skipped} with omitted bodies skipped) at speed {args.speed}")
+
+    started = time.perf_counter()
+    results = await replay(entries, args.base_url, args.speed, args.concurrency, args.password, headers)
+    summary = {
+        "elapsed_s": round(time.perf_counter() - started, 2),
+        "requests": len(results),
+        "errors": sum(1 for result in results if result["status"] is None or result["status"] >= 500),
+        "routes": report(results),
+    }
+    print(json.dumps(summary, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(summary, f, indent=2)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,261 @@
+"""
+Drive realistic scenarios against a running backend and record latency baselines.
+
+Scenarios:
+    teacher_save_grid  - a teacher saves a full FAT grid for one of their classes via POST /api/internal-marks
+    admin_students     - an admin opens the student list via GET /api/students
+    student_login      - students log in via POST /api/login
+
+Each run reports p50/p95/p99 latency, throughput and error counts per scenario.
+``--save-baseline`` stores the result; ``--baseline`` compares a run against a
+stored result and exits non-zero when a percentile regresses by more than
+``--tolerance``.
+
+Usage (from the BackEnd directory, with the API on :8000 and a seeded database):
+
+    python -m loadtest.run --duration 30 --concurrency 50 --save-baseline loadtest/baselines/local.json
+    python -m loadtest.run --duration 30 --concurrency 50 --baseline loadtest/baselines/local.json
+
+All virtual users share one client address, so start the API with login
+throttling relaxed (e.g. LOGIN_CLIENT_BURST=100000 LOGIN_CLIENT_PER_SECOND=100000)
+unless the throttle itself is under test.
+"""
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
+from typing import Dict, Any, List, Callable, Awaitable
+from datetime import date
+import argparse
+import asyncio
+import json
+import logging
+import math
+import os
+import platform
+import random
+import sys
+import time
+import httpx
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+MONGODB_URL = "mongodb://localhost:27017"
+DATABASE_NAME = "satscore"
+DEFAULT_PASSWORD = "123456"
+ADMIN_EMAIL = "admin@gmail.com"
+SAMPLE_SIZE = 500
+
+class Fixtures:
+    """Identifiers sampled from the seeded database so requests hit real documents."""
+
+    def __init__(self):
+        self.classes: List[Dict[str, Any]] = []  # teacher login, subject_id and the roster of student ids
+        self.registration_numbers: List[str] = []
+        self.tokens: Dict[str, str] = {}
+
+async def login(client: httpx.AsyncClient, fixtures: Fixtures, key: str, payload: Dict[str, Any]) -> Dict[str, str]:
+    """Log in once per identity and reuse the bearer token, as the browser does."""
+    if key not in fixtures.tokens:
+        response = await client.post("/api/login", json=payload)
+        response.raise_for_status()
+        fixtures.tokens[key] = response.json()["access_token"]
+    return {"Authorization": f"Bearer {fixtures.tokens[key]}"}
+
+async def load_fixtures(db: AsyncIOMotorDatabase, rng: random.Random) -> Fixtures:
+    fixtures = Fixtures()
+    teachers = await db["db.teachers"].find(
+        {"subjectsHandled.0": {"$exists": True}},
+        {"subjectsHandled": 1, "teacherId": 1, "fullName": 1}
+    ).to_list(length=SAMPLE_SIZE)
+    for teacher in teachers:
+        assignment = rng.choice(teacher["subjectsHandled"])
+        roster = await db["students"].find(
+            {
+                "courses": assignment["subject_id"],
+                "section": assignment["section"],
+                "yearOfJoining": int(assignment["batch"]) if str(assignment["batch"]).isdigit() else assignment["batch"]
+            },
+            {"_id": 1}
+        ).to_list(length=None)
+        if roster:
+            fixtures.classes.append({
+                "teacherId": teacher["teacherId"],
+                "teacherName": teacher["fullName"],
+                "subject_id": str(assignment["subject_id"]),
+                "student_ids": [str(student["_id"]) for student in roster]
+            })
+    async for student in db["students"].aggregate([
+        {"$sample": {"size": SAMPLE_SIZE}},
+        {"$project": {"registrationNumber": 1}}
+    ]):
+        fixtures.registration_numbers.append(student["registrationNumber"])
+    logger.info(f"Loaded fixtures: {len(fixtures.classes)} classes, {len(fixtures.registration_numbers)} students")
+    return fixtures
+
+async def teacher_save_grid(client: httpx.AsyncClient, fixtures: Fixtures, rng: random.Random) -> httpx.Response:
+    grid = rng.choice(fixtures.classes)
+    headers = await login(client, fixtures, f"teacher:{grid['teacherId']}", {
+        "role": "teacher",
+        "teacherId": grid["teacherId"],
+        "teacherName": grid["teacherName"],
+        "password": DEFAULT_PASSWORD,
+    })
+    academic_year = f"{date.today().year}-{date.today().year + 1}"
+    fat_number = rng.randint(1, 3)
+    payload = {
+        "marks": [
+            {
+                "student_id": student_id,
+                "subject_id": grid["subject_id"],
+                "fat_number": fat_number,
+                "fat": rng.randint(0, 100),
+                "assignments": [rng.randint(0, 100) for _ in range(3)],
+                "academic_year": academic_year,
+            }
+            for student_id in grid["student_ids"]
+        ]
+    }
+    return await client.post("/api/internal-marks", json=payload, headers=headers)
+
+async def admin_students(client: httpx.AsyncClient, fixtures: Fixtures, rng: random.Random) -> httpx.Response:
+    headers = await login(client, fixtures, "admin", {"role": "admin", "email": ADMIN_EMAIL, "password": DEFAULT_PASSWORD})
+    return await client.get("/api/students", headers=headers)
+
+async def student_login(client: httpx.AsyncClient, fixtures: Fixtures, rng: random.Random) -> httpx.Response:
+    return await client.post("/api/login", json={
+        "role": "student",
+        "studentId": rng.choice(fixtures.registration_numbers),
+        "password": DEFAULT_PASSWORD,
+    })
+
+SCENARIOS: Dict[str, Callable[[httpx.AsyncClient, Fixtures, random.Random], Awaitable[httpx.Response]]] = {
+    "teacher_save_grid": teacher_save_grid,
+    "admin_students": admin_students,
+    "student_login": student_login,
+}
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    # The smallest value with at least ``fraction`` of the samples at or below it; rounded first so 0.07 * 100 is rank 7, not 8
+    rank = max(0, min(len(sorted_values) - 1, math.ceil(round(fraction * len(sorted_values), 9)) - 1))
+    return sorted_values[rank]
+
+def summarize(latencies: List[float], errors: int, elapsed: float) -> Dict[str, Any]:
+    latencies = sorted(latencies)
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "throughput_rps": round(len(latencies) / elapsed, 2) if elapsed > 0 else 0.0,
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 2),
+        "max_ms": round(latencies[-1] * 1000, 2) if latencies else 0.0,
+    }
+
+async def run_scenario(
+    name: str,
+    base_url: str,
+    fixtures: Fixtures,
+    concurrency: int,
+    duration: float,
+    seed: int
+) -> Dict[str, Any]:
+    scenario = SCENARIOS[name]
+    latencies: List[float] = []
+    errors = 0
+    deadline = time.perf_counter() + duration
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=60.0, limits=limits) as client:
+        async def user(index: int) -> None:
+            nonlocal errors
+            rng = random.Random(seed * 10007 + index)
+            while time.perf_counter() < deadline:
+                started = time.perf_counter()
+                try:
+                    response = await scenario(client, fixtures, rng)
+                    if response.status_code >= 400:
+                        errors += 1
+                except httpx.HTTPError as e:
+                    errors += 1
+                    logger.debug(f"{name} request failed: {str(e)}")
+                latencies.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(user(index) for index in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    result = summarize(latencies, errors, elapsed)
+    logger.info(f"{name}: {result}")
+    return result
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """Return human readable regressions of ``current`` against ``baseline``."""
+    regressions = []
+    for name, result in current["scenarios"].items():
+        previous = baseline.get("scenarios", {}).get(name)
+        if not previous:
+            continue
+        for metric in ["p50_ms", "p95_ms", "p99_ms"]:
+            if previous[metric] > 0 and result[metric] > previous[metric] * (1 + tolerance):
+                regressions.append(f"{name} {metric}: {previous[metric]} -> {result[metric]}")
+        if previous["throughput_rps"] > 0 and result["throughput_rps"] < previous["throughput_rps"] * (1 - tolerance):
+            regressions.append(f"{name} throughput_rps: {previous['throughput_rps']} -> {result['throughput_rps']}")
+    return regressions
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Run load-test scenarios against the SAT Score API")
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--mongodb-url", default=MONGODB_URL)
+    parser.add_argument("--database", default=DATABASE_NAME)
+    parser.add_argument("--scenario", action="append", choices=sorted(SCENARIOS), help="Repeatable; defaults to all")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--duration", type=float, default=20.0, help="Seconds per scenario")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--save-baseline", help="Write the results to this JSON file")
+    parser.add_argument("--baseline", help="Compare the results against this JSON file")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed relative regression, e.g. 0.2 for 20%%")
+    return parser.parse_args()
+
+async def main() -> int:
+    args = parse_args()
+    rng = random.Random(args.seed)
+    mongo = AsyncIOMotorClient(args.mongodb_url)
+    try:
+        fixtures = await load_fixtures(mongo[args.database], rng)
+    finally:
+        mongo.close()
+
+    results = {
+        "recorded_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "host": platform.node(),
+        "concurrency": args.concurrency,
+        "duration": args.duration,
+        "scenarios": {},
+    }
+    for name in args.scenario or list(SCENARIOS):
+        results["scenarios"][name] = await run_scenario(name, args.base_url, fixtures, args.concurrency, args.duration, args.seed)
+
+    print(json.dumps(results, indent=2))
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(os.path.abspath(args.save_baseline)), exist_ok=True)
+        with open(args.save_baseline, "w") as f:
+            json.dump(results, f, indent=2)
+        logger.info(f"Baseline saved to {args.save_baseline}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            for regression in regressions:
+                logger.error(f"Regression: {regression}")
+            return 1
+        logger.info(f"No regressions against {args.baseline}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,298 @@
+"""
+Seed a local MongoDB with a synthetic college for load testing.
+
+Documents are written in the same shape the routers read them:
+departments in ``db.departments``, subjects in ``db.subjects`` (keyed by
+department ObjectId, ``yearOfStudy`` and ``semester`` exactly as
+``StudentDB.get_applicable_courses`` queries them), teachers in
+``db.teachers`` with ``subjectsHandled`` and students with ``courses``,
+``marks``, ``internal_marks`` and ``sat_marks``.
+
+Usage (from the BackEnd directory):
+
+    python -m loadtest.seed --students 40000 --drop
+"""
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
+from bson import ObjectId
+from typing import Dict, Any, List
+from datetime import date
+import argparse
+import asyncio
+import logging
+import random
+import time
+from search import student_search_keys, teacher_search_keys, SEARCH_KEYS_FIELD
+from assessment import aggregate_internal, DEFAULT_INTERNAL_RULES
+from rosters import rebuild_rosters
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+MONGODB_URL = "mongodb://localhost:27017"
+DATABASE_NAME = "satscore"
+
+DEPARTMENT_NAMES = [
+    ("Computer Science and Engineering", "CS"),
+    ("Electronics and Communication Engineering", "EC"),
+    ("Electrical and Electronics Engineering", "EE"),
+    ("Mechanical Engineering", "ME"),
+    ("Civil Engineering", "CE"),
+    ("Information Technology", "IT"),
+    ("Artificial Intelligence and Data Science", "AD"),
+    ("Biomedical Engineering", "BM"),
+    ("Chemical Engineering", "CH"),
+    ("Aeronautical Engineering", "AE"),
+]
+FIRST_NAMES = ["Arun", "Priya", "Karthik", "Divya", "Rahul", "Sneha", "Vijay", "Anitha", "Suresh", "Meena",
+               "Ravi", "Lakshmi", "Ajay", "Keerthi", "Manoj", "Deepa", "Naveen", "Kavya", "Prakash", "Swathi"]
+LAST_NAMES = ["Kumar", "Raj", "Krishnan", "Subramanian", "Iyer", "Nair", "Reddy", "Sharma", "Menon", "Pillai"]
+SECTIONS = ["A", "B", "C"]
+BLOOD_GROUPS = ["A+", "A-", "B+", "B-", "O+", "O-", "AB+", "AB-"]
+BATCH_SIZE = 1000
+
+def build_departments(count: int) -> List[Dict[str, Any]]:
+    departments = []
+    for index in range(count):
+        name, short_name = DEPARTMENT_NAMES[index % len(DEPARTMENT_NAMES)]
+        if index >= len(DEPARTMENT_NAMES):
+            name = f"{name} {index // len(DEPARTMENT_NAMES) + 1}"
+        departments.append({
+            "_id": ObjectId(),
+            "code": short_name.lower() if index < len(DEPARTMENT_NAMES) else f"{short_name.lower()}{index}",
+            "name": name,
+            "shortName": short_name,
+            "numberOfClasses": len(SECTIONS) * 4,
+            "totalTeachers": 0,
+            "totalStudents": 0,
+        })
+    return departments
+
+def build_subjects(departments: List[Dict[str, Any]], per_semester: int, rng: random.Random) -> List[Dict[str, Any]]:
+    subjects = []
+    for dept in departments:
+        for semester in range(1, 9):
+            year_of_study = str((semester + 1) // 2)
+            for index in range(per_semester):
+                subjects.append({
+                    "_id": ObjectId(),
+                    "code": f"{dept['code'].upper()}{semester}{index + 1:02d}",
+                    "name": f"{dept['shortName']} Subject {semester}.{index + 1}",
+                    "department": dept["_id"],
+                    "yearOfStudy": year_of_study,
+                    "semester": str(semester),
+                    "credits": rng.choice([2, 3, 3, 4]),
+                    "totalClasses": rng.randint(30, 60),
+                })
+    return subjects
+
+def cohort_semester(year_of_study: int) -> str:
+    """Students are seeded in the odd (first) term of their year."""
+    return str(year_of_study * 2 - 1)
+
+def random_name(rng: random.Random) -> str:
+    return f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+
+def random_phone(rng: random.Random) -> str:
+    return str(rng.randint(6000000000, 9999999999))
+
+def build_teachers(
+    departments: List[Dict[str, Any]],
+    curriculum: Dict[tuple, List[Dict[str, Any]]],
+    per_department: int,
+    current_year: int,
+    rng: random.Random
+) -> List[Dict[str, Any]]:
+    teachers = []
+    serial = 0
+    for dept in departments:
+        # Every (subject, batch, section) of the current term gets one teacher, round robin
+        assignments = []
+        for year_of_study in range(1, 5):
+            batch = str(current_year - year_of_study + 1)
+            for subject in curriculum.get((dept["_id"], str(year_of_study), cohort_semester(year_of_study)), []):
+                for section in SECTIONS:
+                    assignments.append({"subject_id": subject["_id"], "batch": batch, "section": section})
+        handled: List[List[Dict[str, Any]]] = [[] for _ in range(per_department)]
+        for index, assignment in enumerate(assignments):
+            handled[index % per_department].append(assignment)
+        for index in range(per_department):
+            serial += 1
+            teachers.append({
+                "_id": ObjectId(),
+                "teacherId": f"{current_year}T{serial:04d}",
+                "fullName": random_name(rng),
+                "dateOfBirth": f"{rng.randint(1965, 1995)}-0{rng.randint(1, 9)}-1{rng.randint(0, 9)}T00:00:00",
+                "gender": rng.choice(["male", "female"]),
+                "phoneNumber": random_phone(rng),
+                "email": f"teacher{serial}@college.edu",
+                "address": f"{rng.randint(1, 200)} College Road",
+                "city": "Chennai",
+                "state": "Tamil Nadu",
+                "postalCode": "600001",
+                "designation": rng.choice(["Assistant Professor", "Associate Professor", "Professor"]),
+                "department": dept["_id"],
+                "subjectsHandled": handled[index],
+                "yearsOfExperience": rng.randint(1, 30),
+                "qualification": rng.choice(["M.E.", "M.Tech.", "Ph.D."]),
+                "joiningDate": f"{rng.randint(2000, current_year)}-06-01T00:00:00",
+            })
+            teachers[-1][SEARCH_KEYS_FIELD] = teacher_search_keys(teachers[-1])
+    return teachers
+
+def build_student(
+    dept: Dict[str, Any],
+    year_of_study: int,
+    serial: int,
+    roll: int,
+    current_year: int,
+    courses: List[Dict[str, Any]],
+    rng: random.Random
+) -> Dict[str, Any]:
+    year_of_joining = current_year - year_of_study + 1
+    today = date.today().isoformat()
+    internal_marks = {}
+    sat_marks = {}
+    marks = {}
+    for course in courses:
+        course_id = str(course["_id"])
+        internal_marks[course_id] = {
+            "fat1": float(rng.randint(20, 100)),
+            "fat2": float(rng.randint(20, 100)),
+            "fat3": float(rng.randint(20, 100)),
+            "assignments": [float(rng.randint(40, 100)) for _ in range(rng.randint(1, 5))],
+        }
+        internal_marks[course_id]["internal"] = aggregate_internal(internal_marks[course_id], DEFAULT_INTERNAL_RULES)
+        sat_marks[course_id] = {
+            "marks": float(rng.randint(20, 100)),
+            "isSubmitted": rng.random() < 0.5,
+            "updated_at": today,
+        }
+        if rng.random() < 0.3:
+            marks[course_id] = float(rng.randint(30, 100))
+    student = {
+        "fullName": random_name(rng),
+        "dateOfBirth": f"{year_of_joining - 18}-0{rng.randint(1, 9)}-1{rng.randint(0, 9)}",
+        "gender": rng.choice(["male", "female"]),
+        "phoneNumber": random_phone(rng),
+        "email": f"student{serial}@college.edu",
+        "parentName": random_name(rng),
+        "parentContact": random_phone(rng),
+        "address": f"{rng.randint(1, 500)} Main Street",
+        "city": "Chennai",
+        "state": "Tamil Nadu",
+        "postalCode": "600001",
+        "department": dept["_id"],
+        "program": rng.choice(["BE", "BTECH"]),
+        "yearOfStudy": str(year_of_study),
+        "semester": cohort_semester(year_of_study),
+        "section": rng.choice(SECTIONS),
+        "admissionType": rng.choice(["regular", "regular", "lateral", "management"]),
+        "scholarshipStatus": rng.random() < 0.2,
+        "hostelStudent": rng.random() < 0.4,
+        "bloodGroup": rng.choice(BLOOD_GROUPS),
+        "emergencyContact": random_phone(rng),
+        "remarks": "",
+        "yearOfJoining": year_of_joining,
+        "registrationNumber": f"{year_of_joining}{dept['shortName']}{roll:04d}",
+        "courses": [course["_id"] for course in courses],
+        "marks": marks,
+        "internal_marks": internal_marks,
+        "sat_marks": sat_marks,
+        "academic_year": f"{current_year}-{current_year + 1}",
+        "updated_at": today,
+    }
+    student[SEARCH_KEYS_FIELD] = student_search_keys(student)
+    return student
+
+async def seed(db: AsyncIOMotorDatabase, args: argparse.Namespace) -> Dict[str, int]:
+    rng = random.Random(args.seed)
+    current_year = date.today().year
+
+    if args.drop:
+        for name in ["db.departments", "db.subjects", "db.teachers", "students", "mark_criteria"]:
+            await db[name].drop()
+        logger.info(f"Dropped existing collections in {db.name}")
+
+    departments = build_departments(args.departments)
+    subjects = build_subjects(departments, args.subjects_per_semester, rng)
+    curriculum: Dict[tuple, List[Dict[str, Any]]] = {}
+    for subject in subjects:
+        curriculum.setdefault((subject["department"], subject["yearOfStudy"], subject["semester"]), []).append(subject)
+    teachers = build_teachers(departments, curriculum, args.teachers_per_department, current_year, rng)
+
+    await db["db.departments"].insert_many(departments)
+    await db["db.subjects"].insert_many(subjects)
+    await db["db.teachers"].insert_many(teachers)
+    await db["mark_criteria"].update_one(
+        {},
+        {"$setOnInsert": {"internal": 30, "external": 70, "formula": "(internal * 0.3) + (external * 0.7)"}},
+        upsert=True
+    )
+
+    students_per_department: Dict[ObjectId, int] = {dept["_id"]: 0 for dept in departments}
+    rolls: Dict[tuple, int] = {}
+    batch = []
+    inserted = 0
+    for serial in range(args.students):
+        dept = departments[serial % len(departments)]
+        year_of_study = serial // len(departments) % 4 + 1
+        students_per_department[dept["_id"]] += 1
+        # Registration numbers are unique per (year of joining, department), as in generate_registration_number
+        roll = rolls[(dept["_id"], year_of_study)] = rolls.get((dept["_id"], year_of_study), 0) + 1
+        courses = curriculum.get((dept["_id"], str(year_of_study), cohort_semester(year_of_study)), [])
+        batch.append(build_student(dept, year_of_study, serial + 1, roll, current_year, courses, rng))
+        if len(batch) >= BATCH_SIZE:
+            await db["students"].insert_many(batch, ordered=False)
+            inserted += len(batch)
+            batch = []
+            logger.info(f"Inserted {inserted}/{args.students} students")
+    if batch:
+        await db["students"].insert_many(batch, ordered=False)
+        inserted += len(batch)
+    # Students were inserted directly, so the rosters are built in one pass
+    await rebuild_rosters(db)
+
+    teachers_per_department: Dict[ObjectId, int] = {}
+    for teacher in teachers:
+        teachers_per_department[teacher["department"]] = teachers_per_department.get(teacher["department"], 0) + 1
+    for dept in departments:
+        await db["db.departments"].update_one(
+            {"_id": dept["_id"]},
+            {"$set": {
+                "totalStudents": students_per_department[dept["_id"]],
+                "totalTeachers": teachers_per_department.get(dept["_id"], 0)
+            }}
+        )
+
+    return {
+        "departments": len(departments),
+        "subjects": len(subjects),
+        "teachers": len(teachers),
+        "students": inserted,
+    }
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Seed a synthetic college for load testing")
+    parser.add_argument("--mongodb-url", default=MONGODB_URL)
+    parser.add_argument("--database", default=DATABASE_NAME)
+    parser.add_argument("--departments", type=int, default=8)
+    parser.add_argument("--subjects-per-semester", type=int, default=6)
+    parser.add_argument("--teachers-per-department", type=int, default=20)
+    parser.add_argument("--students", type=int, default=20000)
+    parser.add_argument("--seed", type=int, default=42, help="Random seed, so runs are reproducible")
+    parser.add_argument("--drop", action="store_true", help="Drop the seeded collections first")
+    return parser.parse_args()
+
+async def main() -> None:
+    args = parse_args()
+    client = AsyncIOMotorClient(args.mongodb_url)
+    try:
+        started = time.perf_counter()
+        counts = await seed(client[args.database], args)
+        logger.info(f"Seeded {counts} into {args.database} in {time.perf_counter() - started:.1f}s")
+    finally:
+        client.close()
+
+if __name__ == "__main__":
+    asyncio.run(main())
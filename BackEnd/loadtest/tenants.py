@@ -0,0 +1,146 @@
+"""
+Measure request latency on one worker as tenants are added.
+
+For each ``--tenants`` count, starts an API worker with that many tenants in
+TENANTS, so it runs one job runner, schedule loop and set of backfills per
+tenant, and drives real requests against it for ``--duration`` seconds at
+``--concurrency``. Requests go to the default tenant (the seeded database),
+or with ``--spread`` round-robin over every tenant. Also reports the
+operations per second MongoDB served during the run, which shows the
+background polling the extra tenants add. The run fails (exit code 1) if p99
+at the most tenants exceeds ``--max-ratio`` times p99 at the fewest.
+
+Usage (from the BackEnd directory, with MongoDB running and a seeded
+default tenant; the extra tenants' databases are created empty):
+
+    python -m loadtest.tenants --tenants 1 10 50 --duration 20 --concurrency 20
+    python -m loadtest.tenants --tenants 1 50 --spread
+"""
+from motor.motor_asyncio import AsyncIOMotorClient
+from typing import Dict, Any, List
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import time
+import httpx
+from tenants import TENANT_HEADER, DEFAULT_TENANT
+from loadtest.run import percentile
+from loadtest.coherence import start_workers, wait_ready, ADMIN_EMAIL, DEFAULT_PASSWORD
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+MONGODB_URL = os.getenv("MONGODB_URL", "mongodb://localhost:27017")
+# Reads every page makes; each is a real round trip through routing, auth and the database
+PATHS = ["/api/departments", "/api/subjects", "/api/students?fields=fullName,registrationNumber", "/api/bootstrap?page=admin-subjects"]
+COUNTED_OPERATIONS = ("query", "getmore", "command", "insert", "update", "delete")
+
+def tenant_slugs(count: int) -> List[str]:
+    return [DEFAULT_TENANT] + [f"college-{index}" for index in range(1, count)]
+
+async def server_operations(client: AsyncIOMotorClient) -> int:
+    status = await client.admin.command("serverStatus")
+    return sum(status["opcounters"].get(name, 0) for name in COUNTED_OPERATIONS)
+
+async def tenant_headers(client: httpx.AsyncClient, base_url: str, slugs: List[str]) -> Dict[str, Dict[str, str]]:
+    """An admin token per tenant; tokens are only accepted by the tenant that issued them."""
+    headers = {}
+    for slug in slugs:
+        response = await client.post(
+            f"{base_url}/api/login",
+            json={"role": "admin", "email": ADMIN_EMAIL, "password": DEFAULT_PASSWORD},
+            headers={TENANT_HEADER: slug}
+        )
+        response.raise_for_status()
+        headers[slug] = {TENANT_HEADER: slug, "Authorization": f"Bearer {response.json()['access_token']}"}
+    return headers
+
+async def drive(base_url: str, slugs: List[str], duration: float, concurrency: int) -> Dict[str, Any]:
+    latencies: List[float] = []
+    errors = 0
+    async with httpx.AsyncClient(timeout=60.0) as client:
+        await wait_ready(client, base_url, timeout=60.0)
+        headers = await tenant_headers(client, base_url, slugs)
+        deadline = time.monotonic() + duration
+
+        async def user(index: int) -> None:
+            nonlocal errors
+            sent = index
+            while time.monotonic() < deadline:
+                slug = slugs[sent % len(slugs)]
+                path = PATHS[sent % len(PATHS)]
+                sent += concurrency
+                started = time.perf_counter()
+                try:
+                    response = await client.get(f"{base_url}{path}", headers=headers[slug])
+                    if response.status_code >= 400:
+                        errors += 1
+                except httpx.HTTPError:
+                    errors += 1
+                latencies.append(time.perf_counter() - started)
+
+        started = time.monotonic()
+        await asyncio.gather(*(user(index) for index in range(concurrency)))
+        elapsed = time.monotonic() - started
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "throughput": len(latencies) / elapsed if elapsed else 0.0,
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+    }
+
+async def measure(count: int, port: int, duration: float, concurrency: int, settle: float, spread: bool) -> Dict[str, Any]:
+    slugs = tenant_slugs(count)
+    # Logins from one address for every tenant must not be throttled
+    worker = start_workers(1, port, {"TENANTS": ",".join(slugs[1:]), "LOGIN_CLIENT_BURST": "100000"})[0]
+    mongo = AsyncIOMotorClient(MONGODB_URL)
+    try:
+        base_url = f"http://127.0.0.1:{port}"
+        async with httpx.AsyncClient(timeout=60.0) as client:
+            await wait_ready(client, base_url, timeout=60.0)
+        # Let the per-tenant backfills and first job polls start before timing
+        await asyncio.sleep(settle)
+        before = await server_operations(mongo)
+        result = await drive(base_url, slugs if spread else [DEFAULT_TENANT], duration, concurrency)
+        after = await server_operations(mongo)
+        return {"tenants": count, **result, "db_ops_per_s": (after - before) / duration}
+    finally:
+        mongo.close()
+        worker.terminate()
+        worker.wait(timeout=30)
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark request latency on one worker against the number of tenants")
+    parser.add_argument("--tenants", type=int, nargs="+", default=[1, 10, 50])
+    parser.add_argument("--port", type=int, default=8200)
+    parser.add_argument("--duration", type=float, default=20.0, help="Seconds of load per tenant count")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--settle", type=float, default=3.0, help="Seconds to wait after startup before measuring")
+    parser.add_argument("--spread", action="store_true", help="Spread requests over every tenant instead of the default one")
+    parser.add_argument("--max-ratio", type=float, default=1.5, help="Fail if p99 at the most tenants exceeds this multiple of p99 at the fewest")
+    return parser.parse_args()
+
+def main() -> int:
+    args = parse_args()
+    results = [
+        asyncio.run(measure(count, args.port, args.duration, args.concurrency, args.settle, args.spread))
+        for count in sorted(set(args.tenants))
+    ]
+    for result in results:
+        logger.info(
+            f"{result['tenants']:>5} tenants: p50={result['p50_ms']:.1f}ms p99={result['p99_ms']:.1f}ms "
+            f"{result['throughput']:.0f} req/s, {result['errors']} errors over {result['requests']} requests; "
+            f"MongoDB served {result['db_ops_per_s']:.0f} ops/s"
+        )
+    ratio = results[-1]["p99_ms"] / results[0]["p99_ms"] if results[0]["p99_ms"] else 1.0
+    logger.info(f"p99 with {results[-1]['tenants']} tenants is {ratio:.2f}x the p99 with {results[0]['tenants']}")
+    failed = any(result["errors"] for result in results)
+    return 0 if ratio <= args.max_ratio and not failed else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,4 +1,4 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Depends
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
 from admin.Student import router as student_router
@@ -8,9 +8,30 @@ from admin.AssignMarks import router as marks_router
 from admin.Dashboard import router as dashboard_router
 from teacher.InternalMarks import router as internal_marks_router
 from teacher.SATMarks import router as sat_marks_router
+from teacher.Dashboard import router as teacher_dashboard_router
 from auth.login import router as login_router
-from database import Database
+from admin.Jobs import router as jobs_router
+from admin.Reports import router as reports_router
+from admin.Exports import router as exports_router
+from admin.Search import router as search_router
+from admin.Bootstrap import router as bootstrap_router
+from student.Results import router as student_results_router
+from admin.Promotion import router as promotion_router
+from admin.Events import router as events_router
+from database import Database, ensure_indexes
+from dependencies import get_current_user, require_admin, require_staff, require_student
+from auth.security import require_secret_key
+from capture import TrafficRecorder, TrafficCaptureMiddleware
+from invalidation import InvalidationBus
+from events import MarksEventBus, marks_events
+from jobs import JobRunner
+from reports import shutdown_render_pool
+from search import backfill_search_keys
+from assessment import backfill_internal_scores
+from rosters import backfill_rosters
+import asyncio
 import logging
+import os
 import uvicorn
 from starlette.middleware.errors import ServerErrorMiddleware
 
@@ -19,20 +40,59 @@ logging.basicConfig(level=logging.INFO)
 logging.getLogger("uvicorn.access").setLevel(logging.WARNING)
 logger = logging.getLogger(__name__)
 
+# Tracebacks in error responses are for local development only
+DEBUG = os.getenv("APP_DEBUG", "false").lower() in ("1", "true", "yes")
+
 # Database initialization
 db = Database()
 
+# Optional traffic capture for replay-based performance testing (see loadtest/replay.py)
+TRAFFIC_CAPTURE_FILE = os.getenv("TRAFFIC_CAPTURE_FILE")
+traffic_recorder = TrafficRecorder(TRAFFIC_CAPTURE_FILE) if TRAFFIC_CAPTURE_FILE else None
+
+# How workers tell each other to drop cached versions: auto, change_stream or capped
+CACHE_INVALIDATION_MODE = os.getenv("CACHE_INVALIDATION_MODE", "auto")
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    require_secret_key()
     try:
         await db.startup()
         logger.info("Database connection established")
         app.db = db
+        app.tenants = db.tenants
+        app.backfills = []
+        app.job_runners = []
+        # Every tenant database gets its indexes, backfills and job runner; they all share the client's pool
+        for tenant_db in db.tenants.databases.values():
+            await ensure_indexes(tenant_db)
+            app.backfills.append(asyncio.create_task(backfill_search_keys(tenant_db)))
+            # These only claim their backfill jobs; one worker runs each
+            await backfill_internal_scores(tenant_db)
+            await backfill_rosters(tenant_db)
+            job_runner = JobRunner(tenant_db)
+            await job_runner.start()
+            app.job_runners.append(job_runner)
+        app.invalidation_bus = InvalidationBus(db.db, mode=CACHE_INVALIDATION_MODE, databases=[tenant_db.name for tenant_db in db.tenants.databases.values()])
+        await app.invalidation_bus.start()
+        app.marks_event_bus = MarksEventBus(db.db, marks_events)
+        await app.marks_event_bus.start()
+        if traffic_recorder:
+            traffic_recorder.start()
         logger.info("Application startup complete")
     except Exception as e:
         logger.error(f"Failed to connect to database: {str(e)}")
         raise
     yield
+    for task in app.backfills:
+        task.cancel()
+    for job_runner in app.job_runners:
+        await job_runner.stop()
+    await app.marks_event_bus.stop()
+    await app.invalidation_bus.stop()
+    shutdown_render_pool()
+    if traffic_recorder:
+        traffic_recorder.close()
     try:
         await db.shutdown()
         logger.info("Database connection closed")
@@ -44,7 +104,7 @@ app = FastAPI(title="SAT Score Backend", lifespan=lifespan)
 
 app.add_middleware(
     ServerErrorMiddleware,
-    debug=True
+    debug=DEBUG
 )
 
 # CORS middleware with explicit origins and debugging
@@ -61,6 +121,9 @@ app.add_middleware(
     expose_headers=["*"],
 )
 
+if traffic_recorder:
+    app.add_middleware(TrafficCaptureMiddleware, recorder=traffic_recorder)
+
 # Log CORS configuration on startup
 logger.info("CORS configured with allow_origins: %s", [
     "http://localhost:5173",
@@ -69,40 +132,85 @@ logger.info("CORS configured with allow_origins: %s", [
 ])
 
 try:
-    app.include_router(student_router, prefix="/api")
+    app.include_router(student_router, prefix="/api", dependencies=[Depends(require_staff)])
     logger.info("Student router included successfully")
 except Exception as e:
     logger.error(f"Failed to include student_router: {str(e)}")
 try:
-    app.include_router(department_router, prefix="/api")
+    app.include_router(department_router, prefix="/api", dependencies=[Depends(get_current_user)])
     logger.info("Department router included successfully")
 except Exception as e:
     logger.error(f"Failed to include department_router: {str(e)}")
 try:
-    app.include_router(teacher_router, prefix="/api")
+    app.include_router(teacher_router, prefix="/api", dependencies=[Depends(require_admin)])
     logger.info("Teacher router included successfully")
 except Exception as e:
     logger.error(f"Failed to include teacher_router: {str(e)}")
 try:
-    app.include_router(marks_router, prefix="/api")
+    app.include_router(marks_router, prefix="/api", dependencies=[Depends(require_admin)])
     logger.info("Marks router included successfully")
 except Exception as e:
     logger.error(f"Failed to include marks_router: {str(e)}")
 try:
-    app.include_router(dashboard_router, prefix="/api")
+    app.include_router(dashboard_router, prefix="/api", dependencies=[Depends(require_admin)])
     logger.info("Dashboard router included successfully")
 except Exception as e:
     logger.error(f"Failed to include dashboard_router: {str(e)}")
 try:
-    app.include_router(internal_marks_router, prefix="/api")
+    app.include_router(internal_marks_router, prefix="/api", dependencies=[Depends(require_staff)])
     logger.info("Internal marks router included successfully")
 except Exception as e:
     logger.error(f"Failed to include internal_marks_router: {str(e)}")
 try:
-    app.include_router(sat_marks_router, prefix="/api")
+    app.include_router(sat_marks_router, prefix="/api", dependencies=[Depends(require_staff)])
     logger.info("SAT marks router included successfully")
 except Exception as e:
     logger.error(f"Failed to include sat_marks_router: {str(e)}")
+try:
+    app.include_router(teacher_dashboard_router, prefix="/api")
+    logger.info("Teacher dashboard router included successfully")
+except Exception as e:
+    logger.error(f"Failed to include teacher_dashboard_router: {str(e)}")
+try:
+    app.include_router(jobs_router, prefix="/api", dependencies=[Depends(get_current_user)])
+    logger.info("Jobs router included successfully")
+except Exception as e:
+    logger.error(f"Failed to include jobs_router: {str(e)}")
+try:
+    app.include_router(reports_router, prefix="/api", dependencies=[Depends(get_current_user)])
+    logger.info("Reports router included successfully")
+except Exception as e:
+    logger.error(f"Failed to include reports_router: {str(e)}")
+try:
+    app.include_router(exports_router, prefix="/api", dependencies=[Depends(require_admin)])
+    logger.info("Exports router included successfully")
+except Exception as e:
+    logger.error(f"Failed to include exports_router: {str(e)}")
+try:
+    app.include_router(search_router, prefix="/api", dependencies=[Depends(require_staff)])
+    logger.info("Search router included successfully")
+except Exception as e:
+    logger.error(f"Failed to include search_router: {str(e)}")
+try:
+    app.include_router(bootstrap_router, prefix="/api", dependencies=[Depends(get_current_user)])
+    logger.info("Bootstrap router included successfully")
+except Exception as e:
+    logger.error(f"Failed to include bootstrap_router: {str(e)}")
+try:
+    app.include_router(student_results_router, prefix="/api", dependencies=[Depends(require_student)])
+    logger.info("Student results router included successfully")
+except Exception as e:
+    logger.error(f"Failed to include student_results_router: {str(e)}")
+try:
+    app.include_router(promotion_router, prefix="/api", dependencies=[Depends(require_admin)])
+    logger.info("Promotion router included successfully")
+except Exception as e:
+    logger.error(f"Failed to include promotion_router: {str(e)}")
+try:
+    app.include_router(events_router, prefix="/api", dependencies=[Depends(require_admin)])
+    logger.info("Events router included successfully")
+except Exception as e:
+    logger.error(f"Failed to include events_router: {str(e)}")
 try:
     app.include_router(login_router, prefix="/api")
     logger.info("Login router included successfully")
@@ -114,4 +222,7 @@ async def root():
     return {"message": "Welcome to the SAT Score API"}
 
 if __name__ == "__main__":
+    # Development server with auto-reload; production runs through serve.py.
+    # The reloaded server inherits the environment, so it may use the development signing key.
+    os.environ.setdefault("AUTH_ALLOW_DEVELOPMENT_KEY", "true")
     uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
\ No newline at end of file
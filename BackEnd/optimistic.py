@@ -0,0 +1,43 @@
+from motor.motor_asyncio import AsyncIOMotorCollection
+from bson import ObjectId
+from typing import Dict, Any, Optional
+
+# Every per-subject marks entry (internal_marks.<subject_id>, sat_marks.<subject_id>)
+# carries a "version" counter that each write increments. A client that sends
+# the version it read gets a conditional update; a missing counter is version 0.
+VERSION_FIELD = "version"
+
+def version_path(field: str, subject_id: str) -> str:
+    return f"{field}.{subject_id}.{VERSION_FIELD}"
+
+def version_filter(field: str, subject_id: str, expected: Optional[int]) -> Dict[str, Any]:
+    """Extra filter terms that only match while the entry is still at ``expected``; empty for blind writes."""
+    if expected is None:
+        return {}
+    path = version_path(field, subject_id)
+    if expected == 0:
+        return {"$or": [{path: {"$exists": False}}, {path: 0}]}
+    return {path: expected}
+
+def current_version(entry: Optional[Dict[str, Any]]) -> int:
+    return int((entry or {}).get(VERSION_FIELD, 0) or 0)
+
+async def describe_conflict(
+    collection: AsyncIOMotorCollection,
+    student_oid: ObjectId,
+    field: str,
+    subject_id: str,
+    index: int,
+    expected: Optional[int]
+) -> Dict[str, Any]:
+    """What the client needs to merge a rejected entry: the version it raced with and the values stored now."""
+    student = await collection.find_one({"_id": student_oid}, {f"{field}.{subject_id}": 1})
+    current = ((student or {}).get(field) or {}).get(subject_id) or {}
+    return {
+        "index": index,
+        "student_id": str(student_oid),
+        "subject_id": subject_id,
+        "expected_version": expected,
+        "current_version": current_version(current),
+        "current": {key: value for key, value in current.items() if key != VERSION_FIELD},
+    }
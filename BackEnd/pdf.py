@@ -0,0 +1,176 @@
+"""
+A minimal PDF writer and the transcript / marks-sheet layouts built on it.
+
+Only the standard Helvetica fonts, text and rules are needed for these
+documents, so the writer is a few dozen lines of the PDF 1.4 object syntax
+rather than a dependency. Everything here is plain, synchronous and picklable
+so it can run in the report process pool (see reports.py).
+"""
+from typing import Dict, Any, List, Optional, Tuple
+import zlib
+
+PAGE_WIDTH = 595  # A4 in points
+PAGE_HEIGHT = 842
+MARGIN = 40
+LINE_HEIGHT = 16
+# Average Helvetica glyph width as a fraction of the font size, used to clip cell text
+AVERAGE_GLYPH_WIDTH = 0.52
+
+def _escape(text: str) -> str:
+    text = text.encode("cp1252", errors="replace").decode("cp1252")
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)").replace("\r", " ").replace("\n", " ")
+
+def clip(text: Any, width: float, size: float) -> str:
+    text = "" if text is None else str(text)
+    max_chars = max(1, int(width / (size * AVERAGE_GLYPH_WIDTH)))
+    return text if len(text) <= max_chars else text[:max_chars - 1] + "~"
+
+class PdfDocument:
+    def __init__(self, title: str):
+        self.title = title
+        self.pages: List[List[str]] = []
+        self.new_page()
+
+    def new_page(self) -> None:
+        self.pages.append([])
+
+    def text(self, x: float, y: float, text: Any, size: float = 10, bold: bool = False) -> None:
+        font = "F2" if bold else "F1"
+        self.pages[-1].append(f"BT /{font} {size} Tf {x:.1f} {y:.1f} Td ({_escape(str(text))}) Tj ET")
+
+    def line(self, x1: float, y1: float, x2: float, y2: float, width: float = 0.5) -> None:
+        self.pages[-1].append(f"{width} w {x1:.1f} {y1:.1f} m {x2:.1f} {y2:.1f} l S")
+
+    def to_bytes(self) -> bytes:
+        objects: List[bytes] = []
+        page_count = len(self.pages)
+        # 1: catalog, 2: page tree, 3-4: fonts, 5: info, then a (page, contents) pair per page
+        first_page = 6
+        kids = " ".join(f"{first_page + 2 * index} 0 R" for index in range(page_count))
+        objects.append(b"<< /Type /Catalog /Pages 2 0 R >>")
+        objects.append(f"<< /Type /Pages /Kids [{kids}] /Count {page_count} >>".encode("ascii"))
+        objects.append(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>")
+        objects.append(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica-Bold /Encoding /WinAnsiEncoding >>")
+        objects.append(f"<< /Title ({_escape(self.title)}) /Producer (SAT Score) >>".encode("cp1252", errors="replace"))
+        for index, operations in enumerate(self.pages):
+            contents = first_page + 2 * index + 1
+            objects.append(
+                f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {PAGE_WIDTH} {PAGE_HEIGHT}] "
+                f"/Resources << /Font << /F1 3 0 R /F2 4 0 R >> >> /Contents {contents} 0 R >>".encode("ascii")
+            )
+            stream = zlib.compress("\n".join(operations).encode("cp1252", errors="replace"))
+            objects.append(b"<< /Length " + str(len(stream)).encode("ascii") + b" /Filter /FlateDecode >>\nstream\n" + stream + b"\nendstream")
+
+        output = bytearray(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+        offsets = []
+        for number, body in enumerate(objects, start=1):
+            offsets.append(len(output))
+            output += f"{number} 0 obj\n".encode("ascii") + body + b"\nendobj\n"
+        xref_offset = len(output)
+        output += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode("ascii")
+        for offset in offsets:
+            output += f"{offset:010d} 00000 n \n".encode("ascii")
+        output += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R /Info 5 0 R >>\nstartxref\n{xref_offset}\n%%EOF\n".encode("ascii")
+        return bytes(output)
+
+class TableLayout:
+    """Writes a header block and then table rows, starting a new page (with the column headings) when full."""
+
+    def __init__(self, doc: PdfDocument, columns: List[Tuple[str, float]], size: float = 9):
+        self.doc = doc
+        self.columns = columns
+        self.size = size
+        self.y = PAGE_HEIGHT - MARGIN
+
+    def heading(self, text: str, size: float = 14) -> None:
+        self.doc.text(MARGIN, self.y, text, size=size, bold=True)
+        self.y -= size + 8
+
+    def field(self, label: str, value: Any) -> None:
+        self.doc.text(MARGIN, self.y, f"{label}:", size=self.size + 1, bold=True)
+        self.doc.text(MARGIN + 110, self.y, "" if value is None else value, size=self.size + 1)
+        self.y -= LINE_HEIGHT
+
+    def _row(self, values: List[Any], bold: bool = False) -> None:
+        x = MARGIN
+        for (_, width), value in zip(self.columns, values):
+            self.doc.text(x, self.y, clip(value, width - 4, self.size), size=self.size, bold=bold)
+            x += width
+        self.y -= LINE_HEIGHT
+
+    def header_row(self) -> None:
+        self.y -= 6
+        self._row([title for title, _ in self.columns], bold=True)
+        self.doc.line(MARGIN, self.y + LINE_HEIGHT - 4, PAGE_WIDTH - MARGIN, self.y + LINE_HEIGHT - 4)
+
+    def row(self, values: List[Any]) -> None:
+        if self.y < MARGIN + LINE_HEIGHT:
+            self.doc.new_page()
+            self.y = PAGE_HEIGHT - MARGIN
+            self.header_row()
+        self._row(values)
+
+    def footer(self, text: str) -> None:
+        self.y -= 6
+        self.doc.line(MARGIN, self.y + LINE_HEIGHT - 4, PAGE_WIDTH - MARGIN, self.y + LINE_HEIGHT - 4)
+        self.doc.text(MARGIN, self.y, text, size=self.size)
+
+def format_mark(value: Optional[float]) -> str:
+    if value is None:
+        return "-"
+    return f"{value:.0f}" if float(value).is_integer() else f"{value:.1f}"
+
+def render_transcript(data: Dict[str, Any]) -> bytes:
+    """``data`` as assembled by reports.transcript_data."""
+    student = data["student"]
+    doc = PdfDocument(f"Transcript - {student['registrationNumber']}")
+    table = TableLayout(doc, [
+        ("Code", 60), ("Subject", 170), ("Cr", 25), ("FAT1", 38), ("FAT2", 38), ("FAT3", 38), ("Asgn", 38), ("SAT", 38), ("Final", 70)
+    ])
+    table.heading("Academic Transcript")
+    table.field("Name", student["fullName"])
+    table.field("Registration No.", student["registrationNumber"])
+    table.field("Department", data["department"])
+    table.field("Year / Semester", f"{student['yearOfStudy']} / {student['semester']}")
+    table.field("Section", student["section"])
+    table.field("Academic Year", student["academic_year"])
+    table.header_row()
+    credits = 0
+    for subject in data["subjects"]:
+        table.row([
+            subject["code"], subject["name"], subject["credits"],
+            format_mark(subject["fat1"]), format_mark(subject["fat2"]), format_mark(subject["fat3"]),
+            format_mark(subject["assignments"]), format_mark(subject["sat"]), format_mark(subject["final"])
+        ])
+        credits += subject["credits"] or 0
+    table.footer(f"{len(data['subjects'])} subjects, {credits} credits. Generated {data['generated_on']}.")
+    return doc.to_bytes()
+
+def render_marks_sheet(data: Dict[str, Any]) -> bytes:
+    """``data`` as assembled by reports.marks_sheet_data."""
+    subject = data["subject"]
+    doc = PdfDocument(f"Marks sheet - {subject['code']}")
+    table = TableLayout(doc, [
+        ("#", 25), ("Reg. No.", 85), ("Name", 160), ("FAT1", 38), ("FAT2", 38), ("FAT3", 38), ("Asgn", 38), ("SAT", 38), ("Final", 55)
+    ])
+    table.heading(f"Marks Sheet: {subject['code']} {subject['name']}")
+    table.field("Section", data["section"] or "All")
+    table.field("Batch", data["batch"] or "All")
+    table.field("SAT submitted", f"{data['submitted']} of {len(data['students'])}")
+    table.header_row()
+    for index, student in enumerate(data["students"], start=1):
+        table.row([
+            index, student["registrationNumber"], student["fullName"],
+            format_mark(student["fat1"]), format_mark(student["fat2"]), format_mark(student["fat3"]),
+            format_mark(student["assignments"]), format_mark(student["sat"]), format_mark(student["final"])
+        ])
+    table.footer(f"{len(data['students'])} students. Generated {data['generated_on']}.")
+    return doc.to_bytes()
+
+RENDERERS = {
+    "transcript": render_transcript,
+    "marks_sheet": render_marks_sheet,
+}
+
+def render(kind: str, data: Dict[str, Any]) -> bytes:
+    return RENDERERS[kind](data)
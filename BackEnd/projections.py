@@ -0,0 +1,41 @@
+from fastapi import HTTPException, Query
+from typing import Dict, Any, Optional
+import re
+from search import SEARCH_KEYS_FIELD
+
+# Never returned by a read endpoint, whatever ``fields`` asks for
+HIDDEN_FIELDS = ["password", "fileContent", "photo", SEARCH_KEYS_FIELD]
+DEFAULT_PROJECTION = {field: 0 for field in HIDDEN_FIELDS}
+FIELD_NAME = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*(\.[A-Za-z0-9_]+)*$")
+
+# What the internal lookups actually read, so validation round trips don't pull whole documents
+DEPARTMENT_NAME_FIELDS = {"name": 1, "shortName": 1}
+SUBJECT_SUMMARY_FIELDS = {"code": 1, "name": 1}
+
+def fields_param(
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return, e.g. fullName,registrationNumber")
+) -> Optional[str]:
+    return fields
+
+def parse_fields(fields: Optional[str]) -> Dict[str, Any]:
+    """
+    Map a ``fields=a,b.c`` sparse fieldset to a Mongo inclusion projection.
+    Without ``fields`` every field except HIDDEN_FIELDS is returned.
+    """
+    if not fields:
+        return dict(DEFAULT_PROJECTION)
+    projection: Dict[str, Any] = {}
+    for name in (part.strip() for part in fields.split(",")):
+        if not name or name == "id":
+            continue
+        if not FIELD_NAME.match(name) or name.split(".")[0] in HIDDEN_FIELDS:
+            raise HTTPException(status_code=400, detail=f"Field {name} cannot be requested")
+        projection[name] = 1
+    # A parent and a child path in one projection is a Mongo path collision
+    for name in list(projection):
+        if any(name.startswith(other + ".") for other in projection if other != name):
+            del projection[name]
+    if not projection:
+        # ``fields=id``: an empty projection would make Mongo return every field, hidden ones included
+        return {"_id": 1}
+    return projection
@@ -0,0 +1,174 @@
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import UpdateOne
+from bson import ObjectId
+from datetime import date
+from typing import Dict, Any, List, Optional, Tuple, Callable, Awaitable
+import logging
+from cache import bump_versions
+from results import refresh_results
+from rosters import ROSTER_STUDENT_FIELDS, roster_changes, apply_roster_changes
+from jobs import job_handler, JobContext
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+PROMOTION_BATCH_SIZE = 500
+# Semesters are numbered across the programme: year N has semesters 2N-1 and 2N
+FINAL_SEMESTER = 8
+
+PROMOTION_STUDENT_FIELDS = {"fullName": 1, "registrationNumber": 1, "yearOfStudy": 1, "semester": 1, **ROSTER_STUDENT_FIELDS}
+
+def next_term(semester: Any) -> Optional[Tuple[str, str]]:
+    """(yearOfStudy, semester) after ``semester``; None for the final semester or a value that is not a number."""
+    try:
+        current = int(str(semester))
+    except ValueError:
+        return None
+    if current < 1 or current >= FINAL_SEMESTER:
+        return None
+    following = current + 1
+    return str((following + 1) // 2), str(following)
+
+async def load_curriculum(db: AsyncIOMotorDatabase, department_oid: ObjectId, year_of_study: str, semester: str) -> List[Dict[str, Any]]:
+    """The subjects a cohort takes in a term, the same lookup as StudentDB.get_applicable_courses."""
+    return await db["db.subjects"].find(
+        {"department": department_oid, "yearOfStudy": year_of_study, "semester": semester},
+        {"code": 1, "name": 1}
+    ).to_list(length=None)
+
+async def plan_promotion(db: AsyncIOMotorDatabase, department_id: str, year_of_study: str, semester: str) -> Dict[str, Any]:
+    """
+    What promoting a department's year out of ``semester`` would change: each
+    student's next term and the courses they leave and join. Only students
+    still in ``semester`` are planned, so a repeated or retried promotion
+    finds nobody left to move. Computed with one curriculum lookup per target
+    (department, year, semester), whatever the cohort size.
+    """
+    department_oid = ObjectId(department_id)
+    students = await db["students"].find(
+        {"department": department_oid, "yearOfStudy": year_of_study, "semester": semester},
+        PROMOTION_STUDENT_FIELDS
+    ).sort("registrationNumber", 1).to_list(length=None)
+
+    curricula: Dict[Tuple[str, str], List[Dict[str, Any]]] = {}
+    codes: Dict[str, str] = {}
+    changes = []
+    skipped = []
+    for student in students:
+        target = next_term(student.get("semester"))
+        if target is None:
+            skipped.append({
+                "id": str(student["_id"]),
+                "registrationNumber": student.get("registrationNumber", "N/A"),
+                "semester": student.get("semester"),
+                "reason": "final semester" if str(student.get("semester")) == str(FINAL_SEMESTER) else "unknown semester"
+            })
+            continue
+        if target not in curricula:
+            curricula[target] = await load_curriculum(db, department_oid, *target)
+            codes.update({str(subject["_id"]): subject.get("code", "N/A") for subject in curricula[target]})
+        old_courses = [str(course) for course in student.get("courses", []) or []]
+        new_courses = [str(subject["_id"]) for subject in curricula[target]]
+        changes.append({
+            "student": student,
+            "yearOfStudy": target[0],
+            "semester": target[1],
+            "courses": [ObjectId(course) for course in new_courses],
+            "removed": [course for course in old_courses if course not in new_courses],
+            "added": [course for course in new_courses if course not in old_courses],
+        })
+
+    # Codes of the courses being dropped, for a readable diff
+    dropped = list({course for change in changes for course in change["removed"] if course not in codes and ObjectId.is_valid(course)})
+    if dropped:
+        async for subject in db["db.subjects"].find({"_id": {"$in": [ObjectId(course) for course in dropped]}}, {"code": 1}):
+            codes[str(subject["_id"])] = subject.get("code", "N/A")
+
+    return {"changes": changes, "skipped": skipped, "curricula": curricula, "codes": codes}
+
+def describe_plan(department_id: str, year_of_study: str, semester: str, plan: Dict[str, Any], dry_run: bool) -> Dict[str, Any]:
+    codes = plan["codes"]
+    return {
+        "department": department_id,
+        "yearOfStudy": year_of_study,
+        "semester": semester,
+        "dry_run": dry_run,
+        "promoted": len(plan["changes"]),
+        "skipped": plan["skipped"],
+        "curriculum": {
+            f"{year}/{semester}": [subject.get("code", "N/A") for subject in subjects]
+            for (year, semester), subjects in plan["curricula"].items()
+        },
+        "students": [
+            {
+                "id": str(change["student"]["_id"]),
+                "registrationNumber": change["student"].get("registrationNumber", "N/A"),
+                "fullName": change["student"].get("fullName", "Unknown"),
+                "from": {"yearOfStudy": change["student"].get("yearOfStudy"), "semester": change["student"].get("semester")},
+                "to": {"yearOfStudy": change["yearOfStudy"], "semester": change["semester"]},
+                "coursesRemoved": [codes.get(course, course) for course in change["removed"]],
+                "coursesAdded": [codes.get(course, course) for course in change["added"]],
+            }
+            for change in plan["changes"]
+        ],
+    }
+
+async def promote_cohort(
+    db: AsyncIOMotorDatabase,
+    department_id: str,
+    year_of_study: str,
+    semester: str,
+    dry_run: bool = False,
+    progress: Optional[Callable[[float, str], Awaitable[None]]] = None
+) -> Dict[str, Any]:
+    """
+    Advance every student of a department's year in ``semester`` to the next
+    term and replace their courses with its curriculum, in batched bulk
+    writes. Students are selected, and each update only matches, while they
+    are still in ``semester``, so running a promotion twice (a duplicate POST
+    or a retried job) promotes nobody the second time. With ``dry_run`` only
+    the diff is returned.
+    """
+    plan = await plan_promotion(db, department_id, year_of_study, semester)
+    summary = describe_plan(department_id, year_of_study, semester, plan, dry_run)
+    if dry_run or not plan["changes"]:
+        return summary
+
+    today = date.today().isoformat()
+    changes = plan["changes"]
+    updated_count = 0
+    for start in range(0, len(changes), PROMOTION_BATCH_SIZE):
+        batch = changes[start:start + PROMOTION_BATCH_SIZE]
+        student_operations = []
+        roster_operations = []
+        for change in batch:
+            student = change["student"]
+            student_operations.append(UpdateOne(
+                {"_id": student["_id"], "yearOfStudy": student.get("yearOfStudy"), "semester": student.get("semester")},
+                {"$set": {
+                    "yearOfStudy": change["yearOfStudy"],
+                    "semester": change["semester"],
+                    "courses": change["courses"],
+                    "updated_at": today
+                }}
+            ))
+            roster_operations += roster_changes(student["_id"], student, {**student, "courses": change["courses"]})
+        result = await db["students"].bulk_write(student_operations, ordered=False)
+        updated_count += result.modified_count
+        await apply_roster_changes(db, roster_operations)
+        if progress:
+            done = start + len(batch)
+            await progress(done * 100 / len(changes), f"Promoted {done} of {len(changes)} students")
+
+    await bump_versions(db, "students")
+    await refresh_results(db, [change["student"]["_id"] for change in changes])
+    logger.info(f"Promoted {updated_count} students of department {department_id}, year {year_of_study}, semester {semester}")
+    summary["promoted"] = updated_count
+    return summary
+
+@job_handler("students.promote")
+async def run_promotion_job(job: JobContext) -> Dict[str, Any]:
+    summary = await promote_cohort(job.db, job.params["department"], job.params["yearOfStudy"], job.params["semester"], progress=job.progress)
+    # The per-student diff can be large; the job result keeps the totals
+    return {key: summary[key] for key in ("department", "yearOfStudy", "semester", "promoted", "skipped", "curriculum")}
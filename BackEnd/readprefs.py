@@ -0,0 +1,96 @@
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo.read_preferences import Primary, PrimaryPreferred, Secondary, SecondaryPreferred, Nearest
+from pymongo.read_concern import ReadConcern
+from typing import Dict, Tuple
+import logging
+import os
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Read-mostly endpoints that tolerate replication lag. Each reads with the
+# given preference and read concern; everything else, and every write and
+# read-your-write path (a save followed by its re-read), uses get_db and
+# stays on the primary. The marks listings back the entry pages, whose saves
+# are checked against the versions they last read, so a stale read from a
+# lagging secondary would turn the next save into a false conflict; the
+# students listing is re-read by the admin Students page right after each
+# create, update and delete, and would show the list from before the write.
+# All three stay on the primary unless READ_PREFERENCES opts them into
+# secondaries. On a standalone server secondaryPreferred simply reads from
+# the primary.
+DEFAULT_ENDPOINT_READS: Dict[str, Tuple[str, str]] = {
+    "students.list": ("primary", "local"),
+    "internal_marks.list": ("primary", "local"),
+    "sat_marks.list": ("primary", "local"),
+    "exports.marks": ("secondaryPreferred", "majority"),
+    "reports.departments": ("secondaryPreferred", "majority"),
+    "admin.stats": ("secondaryPreferred", "local"),
+}
+READ_PREFERENCE_MODES = {
+    "primary": Primary,
+    "primaryPreferred": PrimaryPreferred,
+    "secondary": Secondary,
+    "secondaryPreferred": SecondaryPreferred,
+    "nearest": Nearest,
+}
+READ_CONCERN_LEVELS = {"local", "available", "majority", "linearizable", "snapshot"}
+# Secondaries further behind the primary than this are not read from; -1 disables the bound (the server minimum is 90)
+READ_MAX_STALENESS_SECONDS = int(os.getenv("READ_MAX_STALENESS_SECONDS", "-1"))
+
+def parse_endpoint_reads(value: str) -> Dict[str, Tuple[str, str]]:
+    """
+    ``READ_PREFERENCES="students.list=primary,exports.marks=secondary/majority"``
+    overrides the defaults per endpoint: a read preference mode, optionally
+    followed by ``/`` and a read concern level (``local`` when omitted).
+    """
+    reads = dict(DEFAULT_ENDPOINT_READS)
+    for item in (part.strip() for part in value.split(",")):
+        if not item:
+            continue
+        endpoint, _, setting = item.partition("=")
+        mode, _, level = setting.strip().partition("/")
+        endpoint, mode, level = endpoint.strip(), mode.strip(), level.strip() or "local"
+        if mode not in READ_PREFERENCE_MODES:
+            raise ValueError(f"Invalid read preference for {endpoint}: {mode}")
+        if level not in READ_CONCERN_LEVELS:
+            raise ValueError(f"Invalid read concern for {endpoint}: {level}")
+        reads[endpoint] = (mode, level)
+    return reads
+
+ENDPOINT_READS = parse_endpoint_reads(os.getenv("READ_PREFERENCES", ""))
+
+def read_preference(mode: str):
+    if mode == "primary":
+        return Primary()
+    return READ_PREFERENCE_MODES[mode](max_staleness=READ_MAX_STALENESS_SECONDS)
+
+# (database, endpoint) -> handle; handles are cheap but reused so routing allocates nothing per request
+_routed: Dict[Tuple[str, str], AsyncIOMotorDatabase] = {}
+
+def routed(db: AsyncIOMotorDatabase, endpoint: str) -> AsyncIOMotorDatabase:
+    """``db`` with the read preference and read concern configured for ``endpoint``; unknown endpoints read from the primary."""
+    if endpoint not in ENDPOINT_READS:
+        return db
+    key = (db.name, endpoint)
+    handle = _routed.get(key)
+    if handle is None:
+        mode, level = ENDPOINT_READS[endpoint]
+        handle = db.client.get_database(db.name, read_preference=read_preference(mode), read_concern=ReadConcern(level))
+        _routed[key] = handle
+    return handle
+
+def reads_secondaries(db: AsyncIOMotorDatabase) -> bool:
+    """
+    Whether reads through ``db`` may be served by a secondary. Version
+    counters read there can lag the primary's, and consecutive reads may hit
+    different members, so such handles bypass the version and reference
+    caches (see cache.py).
+    """
+    return not isinstance(db.read_preference, Primary)
+
+def describe_endpoint_reads() -> Dict[str, str]:
+    return {endpoint: f"{mode}/{level}" for endpoint, (mode, level) in sorted(ENDPOINT_READS.items())}
+
+logger.info(f"Endpoint read preferences: {describe_endpoint_reads()}")
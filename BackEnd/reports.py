@@ -0,0 +1,286 @@
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from concurrent.futures import ProcessPoolExecutor
+from collections import OrderedDict, deque
+from bson import ObjectId
+from datetime import date
+from typing import Dict, Any, Optional, Tuple, AsyncIterator, Callable, Awaitable
+import asyncio
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
+import pdf
+from rosters import roster_members, roster_sections
+from zipstream import ZipStream
+from readprefs import routed
+from jobs import job_handler, JobContext, store_job_file
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+REPORT_RENDER_WORKERS = int(os.getenv("REPORT_RENDER_WORKERS", str(min(4, os.cpu_count() or 1))))
+REPORT_CACHE_MAX_BYTES = int(os.getenv("REPORT_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+
+STUDENT_REPORT_FIELDS = {
+    "fullName": 1, "registrationNumber": 1, "department": 1, "yearOfStudy": 1, "semester": 1, "section": 1,
+    "yearOfJoining": 1, "academic_year": 1, "courses": 1, "internal_marks": 1, "sat_marks": 1, "marks": 1
+}
+SUBJECT_REPORT_FIELDS = {"code": 1, "name": 1, "credits": 1, "semester": 1, "yearOfStudy": 1, "department": 1}
+
+# Created on first use so that each API worker owns its pool; "spawn" keeps the
+# render processes free of the event loop and driver threads of the worker.
+_render_pool: Optional[ProcessPoolExecutor] = None
+
+def render_pool() -> ProcessPoolExecutor:
+    global _render_pool
+    if _render_pool is None:
+        _render_pool = ProcessPoolExecutor(max_workers=REPORT_RENDER_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+    return _render_pool
+
+def shutdown_render_pool() -> None:
+    global _render_pool
+    if _render_pool is not None:
+        _render_pool.shutdown(wait=False, cancel_futures=True)
+        _render_pool = None
+
+class DocumentCache:
+    """Rendered PDFs keyed by a hash of the data they were rendered from, bounded by total size."""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.entries: "OrderedDict[str, bytes]" = OrderedDict()
+
+    def get(self, key: str) -> Optional[bytes]:
+        document = self.entries.get(key)
+        if document is not None:
+            self.entries.move_to_end(key)
+        return document
+
+    def put(self, key: str, document: bytes) -> None:
+        if len(document) > self.max_bytes:
+            return
+        previous = self.entries.pop(key, None)
+        if previous is not None:
+            self.size -= len(previous)
+        self.entries[key] = document
+        self.size += len(document)
+        while self.size > self.max_bytes:
+            _, evicted = self.entries.popitem(last=False)
+            self.size -= len(evicted)
+
+document_cache = DocumentCache(REPORT_CACHE_MAX_BYTES)
+
+def document_key(kind: str, data: Dict[str, Any]) -> str:
+    """Identical marks produce the same key, so any write that changes a document's inputs changes its key."""
+    fingerprint = json.dumps(data, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(f"{kind}|{fingerprint}".encode("utf-8")).hexdigest()[:32]
+
+async def render_document(kind: str, data: Dict[str, Any]) -> Tuple[str, bytes]:
+    key = document_key(kind, data)
+    document = document_cache.get(key)
+    if document is None:
+        loop = asyncio.get_running_loop()
+        document = await loop.run_in_executor(render_pool(), pdf.render, kind, {**data, "generated_on": date.today().isoformat()})
+        document_cache.put(key, document)
+    return key, document
+
+async def render_many(items: AsyncIterator[Tuple[str, str, Dict[str, Any]]]) -> AsyncIterator[Tuple[str, bytes]]:
+    """Render (filename, kind, data) items in the pool, a few ahead of the consumer, yielding in input order."""
+    window: "deque[Tuple[str, asyncio.Task]]" = deque()
+    try:
+        async for name, kind, data in items:
+            window.append((name, asyncio.ensure_future(render_document(kind, data))))
+            if len(window) >= REPORT_RENDER_WORKERS * 2:
+                name, task = window.popleft()
+                yield name, (await task)[1]
+        while window:
+            name, task = window.popleft()
+            yield name, (await task)[1]
+    finally:
+        for _, task in window:
+            task.cancel()
+
+def _number(value: Any) -> Optional[float]:
+    return float(value) if isinstance(value, (int, float)) else None
+
+def subject_marks(student: Dict[str, Any], subject_id: str) -> Dict[str, Optional[float]]:
+    """The marks recorded by save_internal_marks, save_sat_marks and save_marks for one subject."""
+    internal = student.get("internal_marks", {}).get(subject_id, {}) or {}
+    assignments = [value for value in internal.get("assignments", []) if isinstance(value, (int, float))]
+    sat = student.get("sat_marks", {}).get(subject_id, {}) or {}
+    return {
+        "fat1": _number(internal.get("fat1")),
+        "fat2": _number(internal.get("fat2")),
+        "fat3": _number(internal.get("fat3")),
+        "assignments": round(sum(assignments) / len(assignments), 1) if assignments else None,
+        "internal": _number(internal.get("internal")),
+        "sat": _number(sat.get("marks")),
+        "sat_submitted": bool(sat.get("isSubmitted", False)),
+        "final": _number(student.get("marks", {}).get(subject_id)),
+    }
+
+def _student_header(student: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "fullName": student.get("fullName", "Unknown"),
+        "registrationNumber": student.get("registrationNumber", "N/A"),
+        "yearOfStudy": student.get("yearOfStudy", "N/A"),
+        "semester": student.get("semester", "N/A"),
+        "section": student.get("section", "N/A"),
+        "academic_year": student.get("academic_year", "N/A"),
+    }
+
+async def load_subjects(db: AsyncIOMotorDatabase, query: Optional[Dict[str, Any]] = None) -> Dict[str, Dict[str, Any]]:
+    subjects = await db["db.subjects"].find(query or {}, SUBJECT_REPORT_FIELDS).to_list(length=None)
+    return {str(subject["_id"]): subject for subject in subjects}
+
+def build_transcript(student: Dict[str, Any], department_name: str, subjects: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+    rows = []
+    for course in student.get("courses", []):
+        subject = subjects.get(str(course))
+        if not subject:
+            continue
+        rows.append({
+            "code": subject.get("code", "N/A"),
+            "name": subject.get("name", "N/A"),
+            "credits": subject.get("credits", 0),
+            **subject_marks(student, str(course))
+        })
+    rows.sort(key=lambda row: row["code"])
+    return {"student": _student_header(student), "department": department_name, "subjects": rows}
+
+async def department_name(db: AsyncIOMotorDatabase, department_id: Any) -> str:
+    if not isinstance(department_id, ObjectId) and not ObjectId.is_valid(str(department_id)):
+        return str(department_id or "N/A")
+    department = await db["db.departments"].find_one({"_id": ObjectId(str(department_id))}, {"name": 1})
+    return department.get("name", "N/A") if department else "N/A"
+
+async def transcript_data(db: AsyncIOMotorDatabase, student_id: str) -> Optional[Dict[str, Any]]:
+    student = await db["students"].find_one({"_id": ObjectId(student_id)}, STUDENT_REPORT_FIELDS)
+    if not student:
+        return None
+    subjects = await load_subjects(db, {"_id": {"$in": [ObjectId(str(course)) for course in student.get("courses", []) if ObjectId.is_valid(str(course))]}})
+    return build_transcript(student, await department_name(db, student.get("department")), subjects)
+
+async def marks_sheet_data(db: AsyncIOMotorDatabase, subject_id: str, section: Optional[str] = None, batch: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    subject = await db["db.subjects"].find_one({"_id": ObjectId(subject_id)}, SUBJECT_REPORT_FIELDS)
+    if not subject:
+        return None
+    students = []
+    members = await roster_members(db, [{"subject_id": subject_id, "batch": batch, "section": section}])
+    cursor = db["students"].find(
+        {"_id": {"$in": members}},
+        {"fullName": 1, "registrationNumber": 1, "internal_marks": 1, "sat_marks": 1, "marks": 1}
+    ).sort("registrationNumber", 1)
+    async for student in cursor:
+        students.append({
+            "fullName": student.get("fullName", "Unknown"),
+            "registrationNumber": student.get("registrationNumber", "N/A"),
+            **subject_marks(student, subject_id)
+        })
+    return {
+        "subject": {"code": subject.get("code", "N/A"), "name": subject.get("name", "N/A")},
+        "section": section,
+        "batch": batch,
+        "submitted": sum(1 for student in students if student["sat_submitted"]),
+        "students": students,
+    }
+
+async def department_documents(
+    db: AsyncIOMotorDatabase,
+    department_id: str,
+    year_of_study: Optional[str],
+    transcripts: bool,
+    marks_sheets: bool
+) -> AsyncIterator[Tuple[str, str, Dict[str, Any]]]:
+    """(filename, kind, data) for every document of a department, read with one cursor per kind."""
+    department_oid = ObjectId(department_id)
+    name = await department_name(db, department_oid)
+    subjects = await load_subjects(db)
+    student_query: Dict[str, Any] = {"department": department_oid}
+    if year_of_study:
+        student_query["yearOfStudy"] = year_of_study
+
+    if transcripts:
+        async for student in db["students"].find(student_query, STUDENT_REPORT_FIELDS).sort("registrationNumber", 1):
+            yield f"transcripts/{student.get('registrationNumber', student['_id'])}.pdf", "transcript", build_transcript(student, name, subjects)
+
+    if marks_sheets:
+        for subject_id, subject in sorted(subjects.items(), key=lambda item: item[1].get("code", "")):
+            if subject.get("department") != department_oid or (year_of_study and str(subject.get("yearOfStudy", year_of_study)) != year_of_study):
+                continue
+            sections = await roster_sections(db, subject_id)
+            for section in sorted(section for section in sections if section):
+                data = await marks_sheet_data(db, subject_id, section=section)
+                if data and data["students"]:
+                    yield f"marks-sheets/{subject.get('code', subject_id)}-{section}.pdf", "marks_sheet", data
+
+# Documents between progress reports of a background archive
+ARCHIVE_PROGRESS_EVERY = 50
+
+async def department_archive_name(db: AsyncIOMotorDatabase, department_id: str, year_of_study: Optional[str]) -> Optional[str]:
+    """The zip filename for a department's reports; None if the department does not exist."""
+    department = await db["db.departments"].find_one({"_id": ObjectId(department_id)}, {"shortName": 1, "code": 1})
+    if not department:
+        return None
+    short_name = department.get("shortName") or department.get("code") or department_id
+    return f"{short_name}{'-year' + year_of_study if year_of_study else ''}-reports.zip"
+
+async def department_archive(
+    db: AsyncIOMotorDatabase,
+    department_id: str,
+    year_of_study: Optional[str],
+    transcripts: bool,
+    marks_sheets: bool,
+    progress: Optional[Callable[[int], Awaitable[None]]] = None,
+    note_errors: bool = True
+) -> AsyncIterator[bytes]:
+    """
+    A department's documents as a zip, produced while they render; ``progress``
+    gets the running document count. A failure ends the archive with an
+    ERROR.txt note, or with ``note_errors`` False is raised so a job retries.
+    """
+    archive = ZipStream()
+    count = 0
+    try:
+        documents = department_documents(db, department_id, year_of_study, transcripts, marks_sheets)
+        async for name, document in render_many(documents):
+            yield archive.add(name, document)
+            count += 1
+            if progress and count % ARCHIVE_PROGRESS_EVERY == 0:
+                await progress(count)
+    except Exception as e:
+        logger.error(f"Error building reports for department {department_id}: {str(e)}")
+        if not note_errors:
+            raise
+        # A streamed response has sent its headers already; end the archive with a note rather than a truncated file
+        yield archive.add("ERROR.txt", f"Report generation stopped after {count} documents: {str(e)}".encode("utf-8"))
+    yield archive.close()
+    logger.info(f"Archived {count} documents for department {department_id}")
+
+@job_handler("reports.department")
+async def run_department_reports_job(job: JobContext) -> Dict[str, Any]:
+    """The same archive as GET /api/reports/departments/{id}, written to a job file."""
+    db = routed(job.db, "reports.departments")
+    department_id = job.params["department"]
+    year_of_study = job.params.get("yearOfStudy")
+    filename = await department_archive_name(db, department_id, year_of_study)
+    if filename is None:
+        raise ValueError(f"Department {department_id} not found")
+    student_query: Dict[str, Any] = {"department": ObjectId(department_id)}
+    if year_of_study:
+        student_query["yearOfStudy"] = year_of_study
+    # Transcripts are most of the documents; marks sheets are not counted up front
+    expected = await db["students"].count_documents(student_query) if job.params.get("transcripts", True) else 0
+
+    async def report(count: int) -> None:
+        percent = min(99.0, count * 100 / expected) if expected else 0.0
+        await job.progress(percent, f"Rendered {count} documents")
+
+    archive = department_archive(
+        db, department_id, year_of_study, job.params.get("transcripts", True), job.params.get("marks_sheets", False),
+        progress=report, note_errors=False
+    )
+    return await store_job_file(job, filename, "application/zip", archive)
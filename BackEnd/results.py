@@ -0,0 +1,161 @@
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import ReplaceOne
+from bson import ObjectId
+from datetime import datetime, timezone
+from typing import Dict, Any, List, Optional, Iterable
+import hashlib
+import json
+import logging
+from cache import get_versions
+from reports import subject_marks
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# One document per student (same _id), rewritten by every path that changes the
+# student's marks or courses, so the student portal is a single primary-key read.
+RESULTS_COLLECTION = "student_results"
+REFRESH_BATCH_SIZE = 500
+# Collections a results document embeds data from besides the student's own
+REFERENCE_COLLECTIONS = ["db.subjects", "db.departments"]
+# Bumped when build_results changes what it exposes, so stored documents are rebuilt on their next read
+RESULTS_FORMAT = 2
+
+RESULT_STUDENT_FIELDS = {
+    "fullName": 1, "registrationNumber": 1, "department": 1, "yearOfStudy": 1, "semester": 1, "section": 1,
+    "academic_year": 1, "courses": 1, "internal_marks": 1, "sat_marks": 1, "marks": 1
+}
+RESULT_SUBJECT_FIELDS = {"code": 1, "name": 1, "credits": 1, "semester": 1}
+
+# Lower bound of the final mark for each grade, and its grade point
+GRADES = [(90, "O", 10), (80, "A+", 9), (70, "A", 8), (60, "B+", 7), (50, "B", 6), (40, "C", 5), (0, "F", 0)]
+
+def grade_for(final: Optional[float]) -> tuple:
+    if final is None:
+        return None, None
+    for lower, grade, point in GRADES:
+        if final >= lower:
+            return grade, point
+    return "F", 0
+
+def gpa(rows: Iterable[Dict[str, Any]]) -> Optional[float]:
+    graded = [row for row in rows if row["gradePoint"] is not None and row["credits"]]
+    credits = sum(row["credits"] for row in graded)
+    return round(sum(row["credits"] * row["gradePoint"] for row in graded) / credits, 2) if credits else None
+
+def result_subject_ids(student: Dict[str, Any]) -> List[str]:
+    """Current courses plus every subject with recorded marks, so a promotion that replaces courses keeps past semesters."""
+    ids = [str(course) for course in student.get("courses", [])]
+    for field in ("internal_marks", "sat_marks", "marks"):
+        ids.extend((student.get(field) or {}).keys())
+    return [subject_id for subject_id in dict.fromkeys(ids) if ObjectId.is_valid(subject_id)]
+
+def build_results(student: Dict[str, Any], subjects: Dict[str, Dict[str, Any]], department_name: str, reference_versions: Dict[str, int]) -> Dict[str, Any]:
+    semesters: Dict[str, List[Dict[str, Any]]] = {}
+    for course in result_subject_ids(student):
+        subject = subjects.get(course)
+        if not subject:
+            continue
+        marks = subject_marks(student, course)
+        # The SAT mark, and the final mark and grade derived from it, stay hidden until the teacher submits it
+        submitted = marks["sat_submitted"]
+        final = marks["final"] if submitted else None
+        grade, point = grade_for(final)
+        semester = str(subject.get("semester", student.get("semester", "")))
+        semesters.setdefault(semester, []).append({
+            "subjectId": str(course),
+            "subjectCode": subject.get("code", "N/A"),
+            "subjectName": subject.get("name", "N/A"),
+            "credits": subject.get("credits", 0) or 0,
+            "internal": marks["internal"],
+            "sat": marks["sat"] if submitted else None,
+            "satSubmitted": submitted,
+            "final": final,
+            "grade": grade,
+            "gradePoint": point,
+        })
+
+    semester_rows = []
+    for semester in sorted(semesters, key=lambda value: (not value.isdigit(), int(value) if value.isdigit() else 0, value)):
+        rows = sorted(semesters[semester], key=lambda row: row["subjectCode"])
+        semester_rows.append({
+            "semester": semester,
+            "gpa": gpa(rows),
+            "credits": sum(row["credits"] for row in rows),
+            "earnedCredits": sum(row["credits"] for row in rows if row["gradePoint"]),
+            "subjects": rows,
+        })
+    all_rows = [row for semester in semester_rows for row in semester["subjects"]]
+    document = {
+        "_id": student["_id"],
+        "fullName": student.get("fullName", "Unknown"),
+        "registrationNumber": student.get("registrationNumber", "N/A"),
+        "department": department_name,
+        "yearOfStudy": student.get("yearOfStudy"),
+        "currentSemester": student.get("semester"),
+        "section": student.get("section"),
+        "academic_year": student.get("academic_year"),
+        "cgpa": gpa(all_rows),
+        "totalCredits": sum(row["credits"] for row in all_rows),
+        "earnedCredits": sum(row["credits"] for row in all_rows if row["gradePoint"]),
+        "semesters": semester_rows,
+        "reference_versions": reference_versions,
+        "format": RESULTS_FORMAT,
+    }
+    fingerprint = json.dumps(document, sort_keys=True, separators=(",", ":"), default=str)
+    document["etag"] = '"' + hashlib.sha1(fingerprint.encode("utf-8")).hexdigest()[:20] + '"'
+    document["refreshed_at"] = datetime.now(timezone.utc)
+    return document
+
+async def refresh_results(db: AsyncIOMotorDatabase, student_ids: Iterable[Any]) -> int:
+    """
+    Rebuild the read model of the given students; called by every write path
+    after it changes marks or courses. A failure is logged and never fails the
+    write: a missing or stale document is rebuilt on the next read.
+    """
+    ids = list({ObjectId(str(student_id)) for student_id in student_ids if ObjectId.is_valid(str(student_id))})
+    if not ids:
+        return 0
+    refreshed = 0
+    try:
+        reference_versions = await get_versions(db, REFERENCE_COLLECTIONS)
+        for start in range(0, len(ids), REFRESH_BATCH_SIZE):
+            students = await db["students"].find({"_id": {"$in": ids[start:start + REFRESH_BATCH_SIZE]}}, RESULT_STUDENT_FIELDS).to_list(length=None)
+            course_ids = list({ObjectId(course) for student in students for course in result_subject_ids(student)})
+            subjects = {
+                str(subject["_id"]): subject
+                for subject in await db["db.subjects"].find({"_id": {"$in": course_ids}}, RESULT_SUBJECT_FIELDS).to_list(length=None)
+            }
+            department_ids = list({student.get("department") for student in students if isinstance(student.get("department"), ObjectId)})
+            departments = {
+                department["_id"]: department.get("name", "N/A")
+                for department in await db["db.departments"].find({"_id": {"$in": department_ids}}, {"name": 1}).to_list(length=None)
+            }
+            operations = [
+                ReplaceOne({"_id": student["_id"]}, build_results(student, subjects, departments.get(student.get("department"), "N/A"), reference_versions), upsert=True)
+                for student in students
+            ]
+            if operations:
+                await db[RESULTS_COLLECTION].bulk_write(operations, ordered=False)
+                refreshed += len(operations)
+        if refreshed < len(ids):
+            # Students that no longer exist lose their results too
+            existing = set(await db["students"].distinct("_id", {"_id": {"$in": ids}}))
+            await db[RESULTS_COLLECTION].delete_many({"_id": {"$in": [oid for oid in ids if oid not in existing]}})
+    except Exception as e:
+        logger.error(f"Failed to refresh results for {len(ids)} students: {str(e)}")
+    return refreshed
+
+async def get_results(db: AsyncIOMotorDatabase, student_id: str) -> Optional[Dict[str, Any]]:
+    """The student's read model, rebuilt first if it is missing, in an older format or predates a subject or department change."""
+    oid = ObjectId(student_id)
+    document = await db[RESULTS_COLLECTION].find_one({"_id": oid})
+    if (
+        document is None
+        or document.get("format") != RESULTS_FORMAT
+        or document.get("reference_versions") != await get_versions(db, REFERENCE_COLLECTIONS)
+    ):
+        await refresh_results(db, [oid])
+        document = await db[RESULTS_COLLECTION].find_one({"_id": oid})
+    return document
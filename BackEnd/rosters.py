@@ -0,0 +1,173 @@
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import UpdateOne
+from bson import ObjectId
+from datetime import datetime, timezone
+from typing import Dict, Any, List, Optional, Iterable, Tuple
+import logging
+from jobs import job_handler, enqueue_once, release_once, JobContext
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# One document per class: the students of a batch (year of joining) and section
+# taking a subject. Maintained by every StudentDB path that changes courses,
+# batch or section, so roster reads are one fetch and "size" needs no count.
+ROSTERS_COLLECTION = "rosters"
+ROSTER_STUDENT_FIELDS = {"courses": 1, "yearOfJoining": 1, "section": 1}
+
+def roster_id(subject_id: Any, batch: str, section: str) -> str:
+    return f"{subject_id}:{batch}:{section}"
+
+def class_of(student: Dict[str, Any]) -> Tuple[str, str]:
+    """The (batch, section) a student's rosters are keyed by; batch is str(yearOfJoining) as in subjectsHandled."""
+    year_of_joining = student.get("yearOfJoining")
+    return (str(year_of_joining) if year_of_joining is not None else "", student.get("section") or "")
+
+def course_ids(courses: Optional[Iterable[Any]]) -> List[ObjectId]:
+    # Courses are stored as ObjectIds, though older writes stored the id strings
+    return list(dict.fromkeys(ObjectId(str(course)) for course in courses or [] if ObjectId.is_valid(str(course))))
+
+def join_operations(student_id: ObjectId, subject_ids: Iterable[ObjectId], batch: str, section: str) -> List[UpdateOne]:
+    operations = []
+    now = datetime.now(timezone.utc)
+    for subject_id in subject_ids:
+        _id = roster_id(subject_id, batch, section)
+        # Create the roster if needed, then add the student only if absent so "size" stays exact
+        operations.append(UpdateOne(
+            {"_id": _id},
+            {"$setOnInsert": {"subject_id": subject_id, "batch": batch, "section": section, "student_ids": [], "size": 0}},
+            upsert=True
+        ))
+        operations.append(UpdateOne(
+            {"_id": _id, "student_ids": {"$ne": student_id}},
+            {"$push": {"student_ids": student_id}, "$inc": {"size": 1}, "$set": {"updated_at": now}}
+        ))
+    return operations
+
+def leave_operations(student_id: ObjectId, subject_ids: Iterable[ObjectId], batch: str, section: str) -> List[UpdateOne]:
+    now = datetime.now(timezone.utc)
+    return [
+        UpdateOne(
+            {"_id": roster_id(subject_id, batch, section), "student_ids": student_id},
+            {"$pull": {"student_ids": student_id}, "$inc": {"size": -1}, "$set": {"updated_at": now}}
+        )
+        for subject_id in subject_ids
+    ]
+
+async def apply_roster_changes(db: AsyncIOMotorDatabase, operations: List[UpdateOne]) -> None:
+    """Write roster changes in one round trip. Like refresh_results, a failure is logged and never fails the student write."""
+    if not operations:
+        return
+    try:
+        # Ordered, so a roster exists before the student is pushed into it
+        await db[ROSTERS_COLLECTION].bulk_write(operations, ordered=True)
+    except Exception as e:
+        logger.error(f"Failed to update rosters: {str(e)}")
+
+def roster_changes(student_id: Any, before: Optional[Dict[str, Any]], after: Optional[Dict[str, Any]]) -> List[UpdateOne]:
+    """
+    The roster writes for a student write, given the student's courses,
+    yearOfJoining and section before and after it (None for a student that did
+    not exist, or no longer does).
+    """
+    oid = ObjectId(str(student_id))
+    old_class = class_of(before) if before else None
+    new_class = class_of(after) if after else None
+    old_courses = course_ids(before.get("courses")) if before else []
+    new_courses = course_ids(after.get("courses")) if after else []
+    if old_class == new_class:
+        leaving = [course for course in old_courses if course not in new_courses]
+        joining = [course for course in new_courses if course not in old_courses]
+    else:
+        leaving, joining = old_courses, new_courses
+    operations = []
+    if leaving:
+        operations += leave_operations(oid, leaving, *old_class)
+    if joining:
+        operations += join_operations(oid, joining, *new_class)
+    return operations
+
+async def move_student(db: AsyncIOMotorDatabase, student_id: Any, before: Optional[Dict[str, Any]], after: Optional[Dict[str, Any]]) -> None:
+    """Bring the rosters in line with one student write; see roster_changes."""
+    await apply_roster_changes(db, roster_changes(student_id, before, after))
+
+def class_filter(subject_id: Any, batch: Optional[str] = None, section: Optional[str] = None) -> Dict[str, Any]:
+    query: Dict[str, Any] = {"subject_id": ObjectId(str(subject_id))}
+    if batch:
+        query["batch"] = str(batch)
+    if section:
+        query["section"] = section
+    return query
+
+async def roster_members(db: AsyncIOMotorDatabase, classes: List[Dict[str, Optional[str]]]) -> List[ObjectId]:
+    """Students of the given classes (subject_id with optional batch and section), from one roster query."""
+    if not classes:
+        return []
+    query = {"$or": [class_filter(c["subject_id"], c.get("batch"), c.get("section")) for c in classes]}
+    members: Dict[ObjectId, None] = {}
+    async for roster in db[ROSTERS_COLLECTION].find(query, {"student_ids": 1}):
+        members.update(dict.fromkeys(roster.get("student_ids", [])))
+    return list(members)
+
+async def roster_size(db: AsyncIOMotorDatabase, subject_id: Any, batch: Optional[str] = None, section: Optional[str] = None) -> int:
+    rosters = await db[ROSTERS_COLLECTION].find(class_filter(subject_id, batch, section), {"size": 1}).to_list(length=None)
+    return sum(roster.get("size", 0) for roster in rosters)
+
+async def roster_sections(db: AsyncIOMotorDatabase, subject_id: Any) -> List[str]:
+    return await db[ROSTERS_COLLECTION].distinct("section", {"subject_id": ObjectId(str(subject_id)), "size": {"$gt": 0}})
+
+async def rebuild_rosters(db: AsyncIOMotorDatabase) -> int:
+    """Recompute every roster from students.courses with one aggregation; used to seed the collection."""
+    now = datetime.now(timezone.utc)
+    await db["students"].aggregate([
+        {"$project": {"courses": 1, "yearOfJoining": 1, "section": 1}},
+        {"$unwind": "$courses"},
+        {"$addFields": {"subject_id": {"$convert": {"input": "$courses", "to": "objectId", "onError": None, "onNull": None}}}},
+        {"$match": {"subject_id": {"$ne": None}}},
+        {"$group": {
+            "_id": {
+                "subject_id": "$subject_id",
+                "batch": {"$ifNull": [{"$toString": "$yearOfJoining"}, ""]},
+                "section": {"$ifNull": ["$section", ""]}
+            },
+            "student_ids": {"$addToSet": "$_id"}
+        }},
+        {"$project": {
+            "_id": {"$concat": [{"$toString": "$_id.subject_id"}, ":", "$_id.batch", ":", "$_id.section"]},
+            "subject_id": "$_id.subject_id",
+            "batch": "$_id.batch",
+            "section": "$_id.section",
+            "student_ids": 1,
+            "size": {"$size": "$student_ids"},
+            "updated_at": {"$literal": now}
+        }},
+        {"$out": ROSTERS_COLLECTION}
+    ]).to_list(length=None)
+    count = await db[ROSTERS_COLLECTION].count_documents({})
+    logger.info(f"Rebuilt {count} rosters")
+    return count
+
+async def rosters_missing(db: AsyncIOMotorDatabase) -> bool:
+    return await db[ROSTERS_COLLECTION].estimated_document_count() == 0 and await db["students"].estimated_document_count() > 0
+
+async def backfill_rosters(db: AsyncIOMotorDatabase) -> None:
+    """
+    Build the rosters on the first start after they were introduced (or after
+    the collection was dropped). Workers starting together all see the empty
+    collection, and each $out would replace the rosters the others had
+    written since, so the rebuild is a job that only one of them enqueues.
+    """
+    try:
+        if await rosters_missing(db):
+            await enqueue_once(db, "rosters.rebuild")
+    except Exception as e:
+        logger.error(f"Failed to enqueue the roster rebuild: {str(e)}")
+
+@job_handler("rosters.rebuild")
+async def run_rebuild_rosters_job(job: JobContext) -> Dict[str, Any]:
+    # A worker that saw the empty collection before an earlier rebuild finished may have claimed it again
+    count = await rebuild_rosters(job.db) if await rosters_missing(job.db) else 0
+    # Done: a later drop of the collection is rebuilt on the next start
+    await release_once(job.db, "rosters.rebuild")
+    return {"rosters": count}
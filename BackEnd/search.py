@@ -0,0 +1,104 @@
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import UpdateOne
+from typing import Dict, Any, List, Iterable
+import logging
+import re
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Every student and teacher document carries "search_keys": lowercase tokens of the
+# searchable fields. A multikey index on it turns an anchored prefix regex into an
+# index range scan, so autocomplete stays fast on large collections.
+SEARCH_KEYS_FIELD = "search_keys"
+TOKEN_SPLIT = re.compile(r"[^\w@.+-]+")
+MAX_QUERY_TOKENS = 5
+CANDIDATES_PER_RESULT = 5
+BACKFILL_BATCH_SIZE = 1000
+
+STUDENT_SEARCH_FIELDS = ["fullName", "registrationNumber", "email"]
+TEACHER_SEARCH_FIELDS = ["fullName", "teacherId", "email"]
+STUDENT_RESULT_FIELDS = {"fullName": 1, "registrationNumber": 1, "email": 1, "department": 1, "yearOfStudy": 1, "section": 1}
+TEACHER_RESULT_FIELDS = {"fullName": 1, "teacherId": 1, "email": 1, "department": 1, "designation": 1}
+
+def tokenize(text: Any) -> List[str]:
+    if text is None:
+        return []
+    return [token for token in TOKEN_SPLIT.split(str(text).lower()) if token]
+
+def build_search_keys(document: Dict[str, Any], fields: Iterable[str]) -> List[str]:
+    keys = set()
+    for field in fields:
+        value = document.get(field)
+        if value is None:
+            continue
+        keys.update(tokenize(value))
+    return sorted(keys)
+
+def student_search_keys(student: Dict[str, Any]) -> List[str]:
+    return build_search_keys(student, STUDENT_SEARCH_FIELDS)
+
+def teacher_search_keys(teacher: Dict[str, Any]) -> List[str]:
+    return build_search_keys(teacher, TEACHER_SEARCH_FIELDS)
+
+def prefix_query(query: str) -> Dict[str, Any]:
+    tokens = tokenize(query)[:MAX_QUERY_TOKENS]
+    return {SEARCH_KEYS_FIELD: {"$all": [re.compile("^" + re.escape(token)) for token in tokens]}}
+
+def rank(document: Dict[str, Any], query: str, id_field: str) -> tuple:
+    """Exact identifier matches first, then names starting with the query, then the rest by name."""
+    normalized = query.strip().lower()
+    name = str(document.get("fullName", "")).lower()
+    identifier = str(document.get(id_field, "")).lower()
+    if identifier == normalized:
+        score = 0
+    elif name.startswith(normalized) or identifier.startswith(normalized):
+        score = 1
+    else:
+        score = 2
+    return (score, name)
+
+async def search_collection(
+    db: AsyncIOMotorDatabase,
+    collection: str,
+    query: str,
+    limit: int,
+    projection: Dict[str, Any],
+    id_field: str
+) -> List[Dict[str, Any]]:
+    if not tokenize(query):
+        return []
+    candidates = await db[collection].find(prefix_query(query), projection).limit(limit * CANDIDATES_PER_RESULT).to_list(length=None)
+    candidates.sort(key=lambda document: rank(document, query, id_field))
+    results = []
+    for document in candidates[:limit]:
+        document["id"] = str(document.pop("_id"))
+        if "department" in document:
+            document["department"] = str(document["department"])
+        results.append(document)
+    return results
+
+async def search_students(db: AsyncIOMotorDatabase, query: str, limit: int) -> List[Dict[str, Any]]:
+    return await search_collection(db, "students", query, limit, STUDENT_RESULT_FIELDS, "registrationNumber")
+
+async def search_teachers(db: AsyncIOMotorDatabase, query: str, limit: int) -> List[Dict[str, Any]]:
+    return await search_collection(db, "db.teachers", query, limit, TEACHER_RESULT_FIELDS, "teacherId")
+
+async def backfill_search_keys(db: AsyncIOMotorDatabase) -> None:
+    """Populate search_keys on documents written before it existed (or by tools that skip it)."""
+    for collection, fields in [("students", STUDENT_SEARCH_FIELDS), ("db.teachers", TEACHER_SEARCH_FIELDS)]:
+        updated = 0
+        operations = []
+        projection = {field: 1 for field in fields}
+        async for document in db[collection].find({SEARCH_KEYS_FIELD: {"$exists": False}}, projection):
+            operations.append(UpdateOne({"_id": document["_id"]}, {"$set": {SEARCH_KEYS_FIELD: build_search_keys(document, fields)}}))
+            if len(operations) >= BACKFILL_BATCH_SIZE:
+                await db[collection].bulk_write(operations, ordered=False)
+                updated += len(operations)
+                operations = []
+        if operations:
+            await db[collection].bulk_write(operations, ordered=False)
+            updated += len(operations)
+        if updated:
+            logger.info(f"Backfilled search keys for {updated} documents in {collection}")
@@ -0,0 +1,188 @@
+"""
+Production entry point: a pre-forked pool of uvicorn workers sharing one listening socket.
+
+The application is imported once in the supervisor and inherited by every
+worker through fork, so workers start without re-importing the code base.
+Each worker opens its own MongoDB pool in the application lifespan and
+reports how long it took to become ready. On SIGTERM or SIGINT every worker
+stops accepting connections, drains in-flight requests for up to
+``--graceful-timeout`` seconds, runs the lifespan shutdown (which closes its
+MongoDB pool) and exits; workers that die unexpectedly are replaced.
+
+uvloop and httptools are used when installed, otherwise asyncio and h11.
+
+    python serve.py --workers 8 --port 8000
+    WEB_CONCURRENCY=8 PORT=8000 python serve.py
+
+AUTH_SECRET_KEY must be set: tokens are never signed with the development key here.
+
+Use ``python main.py`` for the auto-reloading development server.
+"""
+from typing import Dict
+import argparse
+import importlib.util
+import logging
+import multiprocessing
+import os
+import queue
+import signal
+import sys
+import threading
+import time
+import uvicorn
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+RESPAWN_DELAY_SECONDS = 1.0
+SUPERVISE_INTERVAL_SECONDS = 0.2
+
+def report_startup(server: uvicorn.Server, index: int, spawned_at: float, reports: multiprocessing.Queue) -> None:
+    """Runs in a worker thread: tell the supervisor once the worker's lifespan startup has completed."""
+    while not server.started:
+        if server.should_exit:
+            return
+        time.sleep(0.01)
+    reports.put((index, os.getpid(), time.monotonic() - spawned_at))
+
+def run_worker(config: uvicorn.Config, sock, index: int, spawned_at: float, reports: multiprocessing.Queue) -> None:
+    # uvicorn installs its own graceful SIGTERM/SIGINT handlers once serving
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    server = uvicorn.Server(config)
+    threading.Thread(target=report_startup, args=(server, index, spawned_at, reports), daemon=True).start()
+    server.run(sockets=[sock])
+
+class Supervisor:
+    def __init__(self, config: uvicorn.Config, workers: int, graceful_timeout: float):
+        self.config = config
+        self.worker_count = workers
+        self.graceful_timeout = graceful_timeout
+        self.context = multiprocessing.get_context("fork")
+        self.reports = self.context.Queue()
+        self.processes: Dict[int, multiprocessing.Process] = {}
+        self.spawned_at: Dict[int, float] = {}
+        self.startup_times: Dict[int, float] = {}
+        self.should_exit = threading.Event()
+        self.sock = None
+
+    def spawn(self, index: int) -> None:
+        spawned_at = time.monotonic()
+        process = self.context.Process(
+            target=run_worker,
+            args=(self.config, self.sock, index, spawned_at, self.reports),
+            name=f"satscore-worker-{index}"
+        )
+        process.start()
+        self.processes[index] = process
+        self.spawned_at[index] = spawned_at
+        logger.info(f"Spawned worker {index} (pid {process.pid})")
+
+    def handle_signal(self, signum: int, frame) -> None:
+        logger.info(f"Received {signal.Signals(signum).name}; draining workers")
+        self.should_exit.set()
+
+    def collect_reports(self) -> None:
+        while True:
+            try:
+                index, pid, elapsed = self.reports.get_nowait()
+            except queue.Empty:
+                return
+            first_round = index not in self.startup_times
+            self.startup_times[index] = elapsed
+            logger.info(f"Worker {index} (pid {pid}) ready in {elapsed * 1000:.0f} ms")
+            if first_round and len(self.startup_times) == self.worker_count:
+                times = sorted(self.startup_times.values())
+                logger.info(
+                    f"All {self.worker_count} workers ready: "
+                    f"fastest {times[0] * 1000:.0f} ms, slowest {times[-1] * 1000:.0f} ms"
+                )
+
+    def supervise(self) -> None:
+        while not self.should_exit.is_set():
+            self.collect_reports()
+            for index, process in list(self.processes.items()):
+                if process.is_alive() or self.should_exit.is_set():
+                    continue
+                logger.error(f"Worker {index} (pid {process.pid}) exited with code {process.exitcode}; restarting")
+                # Avoid a tight crash loop when a worker cannot start at all
+                wait = RESPAWN_DELAY_SECONDS - (time.monotonic() - self.spawned_at[index])
+                if wait > 0:
+                    self.should_exit.wait(wait)
+                if not self.should_exit.is_set():
+                    self.spawn(index)
+            self.should_exit.wait(SUPERVISE_INTERVAL_SECONDS)
+
+    def shutdown(self) -> None:
+        for process in self.processes.values():
+            if process.is_alive():
+                os.kill(process.pid, signal.SIGTERM)
+        deadline = time.monotonic() + self.graceful_timeout + 5
+        for index, process in self.processes.items():
+            process.join(max(0.0, deadline - time.monotonic()))
+            if process.is_alive():
+                logger.error(f"Worker {index} (pid {process.pid}) did not drain in time; killing it")
+                process.kill()
+                process.join()
+        self.collect_reports()
+        logger.info("All workers stopped")
+
+    def run(self) -> int:
+        self.sock = self.config.bind_socket()
+        for index in range(self.worker_count):
+            self.spawn(index)
+        signal.signal(signal.SIGTERM, self.handle_signal)
+        signal.signal(signal.SIGINT, self.handle_signal)
+        try:
+            self.supervise()
+        finally:
+            self.shutdown()
+            self.sock.close()
+        return 0
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Run the SAT Score API with multiple worker processes")
+    parser.add_argument("--host", default=os.getenv("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "8000")))
+    parser.add_argument("--workers", type=int, default=int(os.getenv("WEB_CONCURRENCY", str(os.cpu_count() or 1))))
+    parser.add_argument("--graceful-timeout", type=float, default=float(os.getenv("GRACEFUL_TIMEOUT", "30")),
+                        help="Seconds a worker may spend draining in-flight requests on shutdown")
+    parser.add_argument("--keep-alive", type=int, default=int(os.getenv("KEEP_ALIVE_TIMEOUT", "5")))
+    parser.add_argument("--backlog", type=int, default=int(os.getenv("BACKLOG", "2048")))
+    return parser.parse_args()
+
+def main() -> int:
+    args = parse_args()
+    loop = "uvloop" if importlib.util.find_spec("uvloop") else "asyncio"
+    http = "httptools" if importlib.util.find_spec("httptools") else "h11"
+
+    # Preload: import the application once, before forking
+    started = time.monotonic()
+    from main import app
+    from auth.security import require_secret_key
+    logger.info(f"Application preloaded in {(time.monotonic() - started) * 1000:.0f} ms")
+    # Fail once here rather than in every worker's lifespan, which the supervisor would keep respawning
+    try:
+        require_secret_key()
+    except RuntimeError as e:
+        logger.error(str(e))
+        return 2
+
+    config = uvicorn.Config(
+        app,
+        host=args.host,
+        port=args.port,
+        loop=loop,
+        http=http,
+        lifespan="on",
+        backlog=args.backlog,
+        timeout_keep_alive=args.keep_alive,
+        timeout_graceful_shutdown=args.graceful_timeout,
+        log_level="info"
+    )
+    logger.info(f"Serving on {args.host}:{args.port} with {args.workers} workers (loop={loop}, http={http})")
+    return Supervisor(config, args.workers, args.graceful_timeout).run()
+
+if __name__ == "__main__":
+    sys.exit(main())
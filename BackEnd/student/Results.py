@@ -0,0 +1,92 @@
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from typing import Dict, Any
+from dependencies import get_db, get_current_user
+from cache import etag_matches
+from results import get_results
+import logging
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+INTERNAL_FIELDS = ("_id", "reference_versions", "format", "etag", "refreshed_at")
+
+def results_response(request: Request, document: Dict[str, Any], payload: Any) -> Response:
+    headers = {"ETag": document["etag"], "Cache-Control": "private, no-cache"}
+    if etag_matches(request, document["etag"]):
+        return Response(status_code=304, headers=headers)
+    return JSONResponse(content=jsonable_encoder(payload), headers=headers)
+
+async def load_own_results(db: AsyncIOMotorDatabase, user: Dict[str, Any]) -> Dict[str, Any]:
+    document = await get_results(db, user["id"])
+    if not document:
+        raise HTTPException(status_code=404, detail="Student not found")
+    return document
+
+@router.get("/student/me/results", response_model=Dict[str, Any])
+async def get_my_results(
+    request: Request,
+    db: AsyncIOMotorDatabase = Depends(get_db),
+    user: Dict[str, Any] = Depends(get_current_user)
+):
+    """Every semester's subjects with internal, SAT and final marks, grades and GPA."""
+    try:
+        document = await load_own_results(db, user)
+        return results_response(request, document, {key: value for key, value in document.items() if key not in INTERNAL_FIELDS})
+    except HTTPException as e:
+        raise e
+    except Exception as e:
+        logger.error(f"Error retrieving results for student {user['id']}: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/student/me/results/{semester}", response_model=Dict[str, Any])
+async def get_my_semester_results(
+    semester: str,
+    request: Request,
+    db: AsyncIOMotorDatabase = Depends(get_db),
+    user: Dict[str, Any] = Depends(get_current_user)
+):
+    try:
+        document = await load_own_results(db, user)
+        entry = next((row for row in document.get("semesters", []) if row["semester"] == semester), None)
+        if entry is None:
+            raise HTTPException(status_code=404, detail=f"No results for semester {semester}")
+        return results_response(request, document, entry)
+    except HTTPException as e:
+        raise e
+    except Exception as e:
+        logger.error(f"Error retrieving semester {semester} results for student {user['id']}: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/student/me/summary", response_model=Dict[str, Any])
+async def get_my_summary(
+    request: Request,
+    db: AsyncIOMotorDatabase = Depends(get_db),
+    user: Dict[str, Any] = Depends(get_current_user)
+):
+    """CGPA, credits and per-semester GPA for the dashboard and performance pages."""
+    try:
+        document = await load_own_results(db, user)
+        return results_response(request, document, {
+            "fullName": document.get("fullName"),
+            "registrationNumber": document.get("registrationNumber"),
+            "department": document.get("department"),
+            "currentSemester": document.get("currentSemester"),
+            "cgpa": document.get("cgpa"),
+            "totalCredits": document.get("totalCredits"),
+            "earnedCredits": document.get("earnedCredits"),
+            "semesterProgress": [
+                {"semester": row["semester"], "gpa": row["gpa"], "subjects": len(row["subjects"]), "credits": row["credits"]}
+                for row in document.get("semesters", [])
+            ],
+        })
+    except HTTPException as e:
+        raise e
+    except Exception as e:
+        logger.error(f"Error retrieving summary for student {user['id']}: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
@@ -4,6 +4,7 @@ from typing import List, Dict, Any
 from bson import ObjectId
 from database import StudentDB, SubjectDB, TeacherDB, DepartmentDB
 from dependencies import get_student_db, get_subject_db, get_teacher_db, get_department_db, get_current_user
+from rosters import roster_members
 import logging
 from datetime import date, timedelta
 
@@ -86,7 +87,7 @@ async def get_teacher_dashboard(
             raise HTTPException(status_code=400, detail="Invalid teacher ID format")
 
         # Fetch teacher data
-        teacher = await teacher_db.collection.find_one({"_id": ObjectId(teacher_id)})
+        teacher = await teacher_db.collection.find_one({"_id": ObjectId(teacher_id)}, {"department": 1, "subjectsHandled": 1})
         if not teacher:
             raise HTTPException(status_code=404, detail="Teacher not found")
         teacher = sanitize_value(teacher)
@@ -100,7 +101,7 @@ async def get_teacher_dashboard(
 
         # Fetch department
         dept_id = teacher.get("department")
-        department = await department_db.collection.find_one({"_id": ObjectId(dept_id)})
+        department = await department_db.collection.find_one({"_id": ObjectId(dept_id)}, {"name": 1})
         if not department:
             raise HTTPException(status_code=404, detail=f"Department {dept_id} not found")
         department = sanitize_value(department)
@@ -115,7 +116,7 @@ async def get_teacher_dashboard(
                 section = subject_handled.get("section", "A")
 
                 # Fetch subject
-                subject = await subject_db.collection.find_one({"_id": ObjectId(subject_id)})
+                subject = await subject_db.collection.find_one({"_id": ObjectId(subject_id)}, {"name": 1})
                 if not subject:
                     logger.warning(f"Subject {subject_id} not found")
                     continue
@@ -125,13 +126,12 @@ async def get_teacher_dashboard(
                 # Derive class name (e.g., "CS-A")
                 class_name = f"{dept_short}-{section}"
 
+                # The class roster gives the size and members without scanning students
+                members = await roster_members(student_db.collection.database, [{"subject_id": str(subject_id), "batch": str(batch), "section": section}])
+                student_count = len(members)
+
                 # Estimate semester (query students for yearOfStudy)
-                students_in_class = await student_db.collection.find({
-                    "courses": ObjectId(subject_id),
-                    "department": ObjectId(dept_id),
-                    "academic_year": {"$regex": f"^{batch}"}
-                }).to_list(length=None)
-                student_count = len(students_in_class)
+                students_in_class = await student_db.collection.find({"_id": {"$in": members}}, {"yearOfStudy": 1}).to_list(length=None)
                 semester = 3  # Default
                 if students_in_class:
                     years = [int(s.get("yearOfStudy", 1)) for s in students_in_class]
@@ -164,8 +164,7 @@ async def get_teacher_dashboard(
 
                 # Check pending marks
                 unsubmitted_marks = await student_db.collection.count_documents({
-                    "courses": ObjectId(subject_id),
-                    "department": ObjectId(dept_id),
+                    "_id": {"$in": members},
                     "$or": [
                         {f"internal_marks.{subject_id}.isSubmitted": {"$ne": True}},
                         {f"sat_marks.{subject_id}.isSubmitted": {"$ne": True}}
@@ -1,11 +1,20 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
+from motor.motor_asyncio import AsyncIOMotorDatabase
 from pydantic import BaseModel, Field
 from typing import List, Dict, Any, Optional, Union
 from bson import ObjectId
+from pymongo import ReturnDocument
 from database import StudentDB, SubjectDB
-from dependencies import get_student_db, get_subject_db
+from dependencies import get_student_db, get_subject_db, get_read_db, get_current_user
+from cache import conditional_json, bump_versions
+from results import refresh_results
+from assessment import INTERNAL_SCORE_FIELD, get_internal_rules, store_internal_score
+from filters import StudentFilters, facet_counts, assignment_scope, scoped_query, scoped_subjects, class_subjects, marks_projection
+from optimistic import version_filter, version_path, current_version, describe_conflict
+from events import publish_class_saves
 import logging
 from datetime import date
+from collections import Counter
 
 # Set up logging
 logging.basicConfig(level=logging.DEBUG, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
@@ -20,6 +29,7 @@ class InternalMarkEntry(BaseModel):
     fat: Union[float, int] = Field(..., ge=0, le=100)
     assignments: List[Union[float, int]] = Field(..., min_items=1, max_items=5)  # 1-5 assignments
     academic_year: str
+    version: Optional[int] = Field(None, ge=0)  # version read from GET /internal-marks; omit for a blind write
 
 class InternalMarksData(BaseModel):
     marks: List[InternalMarkEntry]
@@ -46,7 +56,7 @@ def sanitize_value(value: Any) -> Any:
         logger.warning(f"Unexpected type in sanitize_value: {type(value)}")
         return str(value)
 
-@router.post("/internal-marks", response_model=Dict[str, str])
+@router.post("/internal-marks", response_model=Dict[str, Any])
 async def save_internal_marks(
     marks_data: InternalMarksData,
     student_db: StudentDB = Depends(get_student_db),
@@ -54,10 +64,17 @@ async def save_internal_marks(
 ):
     logger.debug(f"Received internal marks payload: {marks_data.dict()}")
     saved_count = 0
+    saved_students = set()
     errors = []
+    conflicts = []
+    versions = []
+    # Saved and conflicting entries per class (subject, section), for the live marks events
+    saved_classes: Counter = Counter()
+    conflicted_classes: Counter = Counter()
     try:
         if not marks_data.marks:
             raise HTTPException(status_code=400, detail="No internal marks data provided.")
+        rules = await get_internal_rules(student_db.collection.database)
 
         for index, mark in enumerate(marks_data.marks):
             try:
@@ -93,13 +110,13 @@ async def save_internal_marks(
                         continue
 
                 # Validate student
-                student = await student_db.collection.find_one({"_id": student_oid})
+                student = await student_db.collection.find_one({"_id": student_oid}, {"courses": 1, "section": 1})
                 if not student:
                     errors.append(f"Entry {index}: Student {mark.student_id} not found")
                     continue
 
                 # Validate subject
-                subject = await subject_db.collection.find_one({"_id": subject_oid})
+                subject = await subject_db.collection.find_one({"_id": subject_oid}, {"code": 1})
                 if not subject:
                     errors.append(f"Entry {index}: Subject {mark.subject_id} not found")
                     continue
@@ -123,38 +140,67 @@ async def save_internal_marks(
                     errors.append(f"Entry {index}: Subject {mark.subject_id} (Code: {subject.get('code', 'N/A')}) not assigned to student {mark.student_id}")
                     continue
 
-                # Update internal_marks in students collection
-                update_result = await student_db.collection.update_one(
-                    {"_id": student_oid},
+                # Update internal_marks in students collection, only if no one else saved this entry since it was read
+                updated = await student_db.collection.find_one_and_update(
+                    {"_id": student_oid, **version_filter("internal_marks", mark.subject_id, mark.version)},
                     {
                         "$set": {
                             f"internal_marks.{mark.subject_id}.fat{mark.fat_number}": float(mark.fat),
                             f"internal_marks.{mark.subject_id}.assignments": [float(a) for a in mark.assignments],
                             "updated_at": date.today().isoformat()
-                        }
-                    }
+                        },
+                        "$inc": {version_path("internal_marks", mark.subject_id): 1}
+                    },
+                    projection={f"internal_marks.{mark.subject_id}": 1},
+                    return_document=ReturnDocument.AFTER
                 )
 
-                if update_result.modified_count > 0 or update_result.matched_count > 0:
+                if updated:
                     saved_count += 1
+                    saved_students.add(student_oid)
+                    saved_classes[(mark.subject_id, student.get("section"))] += 1
+                    entry = updated["internal_marks"][mark.subject_id]
+                    internal = await store_internal_score(student_db.collection, student_oid, mark.subject_id, entry, rules)
+                    versions.append({
+                        "student_id": mark.student_id,
+                        "subject_id": mark.subject_id,
+                        "version": current_version(entry),
+                        "internal": internal
+                    })
                     logger.info(f"Saved internal mark for Student: {mark.student_id}, Subject: {mark.subject_id}, FAT: {mark.fat_number}, Assignments: {mark.assignments}")
                 else:
-                    errors.append(f"Entry {index}: Failed to save internal mark for Student: {mark.student_id}, Subject: {mark.subject_id}")
+                    conflicts.append(await describe_conflict(student_db.collection, student_oid, "internal_marks", mark.subject_id, index, mark.version))
+                    conflicted_classes[(mark.subject_id, student.get("section"))] += 1
+                    logger.warning(f"Version conflict on internal marks for Student: {mark.student_id}, Subject: {mark.subject_id}")
 
             except Exception as e_inner:
                 error_msg = f"Entry {index} (Student: {mark.student_id}, Subject: {mark.subject_id}): Error - {str(e_inner)}"
                 logger.error(error_msg)
                 errors.append(error_msg)
 
+        if saved_count > 0:
+            await bump_versions(student_db.collection.database, "students")
+            await refresh_results(student_db.collection.database, saved_students)
+        await publish_class_saves(student_db.collection.database, "internal_marks.saved", saved_classes, conflicted_classes)
+
+        if conflicts:
+            # Entries without a conflict are saved; the rest must be re-read and merged by the client
+            raise HTTPException(status_code=409, detail={
+                "message": f"{len(conflicts)} entries were changed by someone else since they were loaded. Saved: {saved_count} entries.",
+                "conflicts": conflicts,
+                "errors": errors,
+                "versions": versions
+            })
+
         if errors:
             error_details = "; ".join(errors)
             if saved_count == 0:
                 raise HTTPException(status_code=400, detail=f"Internal marks processing errors: {error_details}. Saved: {saved_count} entries.")
             else:
                 logger.warning(f"Partial success: {error_details}. Saved: {saved_count} entries.")
-                return {"status": f"Internal marks saved for {saved_count} entries with errors: {error_details}"}
+                return {"status": f"Internal marks saved for {saved_count} entries with errors: {error_details}", "versions": versions}
         else:
-            return {"status": f"Internal marks saved for {saved_count} entries."}
+            return {"status": f"Internal marks saved for {saved_count} entries.", "versions": versions}
 
     except HTTPException as e:
         logger.error(f"HTTP Exception in save_internal_marks: {e.detail}")
@@ -163,26 +209,38 @@ async def save_internal_marks(
         logger.error(f"Unexpected error in save_internal_marks: {str(e_outer)}")
         raise HTTPException(status_code=500, detail=f"Unexpected error: {str(e_outer)}")
 
-@router.get("/internal-marks", response_model=List[Dict[str, Any]])
+@router.get("/internal-marks", response_model=Union[List[Dict[str, Any]], Dict[str, Any]])
 async def get_internal_marks(
-    student_db: StudentDB = Depends(get_student_db),
-    subject_db: SubjectDB = Depends(get_subject_db)
+    request: Request,
+    filters: StudentFilters = Depends(),
+    db: AsyncIOMotorDatabase = Depends(get_read_db("internal_marks.list")),
+    user: Dict[str, Any] = Depends(get_current_user)
 ):
-    try:
+    """
+    Marks of the students in the caller's classes. Teachers are scoped to
+    their subjectsHandled (narrowed by subject, batch and section); admins
+    see every class unless they pass a scope.
+    """
+    async def build():
         students = []
-        all_subjects = await subject_db.collection.find().to_list(length=None)
+        all_subjects = await db["db.subjects"].find({}, {"code": 1, "name": 1}).to_list(length=None)
         logger.info(f"Found {len(all_subjects)} subjects: {[s.get('code', 'N/A') for s in all_subjects]}")
         
-        async for student in student_db.collection.find({}, {"fileContent": 0, "photo": 0}):
+        async for student in db["students"].find(query, marks_projection("internal_marks", {"fullName": 1, "registrationNumber": 1, "department": 1, "yearOfStudy": 1, "academic_year": 1, "yearOfJoining": 1, "section": 1}, subjects)):
             try:
                 student_id = str(student.get("_id", "unknown"))
                 internal_marks = student.get("internal_marks", {})
                 sanitized_marks = []
+                allowed = class_subjects(student, subjects, assignments)
 
                 # Sanitize student data
                 student = sanitize_value(student)
 
                 for subject_id, marks_data in internal_marks.items():
+                    if allowed is not None and subject_id not in allowed:
+                        continue
+                    if not filters.includes_subject(subject_id):
+                        continue
                     try:
                         subject = next((s for s in all_subjects if str(s["_id"]) == subject_id), None)
                         if not subject:
@@ -201,7 +259,9 @@ async def get_internal_marks(
                             "fat2": float(marks_data.get("fat2", 0)) if marks_data.get("fat2") is not None else 0,
                             "fat3": float(marks_data.get("fat3", 0)) if marks_data.get("fat3") is not None else 0,
                             "assignments": [float(a) for a in marks_data.get("assignments", [])],
-                            "academic_year": student.get("academic_year", "2024-2025")
+                            "internal": marks_data.get(INTERNAL_SCORE_FIELD),
+                            "academic_year": student.get("academic_year", "2024-2025"),
+                            "version": current_version(marks_data)
                         })
 
                     except Exception as e_mark:
@@ -222,7 +282,23 @@ async def get_internal_marks(
                 students.append({"id": student_id, "error": "Failed to process student data", "fullName": "Error"})
 
         logger.info(f"Returning internal marks for {len(students)} students")
+        if filters.facets:
+            return {"students": students, "facets": await facet_counts(db, filters, assignments)}
         return students
+
+    try:
+        assignments = await assignment_scope(db, user, filters)
+        query = await scoped_query(db, await filters.query(db), assignments)
+        subjects = scoped_subjects(filters, assignments)
+        return await conditional_json(
+            request,
+            db,
+            ["students", "db.subjects"] + (["db.teachers"] if assignments is not None else []),
+            build,
+            scope=user["id"] if assignments is not None else ""
+        )
+    except HTTPException as e:
+        raise e
     except Exception as e:
         logger.error(f"Error retrieving internal marks: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed to retrieve internal marks: {str(e)}")
\ No newline at end of file
@@ -1,11 +1,21 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request, Query
+from motor.motor_asyncio import AsyncIOMotorDatabase
 from pydantic import BaseModel, Field
-from typing import List, Dict, Any, Union
+from typing import List, Dict, Any, Union, Optional, Callable, Awaitable
 from bson import ObjectId
+from pymongo import ReturnDocument
 from database import StudentDB, SubjectDB
-from dependencies import get_student_db, get_subject_db
+from dependencies import get_student_db, get_subject_db, get_read_db, get_current_user
+from cache import conditional_json, bump_versions
+from results import refresh_results
+from rosters import roster_members
+from filters import StudentFilters, facet_counts, assignment_scope, scoped_query, scoped_subjects, class_subjects, marks_projection
+from jobs import job_handler, JobContext, enqueue, accepted
+from optimistic import version_filter, version_path, current_version, describe_conflict
+from events import publish_marks_event, publish_class_saves
 import logging
 from datetime import date
+from collections import Counter
 
 # Set up logging
 logging.basicConfig(level=logging.DEBUG, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
@@ -18,6 +28,7 @@ class SATMarkEntry(BaseModel):
     subject_id: str
     marks: Union[float, int] = Field(..., ge=0, le=100)
     academic_year: str
+    version: Optional[int] = Field(None, ge=0)  # version read from GET /sat-marks; omit for a blind write
 
 class SATMarksData(BaseModel):
     marks: List[SATMarkEntry]
@@ -48,7 +59,7 @@ def sanitize_value(value: Any) -> Any:
         logger.warning(f"Unexpected type in sanitize_value: {type(value)}")
         return str(value)
 
-@router.post("/sat-marks", response_model=Dict[str, str])
+@router.post("/sat-marks", response_model=Dict[str, Any])
 async def save_sat_marks(
     marks_data: SATMarksData,
     student_db: StudentDB = Depends(get_student_db),
@@ -56,7 +67,13 @@ async def save_sat_marks(
 ):
     logger.debug(f"Received SAT marks payload: {marks_data.dict()}")
     saved_count = 0
+    saved_students = set()
     errors = []
+    conflicts = []
+    versions = []
+    # Saved and conflicting entries per class (subject, section), for the live marks events
+    saved_classes: Counter = Counter()
+    conflicted_classes: Counter = Counter()
     try:
         if not marks_data.marks:
             raise HTTPException(status_code=400, detail="No SAT marks data provided.")
@@ -81,13 +98,13 @@ async def save_sat_marks(
                     continue
 
                 # Validate student
-                student = await student_db.collection.find_one({"_id": student_oid})
+                student = await student_db.collection.find_one({"_id": student_oid}, {"courses": 1, "section": 1, f"sat_marks.{mark.subject_id}.isSubmitted": 1})
                 if not student:
                     errors.append(f"Entry {index}: Student {mark.student_id} not found")
                     continue
 
                 # Validate subject
-                subject = await subject_db.collection.find_one({"_id": subject_oid})
+                subject = await subject_db.collection.find_one({"_id": subject_oid}, {"code": 1})
                 if not subject:
                     errors.append(f"Entry {index}: Subject {mark.subject_id} not found")
                     continue
@@ -105,39 +122,73 @@ async def save_sat_marks(
                     errors.append(f"Entry {index}: Subject {mark.subject_id} (Code: {subject.get('code', 'N/A')}) not assigned to student {mark.student_id}")
                     continue
 
-                # Update sat_marks in students collection
-                update_result = await student_db.collection.update_one(
-                    {"_id": student_oid},
+                # Update sat_marks in students collection, unless submitted or saved by someone else since it was read
+                updated = await student_db.collection.find_one_and_update(
+                    {
+                        "_id": student_oid,
+                        f"sat_marks.{mark.subject_id}.isSubmitted": {"$ne": True},
+                        **version_filter("sat_marks", mark.subject_id, mark.version)
+                    },
                     {
                         "$set": {
                             f"sat_marks.{mark.subject_id}.marks": float(mark.marks),
                             f"sat_marks.{mark.subject_id}.isSubmitted": False,
                             f"sat_marks.{mark.subject_id}.updated_at": date.today().isoformat(),
                             "updated_at": date.today().isoformat()
-                        }
-                    }
+                        },
+                        "$inc": {version_path("sat_marks", mark.subject_id): 1}
+                    },
+                    projection={version_path("sat_marks", mark.subject_id): 1},
+                    return_document=ReturnDocument.AFTER
                 )
 
-                if update_result.modified_count > 0 or update_result.matched_count > 0:
+                if updated:
                     saved_count += 1
+                    saved_students.add(student_oid)
+                    saved_classes[(mark.subject_id, student.get("section"))] += 1
+                    versions.append({
+                        "student_id": mark.student_id,
+                        "subject_id": mark.subject_id,
+                        "version": current_version(updated["sat_marks"][mark.subject_id])
+                    })
                     logger.info(f"Saved SAT mark for Student: {mark.student_id}, Subject: {mark.subject_id}, Marks: {mark.marks}")
                 else:
-                    errors.append(f"Entry {index}: Failed to save SAT mark for Student: {mark.student_id}, Subject: {mark.subject_id}")
+                    conflict = await describe_conflict(student_db.collection, student_oid, "sat_marks", mark.subject_id, index, mark.version)
+                    if conflict["current"].get("isSubmitted", False):
+                        errors.append(f"Entry {index}: Marks for subject {mark.subject_id} are already submitted and cannot be edited")
+                    else:
+                        conflicts.append(conflict)
+                        conflicted_classes[(mark.subject_id, student.get("section"))] += 1
+                        logger.warning(f"Version conflict on SAT marks for Student: {mark.student_id}, Subject: {mark.subject_id}")
 
             except Exception as e_inner:
                 error_msg = f"Entry {index} (Student: {mark.student_id}, Subject: {mark.subject_id}): Error - {str(e_inner)}"
                 logger.error(error_msg)
                 errors.append(error_msg)
 
+        if saved_count > 0:
+            await bump_versions(student_db.collection.database, "students")
+            await refresh_results(student_db.collection.database, saved_students)
+        await publish_class_saves(student_db.collection.database, "sat_marks.saved", saved_classes, conflicted_classes)
+
+        if conflicts:
+            # Entries without a conflict are saved; the rest must be re-read and merged by the client
+            raise HTTPException(status_code=409, detail={
+                "message": f"{len(conflicts)} entries were changed by someone else since they were loaded. Saved: {saved_count} entries.",
+                "conflicts": conflicts,
+                "errors": errors,
+                "versions": versions
+            })
+
         if errors:
             error_details = "; ".join(errors)
             if saved_count == 0:
                 raise HTTPException(status_code=400, detail=f"SAT marks processing errors: {error_details}. Saved: {saved_count} entries.")
             else:
                 logger.warning(f"Partial success: {error_details}. Saved: {saved_count} entries.")
-                return {"status": f"SAT marks saved for {saved_count} entries with errors: {error_details}"}
+                return {"status": f"SAT marks saved for {saved_count} entries with errors: {error_details}", "versions": versions}
         else:
-            return {"status": f"SAT marks saved for {saved_count} entries."}
+            return {"status": f"SAT marks saved for {saved_count} entries.", "versions": versions}
 
     except HTTPException as e:
         logger.error(f"HTTP Exception in save_sat_marks: {e.detail}")
@@ -146,11 +197,61 @@ async def save_sat_marks(
         logger.error(f"Unexpected error in save_sat_marks: {str(e_outer)}")
         raise HTTPException(status_code=500, detail=f"Unexpected error: {str(e_outer)}")
 
+SUBMIT_BATCH_SIZE = 500
+
+async def submit_subject_sat_marks(
+    db: AsyncIOMotorDatabase,
+    subject_id: str,
+    progress: Optional[Callable[[float, str], Awaitable[None]]] = None,
+    submitted_by: Optional[str] = None
+) -> int:
+    """Lock the saved SAT marks of every student taking the subject; returns the number of students updated."""
+    pending = {
+        f"sat_marks.{subject_id}": {"$exists": True},
+        f"sat_marks.{subject_id}.isSubmitted": {"$ne": True}
+    }
+    # The subject's rosters name every student taking it; only those with unsubmitted marks are locked
+    members = await roster_members(db, [{"subject_id": subject_id}])
+    student_ids = [doc["_id"] async for doc in db["students"].find({**pending, "_id": {"$in": members}}, {"_id": 1})]
+    updated_count = 0
+    for start in range(0, len(student_ids), SUBMIT_BATCH_SIZE):
+        batch = student_ids[start:start + SUBMIT_BATCH_SIZE]
+        update_result = await db["students"].update_many(
+            {**pending, "_id": {"$in": batch}},
+            {
+                "$set": {
+                    f"sat_marks.{subject_id}.isSubmitted": True,
+                    f"sat_marks.{subject_id}.updated_at": date.today().isoformat(),
+                    "updated_at": date.today().isoformat()
+                },
+                "$inc": {version_path("sat_marks", subject_id): 1}
+            }
+        )
+        updated_count += update_result.modified_count
+        if progress:
+            done = start + len(batch)
+            await progress(done * 100 / len(student_ids), f"Submitted {done} of {len(student_ids)} students")
+
+    if updated_count > 0:
+        await bump_versions(db, "students")
+        await refresh_results(db, student_ids)
+        await publish_marks_event(db, "sat_marks.submitted", subject_id=subject_id, submitted=updated_count, by=submitted_by)
+    logger.info(f"Submitted SAT marks for {updated_count} students for subject {subject_id}")
+    return updated_count
+
+@job_handler("sat_marks.submit")
+async def run_submit_sat_marks_job(job: JobContext) -> Dict[str, Any]:
+    subject_id = job.params["subject_id"]
+    updated_count = await submit_subject_sat_marks(job.db, subject_id, job.progress, job.params.get("submitted_by"))
+    return {"subject_id": subject_id, "updated_count": updated_count}
+
 @router.post("/sat-marks/submit", response_model=Dict[str, str])
 async def submit_sat_marks(
     submit_data: SubmitSATMarks,
+    background: bool = Query(False, description="Queue the submission and return 202 with a job to poll"),
     student_db: StudentDB = Depends(get_student_db),
-    subject_db: SubjectDB = Depends(get_subject_db)
+    subject_db: SubjectDB = Depends(get_subject_db),
+    user: Dict[str, Any] = Depends(get_current_user)
 ):
     logger.debug(f"Received SAT marks submission: {submit_data.dict()}")
     try:
@@ -160,39 +261,15 @@ async def submit_sat_marks(
         subject_oid = ObjectId(submit_data.subject_id)
 
         # Validate subject
-        subject = await subject_db.collection.find_one({"_id": subject_oid})
+        subject = await subject_db.collection.find_one({"_id": subject_oid}, {"_id": 1})
         if not subject:
             raise HTTPException(status_code=404, detail=f"Subject {submit_data.subject_id} not found")
 
-        # Update all students with this subject in their courses
-        updated_count = 0
-        async for student in student_db.collection.find({"courses": subject_oid}):
-            student_id = str(student["_id"])
-            sat_marks = student.get("sat_marks", {}).get(submit_data.subject_id, {})
-            if not sat_marks:
-                logger.warning(f"Student {student_id} has no SAT marks for subject {submit_data.subject_id}. Skipping submission.")
-                continue
-
-            # Skip if already submitted
-            if sat_marks.get("isSubmitted", False):
-                logger.info(f"Student {student_id} already has submitted marks for subject {submit_data.subject_id}")
-                continue
-
-            # Update submission status
-            update_result = await student_db.collection.update_one(
-                {"_id": student["_id"], f"sat_marks.{submit_data.subject_id}": {"$exists": True}},
-                {
-                    "$set": {
-                        f"sat_marks.{submit_data.subject_id}.isSubmitted": True,
-                        f"sat_marks.{submit_data.subject_id}.updated_at": date.today().isoformat(),
-                        "updated_at": date.today().isoformat()
-                    }
-                }
-            )
-
-            if update_result.modified_count > 0:
-                updated_count += 1
-                logger.info(f"Submitted SAT marks for Student: {student_id}, Subject: {submit_data.subject_id}")
+        if background:
+            job_id = await enqueue(student_db.collection.database, "sat_marks.submit", {"subject_id": submit_data.subject_id, "submitted_by": user.get("name")}, owner=user)
+            return accepted(job_id)
+
+        updated_count = await submit_subject_sat_marks(student_db.collection.database, submit_data.subject_id, submitted_by=user.get("name"))
 
         if updated_count == 0:
             logger.warning(f"No students updated for subject {submit_data.subject_id}. Possibly no marks or already submitted.")
@@ -207,26 +284,38 @@ async def submit_sat_marks(
         logger.error(f"Unexpected error in submit_sat_marks: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Unexpected error: {str(e)}")
 
-@router.get("/sat-marks", response_model=List[Dict[str, Any]])
+@router.get("/sat-marks", response_model=Union[List[Dict[str, Any]], Dict[str, Any]])
 async def get_sat_marks(
-    student_db: StudentDB = Depends(get_student_db),
-    subject_db: SubjectDB = Depends(get_subject_db)
+    request: Request,
+    filters: StudentFilters = Depends(),
+    db: AsyncIOMotorDatabase = Depends(get_read_db("sat_marks.list")),
+    user: Dict[str, Any] = Depends(get_current_user)
 ):
-    try:
+    """
+    Marks of the students in the caller's classes. Teachers are scoped to
+    their subjectsHandled (narrowed by subject, batch and section); admins
+    see every class unless they pass a scope.
+    """
+    async def build():
         students = []
-        all_subjects = await subject_db.collection.find().to_list(length=None)
+        all_subjects = await db["db.subjects"].find({}, {"code": 1, "name": 1}).to_list(length=None)
         logger.info(f"Found {len(all_subjects)} subjects: {[s.get('code', 'N/A') for s in all_subjects]}")
         
-        async for student in student_db.collection.find({}, {"fileContent": 0, "photo": 0}):
+        async for student in db["students"].find(query, marks_projection("sat_marks", {"fullName": 1, "registrationNumber": 1, "department": 1, "yearOfStudy": 1, "academic_year": 1, "yearOfJoining": 1, "section": 1}, subjects)):
             try:
                 student_id = str(student.get("_id", "unknown"))
                 sat_marks = student.get("sat_marks", {})
                 sanitized_marks = []
+                allowed = class_subjects(student, subjects, assignments)
 
                 # Sanitize student data
                 student = sanitize_value(student)
 
                 for subject_id, marks_data in sat_marks.items():
+                    if allowed is not None and subject_id not in allowed:
+                        continue
+                    if not filters.includes_subject(subject_id):
+                        continue
                     try:
                         subject = next((s for s in all_subjects if str(s["_id"]) == subject_id), None)
                         if not subject:
@@ -243,7 +332,8 @@ async def get_sat_marks(
                             "subject_name": subject.get("name", "N/A"),
                             "marks": float(marks_data.get("marks", 0)) if marks_data.get("marks") is not None else 0,
                             "isSubmitted": marks_data.get("isSubmitted", False),
-                            "academic_year": student.get("academic_year", "2024-2025")
+                            "academic_year": student.get("academic_year", "2024-2025"),
+                            "version": current_version(marks_data)
                         })
 
                     except Exception as e_mark:
@@ -264,7 +354,23 @@ async def get_sat_marks(
                 students.append({"id": student_id, "error": "Failed to process student data", "name": "Error"})
 
         logger.info(f"Returning SAT marks for {len(students)} students")
+        if filters.facets:
+            return {"students": students, "facets": await facet_counts(db, filters, assignments)}
         return students
+
+    try:
+        assignments = await assignment_scope(db, user, filters)
+        query = await scoped_query(db, await filters.query(db), assignments)
+        subjects = scoped_subjects(filters, assignments)
+        return await conditional_json(
+            request,
+            db,
+            ["students", "db.subjects"] + (["db.teachers"] if assignments is not None else []),
+            build,
+            scope=user["id"] if assignments is not None else ""
+        )
+    except HTTPException as e:
+        raise e
     except Exception as e:
         logger.error(f"Error retrieving SAT marks: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed to retrieve SAT marks: {str(e)}")
\ No newline at end of file
@@ -0,0 +1,78 @@
+from fastapi import HTTPException, Request
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
+from typing import Dict, Optional
+import logging
+import os
+import re
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Each college (tenant) has its own database on the shared connection pool.
+# The tenant comes from TENANT_HEADER, else from the subdomain of
+# TENANT_BASE_DOMAIN (abc.satscore.example.com -> abc), else DEFAULT_TENANT.
+TENANT_HEADER = os.getenv("TENANT_HEADER", "X-Tenant")
+TENANT_BASE_DOMAIN = os.getenv("TENANT_BASE_DOMAIN", "").lower().lstrip(".")
+DEFAULT_TENANT = os.getenv("DEFAULT_TENANT", "default")
+TENANT_SLUG = re.compile(r"^[a-z0-9][a-z0-9-]{0,62}$")
+
+def parse_tenants(value: str, default_database: str) -> Dict[str, str]:
+    """
+    ``TENANTS="abc=satscore_abc,xyz"`` -> {slug: database}; a slug without a
+    database uses ``satscore_<slug>``. The default tenant always maps to
+    DATABASE_NAME, so a single-college deployment needs no configuration.
+    """
+    tenants = {DEFAULT_TENANT: default_database}
+    for item in (part.strip() for part in value.split(",")):
+        if not item:
+            continue
+        slug, _, database = item.partition("=")
+        slug = slug.strip().lower()
+        if not TENANT_SLUG.match(slug):
+            raise ValueError(f"Invalid tenant slug: {slug}")
+        tenants[slug] = database.strip() or f"satscore_{slug.replace('-', '_')}"
+    return tenants
+
+class TenantRegistry:
+    """Tenant slug -> database handle, all on one client so tenants share the worker's pool."""
+
+    def __init__(self, client: AsyncIOMotorClient, tenants: Dict[str, str]):
+        self.client = client
+        self.tenants = tenants
+        # Motor database handles are cheap, but one per tenant is kept so per-request routing is a dict lookup
+        self.databases: Dict[str, AsyncIOMotorDatabase] = {slug: client[name] for slug, name in tenants.items()}
+
+    def database(self, slug: str) -> AsyncIOMotorDatabase:
+        database = self.databases.get(slug)
+        if database is None:
+            raise HTTPException(status_code=404, detail=f"Unknown tenant: {slug}")
+        return database
+
+    def resolve(self, request: Request) -> str:
+        """The tenant slug of a request; cached on request.state so dependencies resolve it once."""
+        slug = getattr(request.state, "tenant", None)
+        if slug is not None:
+            return slug
+        slug = request.headers.get(TENANT_HEADER) or subdomain_tenant(request.headers.get("host", "")) or DEFAULT_TENANT
+        slug = slug.strip().lower()
+        if not TENANT_SLUG.match(slug):
+            raise HTTPException(status_code=400, detail=f"Invalid tenant: {slug}")
+        if slug not in self.databases:
+            raise HTTPException(status_code=404, detail=f"Unknown tenant: {slug}")
+        request.state.tenant = slug
+        return slug
+
+def subdomain_tenant(host: str) -> Optional[str]:
+    if not TENANT_BASE_DOMAIN:
+        return None
+    host = host.split(":", 1)[0].lower()
+    suffix = "." + TENANT_BASE_DOMAIN
+    if not host.endswith(suffix):
+        return None
+    label = host[:-len(suffix)]
+    # Only the label directly under the base domain names the tenant
+    return label.rsplit(".", 1)[-1] or None
+
+def tenant_of(request: Request) -> str:
+    return request.app.tenants.resolve(request)
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The BackEnd modules import each other by top-level name, as when uvicorn runs from this directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
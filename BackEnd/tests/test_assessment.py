@@ -0,0 +1,22 @@
+from assessment import aggregate_internal, internal_rules_of, DEFAULT_INTERNAL_RULES
+
+def test_best_fats_and_assignments_are_weighted():
+    entry = {"fat1": 60, "fat2": 80, "fat3": 90, "assignments": [70, 90]}
+    # Best two FATs average 85, assignments 80: 0.7 * 85 + 0.3 * 80
+    assert aggregate_internal(entry, DEFAULT_INTERNAL_RULES) == 83.5
+
+def test_missing_component_gives_its_weight_to_the_other():
+    assert aggregate_internal({"fat1": 50, "fat2": 70}, DEFAULT_INTERNAL_RULES) == 60.0
+    assert aggregate_internal({"assignments": [40, 60]}, DEFAULT_INTERNAL_RULES) == 50.0
+
+def test_nothing_recorded_has_no_score():
+    assert aggregate_internal(None, DEFAULT_INTERNAL_RULES) is None
+    assert aggregate_internal({"fat1": None, "assignments": []}, DEFAULT_INTERNAL_RULES) is None
+
+def test_non_numbers_are_ignored():
+    assert aggregate_internal({"fat1": "absent", "fat2": True, "fat3": 40}, DEFAULT_INTERNAL_RULES) == 40.0
+
+def test_rules_from_the_criteria_document():
+    rules = internal_rules_of({"fat_best_of": "3", "fat_weight": 50, "assignment_weight": 50})
+    assert aggregate_internal({"fat1": 30, "fat2": 60, "fat3": 90, "assignments": [100]}, rules) == 80.0
+    assert internal_rules_of(None) == DEFAULT_INTERNAL_RULES
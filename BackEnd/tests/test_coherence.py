@@ -0,0 +1,66 @@
+"""
+Two API workers against one database: a write through either must reach the
+other's cached endpoints within VERSION_CACHE_MAX_STALENESS (see
+loadtest/coherence.py, which runs the same check at larger scale).
+
+Needs a MongoDB at MONGODB_TEST_URL and is skipped when there is none. The
+change stream case needs a replica set, even a single-node one; the capped
+collection fallback is forced with CACHE_INVALIDATION_MODE=capped and runs
+against either.
+"""
+import asyncio
+import os
+import uuid
+import pytest
+from pymongo import MongoClient
+from pymongo.errors import PyMongoError
+from cache import VERSION_CACHE_MAX_STALENESS
+from loadtest.coherence import start_workers, check
+from loadtest.seed import build_departments
+
+MONGODB_TEST_URL = os.getenv("MONGODB_TEST_URL")
+FIRST_PORT = int(os.getenv("COHERENCE_TEST_PORT", "8190"))
+
+@pytest.fixture
+def mongo():
+    if not MONGODB_TEST_URL:
+        pytest.skip("MONGODB_TEST_URL is not set")
+    client = MongoClient(MONGODB_TEST_URL, serverSelectionTimeoutMS=2000)
+    try:
+        hello = client.admin.command("hello")
+    except PyMongoError as e:
+        client.close()
+        pytest.skip(f"No MongoDB at MONGODB_TEST_URL: {e}")
+    try:
+        yield client, bool(hello.get("setName"))
+    finally:
+        client.close()
+
+@pytest.fixture
+def database_name(mongo):
+    client, _ = mongo
+    name = f"satscore_coherence_{uuid.uuid4().hex[:8]}"
+    client[name]["db.departments"].insert_many(build_departments(1))
+    try:
+        yield name
+    finally:
+        client.drop_database(name)
+
+@pytest.mark.parametrize("mode", ["change_stream", "capped"])
+def test_write_reaches_the_other_worker_within_the_staleness_bound(mongo, database_name, mode):
+    _, replica_set = mongo
+    if mode == "change_stream" and not replica_set:
+        pytest.skip("MONGODB_TEST_URL is not a replica set")
+    workers = start_workers(2, FIRST_PORT, {
+        "MONGODB_URL": MONGODB_TEST_URL,
+        "DATABASE_NAME": database_name,
+        "CACHE_INVALIDATION_MODE": mode,
+    })
+    try:
+        base_urls = [f"http://127.0.0.1:{FIRST_PORT + index}" for index in range(2)]
+        assert asyncio.run(check(base_urls, rounds=4, max_seconds=VERSION_CACHE_MAX_STALENESS))
+    finally:
+        for worker in workers:
+            worker.terminate()
+        for worker in workers:
+            worker.wait(timeout=10)
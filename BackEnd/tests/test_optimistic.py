@@ -0,0 +1,18 @@
+from optimistic import version_filter, current_version
+
+def test_blind_write_adds_no_condition():
+    assert version_filter("sat_marks", "abc", None) == {}
+
+def test_version_zero_also_matches_an_entry_without_a_counter():
+    assert version_filter("internal_marks", "abc", 0) == {
+        "$or": [{"internal_marks.abc.version": {"$exists": False}}, {"internal_marks.abc.version": 0}]
+    }
+
+def test_expected_version_must_match():
+    assert version_filter("sat_marks", "abc", 3) == {"sat_marks.abc.version": 3}
+
+def test_missing_counter_is_version_zero():
+    assert current_version(None) == 0
+    assert current_version({}) == 0
+    assert current_version({"version": None}) == 0
+    assert current_version({"version": 4}) == 4
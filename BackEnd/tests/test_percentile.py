@@ -0,0 +1,23 @@
+import pytest
+from loadtest.run import percentile
+
+SAMPLES = [float(value) for value in range(1, 101)]
+
+@pytest.mark.parametrize("fraction,expected", [
+    (0.50, 50.0),
+    (0.07, 7.0),
+    (0.95, 95.0),
+    (0.99, 99.0),
+    (1.0, 100.0),
+    (0.0, 1.0),
+])
+def test_nearest_rank_of_100_samples(fraction, expected):
+    assert percentile(SAMPLES, fraction) == expected
+
+def test_small_samples_round_up_to_the_next_rank():
+    assert percentile([1.0, 2.0, 3.0], 0.50) == 2.0
+    assert percentile([1.0, 2.0, 3.0], 0.99) == 3.0
+    assert percentile([5.0], 0.99) == 5.0
+
+def test_no_samples():
+    assert percentile([], 0.99) == 0.0
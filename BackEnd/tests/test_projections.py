@@ -0,0 +1,25 @@
+from fastapi import HTTPException
+import pytest
+from projections import parse_fields, DEFAULT_PROJECTION, HIDDEN_FIELDS
+
+def test_no_fields_hides_sensitive_fields():
+    assert parse_fields(None) == DEFAULT_PROJECTION
+    assert parse_fields("") == DEFAULT_PROJECTION
+
+def test_fields_become_an_inclusion_projection():
+    assert parse_fields("fullName, registrationNumber") == {"fullName": 1, "registrationNumber": 1}
+
+@pytest.mark.parametrize("fields", ["id", ",", "id,", " , id "])
+def test_only_id_never_returns_every_field(fields):
+    projection = parse_fields(fields)
+    assert projection == {"_id": 1}
+    assert not any(field in projection for field in HIDDEN_FIELDS)
+
+def test_parent_and_child_paths_keep_the_parent():
+    assert parse_fields("sat_marks,sat_marks.abc") == {"sat_marks": 1}
+
+@pytest.mark.parametrize("fields", ["password", "photo.data", "$where", "a..b"])
+def test_hidden_and_invalid_fields_are_rejected(fields):
+    with pytest.raises(HTTPException) as error:
+        parse_fields(fields)
+    assert error.value.status_code == 400
@@ -0,0 +1,15 @@
+import pytest
+from promotion import next_term, FINAL_SEMESTER
+
+@pytest.mark.parametrize("semester,expected", [
+    ("1", ("1", "2")),
+    ("2", ("2", "3")),
+    (3, ("2", "4")),
+    ("7", ("4", "8")),
+])
+def test_next_term_crosses_into_the_next_year_after_even_semesters(semester, expected):
+    assert next_term(semester) == expected
+
+@pytest.mark.parametrize("semester", [str(FINAL_SEMESTER), "9", "0", "-1", "", "II", None])
+def test_no_next_term_after_the_final_or_an_invalid_semester(semester):
+    assert next_term(semester) is None
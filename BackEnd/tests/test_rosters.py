@@ -0,0 +1,61 @@
+from bson import ObjectId
+from datetime import datetime, timezone
+from pymongo import UpdateOne
+import pytest
+import rosters
+from rosters import roster_changes, roster_id
+
+STUDENT = ObjectId()
+MATHS, PHYSICS = ObjectId(), ObjectId()
+NOW = datetime(2024, 6, 1, tzinfo=timezone.utc)
+
+class FrozenDatetime(datetime):
+    @classmethod
+    def now(cls, tz=None):
+        return NOW
+
+@pytest.fixture(autouse=True)
+def frozen_clock(monkeypatch):
+    monkeypatch.setattr(rosters, "datetime", FrozenDatetime)
+
+def student(courses, year=2023, section="A"):
+    return {"courses": courses, "yearOfJoining": year, "section": section}
+
+def join(subject_id, batch="2023", section="A"):
+    _id = roster_id(subject_id, batch, section)
+    return [
+        UpdateOne(
+            {"_id": _id},
+            {"$setOnInsert": {"subject_id": subject_id, "batch": batch, "section": section, "student_ids": [], "size": 0}},
+            upsert=True
+        ),
+        UpdateOne(
+            {"_id": _id, "student_ids": {"$ne": STUDENT}},
+            {"$push": {"student_ids": STUDENT}, "$inc": {"size": 1}, "$set": {"updated_at": NOW}}
+        ),
+    ]
+
+def leave(subject_id, batch="2023", section="A"):
+    return [UpdateOne(
+        {"_id": roster_id(subject_id, batch, section), "student_ids": STUDENT},
+        {"$pull": {"student_ids": STUDENT}, "$inc": {"size": -1}, "$set": {"updated_at": NOW}}
+    )]
+
+def test_new_student_creates_and_joins_every_roster():
+    assert roster_changes(STUDENT, None, student([MATHS, PHYSICS])) == join(MATHS) + join(PHYSICS)
+
+def test_deleted_student_leaves_every_roster():
+    assert roster_changes(STUDENT, student([MATHS]), None) == leave(MATHS)
+
+def test_course_change_in_the_same_class_only_touches_the_difference():
+    assert roster_changes(STUDENT, student([MATHS]), student([MATHS, PHYSICS])) == join(PHYSICS)
+    assert roster_changes(STUDENT, student([MATHS, PHYSICS]), student([PHYSICS])) == leave(MATHS)
+
+def test_section_change_moves_every_course():
+    assert roster_changes(STUDENT, student([MATHS]), student([MATHS], section="B")) == leave(MATHS) + join(MATHS, section="B")
+
+def test_string_course_ids_match_object_ids():
+    assert roster_changes(STUDENT, student([str(MATHS)]), student([MATHS])) == []
+
+def test_unchanged_student_writes_nothing():
+    assert roster_changes(STUDENT, student([MATHS]), student([MATHS])) == []
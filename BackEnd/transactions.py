@@ -0,0 +1,36 @@
+from motor.motor_asyncio import AsyncIOMotorClientSession, AsyncIOMotorDatabase
+from typing import Dict, Optional, Callable, Awaitable, TypeVar
+import logging
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Client -> whether its deployment runs multi-document transactions (a replica set or mongos)
+_supported: Dict[int, bool] = {}
+
+async def supports_transactions(db: AsyncIOMotorDatabase) -> bool:
+    key = id(db.client)
+    if key not in _supported:
+        hello = await db.client.admin.command("hello")
+        _supported[key] = bool(hello.get("setName")) or hello.get("msg") == "isdbgrid"
+        if not _supported[key]:
+            logger.info("Standalone MongoDB server: multi-document writes run without a transaction")
+    return _supported[key]
+
+async def run_in_transaction(
+    db: AsyncIOMotorDatabase,
+    callback: Callable[[Optional[AsyncIOMotorClientSession]], Awaitable[T]]
+) -> T:
+    """
+    Run ``callback(session)`` in one transaction, retried on transient errors
+    and unknown commit results. On a standalone server the callback gets
+    ``None`` and its writes apply one by one, as they did before
+    transactions were used.
+    """
+    if not await supports_transactions(db):
+        return await callback(None)
+    async with await db.client.start_session() as session:
+        return await session.with_transaction(callback)
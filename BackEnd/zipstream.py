@@ -0,0 +1,62 @@
+from typing import IO, List
+from datetime import datetime
+import zipfile
+
+class _Sink:
+    """A write-only, non-seekable file object that hands out what was written since the last drain."""
+
+    def __init__(self):
+        self.chunks: List[bytes] = []
+        self.position = 0
+
+    def write(self, data: bytes) -> int:
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self.position
+
+    def flush(self) -> None:
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks.clear()
+        return data
+
+class ZipStream:
+    """
+    Builds a zip archive incrementally so it can be sent with a
+    StreamingResponse while it is being produced. Because the sink cannot
+    seek, zipfile writes each entry's sizes in a trailing data descriptor and
+    nothing but the central directory is kept in memory.
+
+        archive = ZipStream()
+        for name, data in documents:
+            yield archive.add(name, data)
+        yield archive.close()
+    """
+
+    def __init__(self, compression: int = zipfile.ZIP_STORED):
+        self.sink = _Sink()
+        self.archive = zipfile.ZipFile(self.sink, mode="w", compression=compression)
+
+    def add(self, name: str, data: bytes) -> bytes:
+        info = zipfile.ZipInfo(name, date_time=datetime.now().timetuple()[:6])
+        info.compress_type = self.archive.compression
+        self.archive.writestr(info, data)
+        return self.sink.drain()
+
+    def open(self, name: str, force_zip64: bool = False) -> IO[bytes]:
+        """A writable entry for content produced piece by piece; call drain() between writes."""
+        info = zipfile.ZipInfo(name, date_time=datetime.now().timetuple()[:6])
+        info.compress_type = self.archive.compression
+        return self.archive.open(info, mode="w", force_zip64=force_zip64)
+
+    def drain(self) -> bytes:
+        return self.sink.drain()
+
+    def close(self) -> bytes:
+        self.archive.close()
+        return self.sink.drain()
@@ -34,7 +34,8 @@ export const LoginForm: React.FC<LoginFormProps> = ({ onSubmit }) => {
 
       console.log('Login payload:', JSON.stringify(payload, null, 2));
       const response = await axios.post('http://localhost:8000/api/login', payload);
-      const { id, fullName, requiresPasswordChange } = response.data;
+      const { id, fullName, requiresPasswordChange, access_token } = response.data;
+      localStorage.setItem('token', access_token);
 
       setUserId(id);
       setRequiresPasswordChange(requiresPasswordChange);
@@ -1,8 +1,52 @@
 import { StrictMode } from 'react';
 import { createRoot } from 'react-dom/client';
+import axios from 'axios';
 import App from './App.tsx';
 import './index.css';
 
+// Where the API is served; relative URLs resolve against the page
+const BACKEND_ORIGINS = new Set(
+  [import.meta.env.VITE_BACKEND_URL ?? 'http://localhost:8000', 'http://localhost:8000'].map(
+    (url) => new URL(url, window.location.href).origin
+  )
+);
+
+const isBackendUrl = (url: string) => {
+  try {
+    return BACKEND_ORIGINS.has(new URL(url, window.location.href).origin);
+  } catch {
+    return false;
+  }
+};
+
+// Attach the session token issued by /api/login to backend requests only, never to other origins
+const withToken = (headers: Headers) => {
+  const token = localStorage.getItem('token');
+  if (token && !headers.has('Authorization')) {
+    headers.set('Authorization', `Bearer ${token}`);
+  }
+  return headers;
+};
+
+axios.interceptors.request.use((config) => {
+  const token = localStorage.getItem('token');
+  if (token && !config.headers.Authorization && isBackendUrl(axios.getUri(config))) {
+    config.headers.Authorization = `Bearer ${token}`;
+  }
+  return config;
+});
+
+const nativeFetch = window.fetch.bind(window);
+window.fetch = (input: RequestInfo | URL, init?: RequestInit) => {
+  const request = input instanceof Request ? input : null;
+  if (!isBackendUrl(request ? request.url : String(input))) {
+    return nativeFetch(input, init);
+  }
+  // As in fetch itself, init.headers replaces the Request's own headers when given
+  const headers = new Headers(init?.headers ?? request?.headers);
+  return nativeFetch(input, { ...init, headers: withToken(headers) });
+};
+
 createRoot(document.getElementById('root')!).render(
   <StrictMode>
     <App />
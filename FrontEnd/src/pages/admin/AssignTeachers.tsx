@@ -38,14 +38,10 @@ export const AssignTeachers = () => {
   useEffect(() => {
     const fetchData = async () => {
       try {
-        const [teachersRes, deptsRes, subjectsRes] = await Promise.all([
-          axios.get('http://localhost:8000/api/teachers'),
-          axios.get('http://localhost:8000/api/departments'),
-          axios.get('http://localhost:8000/api/subjects'),
-        ]);
-        setTeachers(teachersRes.data);
-        setDepartments(deptsRes.data);
-        setSubjects(subjectsRes.data);
+        const { data } = await axios.get('http://localhost:8000/api/bootstrap', { params: { page: 'admin-assign-teachers' } });
+        setTeachers(data.teachers);
+        setDepartments(data.departments);
+        setSubjects(data.subjects);
         setLoading(false);
       } catch (error) {
         toast.error('Failed to fetch data');
@@ -58,12 +58,10 @@ export const SATScore = () => {
   useEffect(() => {
     const fetchData = async () => {
       try {
-        const timestamp = new Date().getTime();
-        const [studentsRes, criteriaRes, deptsRes] = await Promise.all([
-          axios.get(`http://localhost:8000/api/students?t=${timestamp}`),
-          axios.get(`http://localhost:8000/api/mark-criteria?t=${timestamp}`),
-          axios.get(`http://localhost:8000/api/departments?t=${timestamp}`),
-        ]);
+        const { data: bundle } = await axios.get(`http://localhost:8000/api/bootstrap`, { params: { page: 'admin-sat-score' } });
+        const studentsRes = { data: bundle.students };
+        const criteriaRes = { data: bundle.mark_criteria };
+        const deptsRes = { data: bundle.departments };
         console.log('Raw /api/students response:', JSON.stringify(studentsRes.data, null, 2));
         console.log('Raw /api/departments response:', JSON.stringify(deptsRes.data, null, 2));
 
@@ -174,8 +172,7 @@ export const SATScore = () => {
       toast.success('Marks saved successfully!');
 
       // Refresh students to update marks
-      const timestamp = new Date().getTime();
-      const studentsRes = await axios.get(`http://localhost:8000/api/students?t=${timestamp}`);
+      const studentsRes = await axios.get(`http://localhost:8000/api/students`);
       const initialMarks: MarksData = {};
       const mappedStudents = studentsRes.data.map((student: any) => {
         let studentMarks: { [subjectId: string]: number } = {};
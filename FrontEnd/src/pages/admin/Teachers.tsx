@@ -34,12 +34,9 @@ export const Teachers = () => {
   useEffect(() => {
     const fetchData = async () => {
       try {
-        const [teachersRes, deptsRes] = await Promise.all([
-          axios.get('http://localhost:8000/api/teachers'),
-          axios.get('http://localhost:8000/api/departments')
-        ]);
-        setTeachers(teachersRes.data);
-        setDepartments(deptsRes.data);
+        const { data } = await axios.get('http://localhost:8000/api/bootstrap', { params: { page: 'admin-teachers' } });
+        setTeachers(data.teachers);
+        setDepartments(data.departments);
         setLoading(false);
       } catch (error) {
         toast.error('Failed to fetch data');
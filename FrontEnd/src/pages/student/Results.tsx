@@ -1,4 +1,6 @@
-import React, { useState } from 'react';
+import React, { useEffect, useState } from 'react';
+import axios from 'axios';
+import toast from 'react-hot-toast';
 import { ChevronDown, ChevronUp, Download, Search, MessageSquare } from 'lucide-react';
 import { QueryModal } from '../../components/modals/QueryModal';
 
@@ -7,49 +9,72 @@ interface Result {
   subjectCode: string;
   subjectName: string;
   credits: number;
-  internal: number;
-  external: number;
-  total: number;
+  internal: number | null;
+  external: number | null; // null until the SAT marks are submitted
+  total: number | null;
   grade: string;
-  gradePoint: number;
 }
 
-const mockResults: Record<number, Result[]> = {
-  1: [
-    {
-      semester: 1,
-      subjectCode: 'CS101',
-      subjectName: 'Introduction to Programming',
-      credits: 4,
-      internal: 45,
-      external: 85,
-      total: 85,
-      grade: 'A',
-      gradePoint: 9,
-    },
-    // Add more subjects for semester 1
-  ],
-  2: [
-    {
-      semester: 2,
-      subjectCode: 'CS201',
-      subjectName: 'Data Structures',
-      credits: 4,
-      internal: 42,
-      external: 88,
-      total: 88,
-      grade: 'A+',
-      gradePoint: 10,
-    },
-    // Add more subjects for semester 2
-  ],
-};
+interface SemesterResults {
+  semester: string;
+  gpa: number | null;
+  subjects: {
+    subjectCode: string;
+    subjectName: string;
+    credits: number;
+    internal: number | null;
+    sat: number | null;
+    final: number | null;
+    grade: string | null;
+    gradePoint: number | null;
+  }[];
+}
+
+const toResults = (semesters: SemesterResults[]): Record<number, Result[]> =>
+  semesters.reduce((acc, entry) => {
+    const semester = Number(entry.semester);
+    acc[semester] = entry.subjects.map((subject) => ({
+      semester,
+      subjectCode: subject.subjectCode,
+      subjectName: subject.subjectName,
+      credits: subject.credits,
+      internal: subject.internal,
+      external: subject.sat,
+      total: subject.final,
+      grade: subject.grade ?? '-',
+    }));
+    return acc;
+  }, {} as Record<number, Result[]>);
+
+// GPAs come from the server, which leaves out subjects that are not graded yet
+const toGPAs = (semesters: SemesterResults[]): Record<number, number | null> =>
+  Object.fromEntries(semesters.map((entry) => [Number(entry.semester), entry.gpa]));
+
+const formatGPA = (gpa: number | null | undefined) => (gpa == null ? '-' : gpa.toFixed(2));
 
 export const Results: React.FC = () => {
   const [expandedSemester, setExpandedSemester] = useState<number | null>(null);
   const [searchTerm, setSearchTerm] = useState('');
   const [queryModalOpen, setQueryModalOpen] = useState(false);
   const [selectedSubject, setSelectedSubject] = useState<{ code: string; name: string } | null>(null);
+  const [results, setResults] = useState<Record<number, Result[]>>({});
+  const [gpas, setGpas] = useState<Record<number, number | null>>({});
+  const [cgpa, setCgpa] = useState<number | null>(null);
+
+  useEffect(() => {
+    const fetchResults = async () => {
+      try {
+        const { data } = await axios.get('http://localhost:8000/api/student/me/results');
+        setResults(toResults(data.semesters));
+        setGpas(toGPAs(data.semesters));
+        setCgpa(data.cgpa);
+      } catch (error) {
+        console.error('Fetch results error:', error);
+        toast.error('Failed to fetch results');
+      }
+    };
+    fetchResults();
+  }, []);
 
   const toggleSemester = (semester: number) => {
     setExpandedSemester(expandedSemester === semester ? null : semester);
@@ -65,16 +90,7 @@ export const Results: React.FC = () => {
     setQueryModalOpen(true);
   };
 
-  const calculateSemesterGPA = (results: Result[]) => {
-    const totalCredits = results.reduce((sum, result) => sum + result.credits, 0);
-    const totalGradePoints = results.reduce(
-      (sum, result) => sum + result.credits * result.gradePoint,
-      0
-    );
-    return (totalGradePoints / totalCredits).toFixed(2);
-  };
-
-  const filteredResults = Object.entries(mockResults).reduce(
+  const filteredResults = Object.entries(results).reduce(
     (acc, [semester, results]) => {
       const filtered = results.filter(
         (result) =>
@@ -92,9 +108,14 @@ export const Results: React.FC = () => {
   return (
     <div className="space-y-6">
       <div className="flex justify-between items-center">
-        <h1 className="text-2xl font-bold text-gray-900 dark:text-white">
-          Semester Results
-        </h1>
+        <div className="flex items-center space-x-4">
+          <h1 className="text-2xl font-bold text-gray-900 dark:text-white">
+            Semester Results
+          </h1>
+          <span className="px-3 py-1 bg-indigo-100 text-indigo-800 dark:bg-indigo-900/20 dark:text-indigo-400 rounded-full text-sm">
+            CGPA: {formatGPA(cgpa)}
+          </span>
+        </div>
         <div className="relative">
           <Search className="absolute left-3 top-1/2 -translate-y-1/2 text-gray-400" size={20} />
           <input
@@ -122,7 +143,7 @@ export const Results: React.FC = () => {
                   Semester {semester}
                 </h2>
                 <span className="px-3 py-1 bg-indigo-100 text-indigo-800 dark:bg-indigo-900/20 dark:text-indigo-400 rounded-full text-sm">
-                  GPA: {calculateSemesterGPA(results)}
+                  GPA: {formatGPA(gpas[Number(semester)])}
                 </span>
               </div>
               <div className="flex items-center space-x-4">
@@ -188,13 +209,13 @@ export const Results: React.FC = () => {
                           {result.credits}
                         </td>
                         <td className="py-4 text-sm text-gray-600 dark:text-gray-400">
-                          {result.internal}
+                          {result.internal ?? '-'}
                         </td>
                         <td className="py-4 text-sm text-gray-600 dark:text-gray-400">
-                          {result.external}
+                          {result.external ?? '-'}
                         </td>
                         <td className="py-4 text-sm text-gray-600 dark:text-gray-400">
-                          {result.total}
+                          {result.total ?? '-'}
                         </td>
                         <td className="py-4">
                           <span
@@ -23,6 +23,7 @@ interface MarksData {
     [subjectId: string]: {
       fat: number;
       assignments: number[];
+      version?: number;
     };
   };
 }
@@ -34,7 +35,23 @@ interface InternalMark {
   fat2: number;
   fat3: number;
   assignments: number[];
+  internal: number | null; // aggregated by the server (best-of-N FATs, weighted assignments)
   academic_year: string;
+  version: number;
+}
+
+interface SavedVersion {
+  student_id: string;
+  subject_id: string;
+  version: number;
+  internal?: number | null;
+}
+
+interface MarksConflict {
+  student_id: string;
+  subject_id: string;
+  current_version: number;
+  current: Partial<InternalMark>;
 }
 
 export const InternalMarks = () => {
@@ -54,12 +71,12 @@ export const InternalMarks = () => {
   useEffect(() => {
     const fetchData = async () => {
       try {
-        const timestamp = new Date().getTime();
-        const [studentsRes, subjectsRes, marksRes] = await Promise.all([
-          axios.get(`http://localhost:8000/api/students?t=${timestamp}`),
-          axios.get(`http://localhost:8000/api/subjects?t=${timestamp}`),
-          axios.get(`http://localhost:8000/api/internal-marks?t=${timestamp}`),
+        const [bootstrapRes, marksRes] = await Promise.all([
+          axios.get(`http://localhost:8000/api/bootstrap`, { params: { page: 'teacher-internal-marks' } }),
+          axios.get(`http://localhost:8000/api/internal-marks`),
         ]);
+        const studentsRes = { data: bootstrapRes.data.students };
+        const subjectsRes = { data: bootstrapRes.data.subjects };
 
         // Map students
         const mappedStudents = studentsRes.data.map((student: any) => ({
@@ -86,6 +103,7 @@ export const InternalMarks = () => {
             initialMarks[mark.student_id][mark.subject_id] = {
               fat: mark[`fat${selectedFAT}`] || 0,
               assignments: mark.assignments || Array(assignmentCount).fill(0),
+              version: mark.version,
             };
           });
         });
@@ -112,6 +130,7 @@ export const InternalMarks = () => {
         [subjectId]: {
           fat: numValue,
           assignments: prev[studentId]?.[subjectId]?.assignments || Array(assignmentCount).fill(0),
+          version: prev[studentId]?.[subjectId]?.version,
         },
       },
     }));
@@ -128,11 +147,47 @@ export const InternalMarks = () => {
           assignments: (prev[studentId]?.[subjectId]?.assignments || Array(assignmentCount).fill(0)).map((mark: number, i: number) =>
             i === index ? numValue : mark
           ),
+          version: prev[studentId]?.[subjectId]?.version,
         },
       },
     }));
   };
 
+  // Remember the versions the server assigned, so the next save is checked against them
+  const applyVersions = (versions: SavedVersion[] = []) => {
+    setMarks((prev) => {
+      const next = { ...prev };
+      versions.forEach(({ student_id, subject_id, version }) => {
+        next[student_id] = {
+          ...next[student_id] || {},
+          [subject_id]: {
+            ...(next[student_id]?.[subject_id] || { fat: 0, assignments: Array(assignmentCount).fill(0) }),
+            version,
+          },
+        };
+      });
+      return next;
+    });
+  };
+
+  // Show what the other teacher saved for the rejected entries, at the version the next save must match
+  const applyConflicts = (conflicts: MarksConflict[] = []) => {
+    setMarks((prev) => {
+      const next = { ...prev };
+      conflicts.forEach(({ student_id, subject_id, current_version, current }) => {
+        next[student_id] = {
+          ...next[student_id] || {},
+          [subject_id]: {
+            fat: current[`fat${selectedFAT}`] || 0,
+            assignments: current.assignments || Array(assignmentCount).fill(0),
+            version: current_version,
+          },
+        };
+      });
+      return next;
+    });
+  };
+
   const getFATMarks = (studentId: string, subjectId: string) => {
     return marks[studentId]?.[subjectId]?.fat || 0;
   };
@@ -161,6 +216,7 @@ export const InternalMarks = () => {
               fat: parseFloat(data.fat.toFixed(1)),
               assignments: data.assignments.map((a: number) => parseFloat(a.toFixed(1))),
               academic_year: '2024-2025',
+              version: data.version,
             }))
         )
         .filter((mark) => mark.fat >= 0 && mark.assignments.every((a) => a >= 0));
@@ -172,28 +228,22 @@ export const InternalMarks = () => {
       }
 
       console.log('Sending internal marks payload:', JSON.stringify({ marks: marksData }, null, 2));
-      await axios.post('http://localhost:8000/api/internal-marks', { marks: marksData });
+      const response = await axios.post('http://localhost:8000/api/internal-marks', { marks: marksData });
+      // The saved values are already on screen; only their new versions are needed
+      applyVersions(response.data.versions);
       toast.success('Marks saved successfully!');
       setSaved(true);
       setTimeout(() => setSaved(false), 2000);
-
-      // Refresh marks
-      const timestamp = new Date().getTime();
-      const marksRes = await axios.get(`http://localhost:8000/api/internal-marks?t=${timestamp}`);
-      const initialMarks: MarksData = {};
-      marksRes.data.forEach((student: any) => {
-        student.internal_marks.forEach((mark: InternalMark) => {
-          initialMarks[mark.student_id] = initialMarks[mark.student_id] || {};
-          initialMarks[mark.student_id][mark.subject_id] = {
-            fat: mark[`fat${selectedFAT}`] || 0,
-            assignments: mark.assignments || Array(assignmentCount).fill(0),
-          };
-        });
-      });
-      setMarks(initialMarks);
     } catch (error: any) {
       console.error('Save marks error:', JSON.stringify(error.response?.data || error.message, null, 2));
-      toast.error('Failed to save marks');
+      if (error.response?.status === 409) {
+        // Another teacher saved some of these entries first: keep the entries that saved and show theirs for the rest
+        applyVersions(error.response.data.detail.versions);
+        applyConflicts(error.response.data.detail.conflicts);
+        toast.error(error.response.data.detail.message);
+      } else {
+        toast.error('Failed to save marks');
+      }
     } finally {
       setSaving(false);
     }
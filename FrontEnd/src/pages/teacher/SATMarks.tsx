@@ -27,6 +27,7 @@ interface SATMark {
   marks: number;
   isSubmitted: boolean;
   academic_year: string;
+  version: number;
 }
 
 interface MarksData {
@@ -34,10 +35,17 @@ interface MarksData {
     [subjectId: string]: {
       marks: number;
       isSubmitted: boolean;
+      version?: number;
     };
   };
 }
 
+interface SavedVersion {
+  student_id: string;
+  subject_id: string;
+  version: number;
+}
+
 export const SATMarks = () => {
   const [selectedSubject, setSelectedSubject] = useState<string | null>(null);
   const [marks, setMarks] = useState<MarksData>({});
@@ -66,6 +74,7 @@ export const SATMarks = () => {
             initialMarks[student.id][mark.subject_id] = {
               marks: mark.marks,
               isSubmitted: mark.isSubmitted,
+              version: mark.version,
             };
           });
         });
@@ -115,6 +124,7 @@ export const SATMarks = () => {
         [subjectId]: {
           marks: numValue,
           isSubmitted: prev[studentId]?.[subjectId]?.isSubmitted || false,
+          version: prev[studentId]?.[subjectId]?.version,
         },
       },
     }));
@@ -124,6 +134,20 @@ export const SATMarks = () => {
     return marks[studentId]?.[subjectId]?.marks || 0;
   };
 
+  // Remember the versions the server assigned, so the next save is checked against them
+  const applyVersions = (versions: SavedVersion[] = []) => {
+    setMarks(prev => {
+      const next = { ...prev };
+      versions.forEach(({ student_id, subject_id, version }) => {
+        next[student_id] = {
+          ...next[student_id] || {},
+          [subject_id]: { ...(next[student_id]?.[subject_id] || { marks: 0, isSubmitted: false }), version },
+        };
+      });
+      return next;
+    });
+  };
+
   const isSubjectSubmitted = (subjectId: string) => {
     return subjects.find(s => s.id === subjectId)?.isSubmitted || false;
   };
@@ -142,17 +166,25 @@ export const SATMarks = () => {
           subject_id: selectedSubject,
           marks: getStudentMarks(student.id, selectedSubject),
           academic_year: '2024-2025',
+          version: marks[student.id]?.[selectedSubject]?.version,
         })),
       };
       console.log('Saving SAT marks payload:', JSON.stringify(payload, null, 2));
       const response = await axios.post('http://localhost:8000/api/sat-marks', payload);
       console.log('Save SAT marks response:', response.data);
+      applyVersions(response.data.versions);
       toast.success(response.data.status);
       setSaved(true);
       setTimeout(() => setSaved(false), 2000);
     } catch (error: any) {
       console.error('Save marks error:', error);
-      toast.error(error.response?.data?.detail || 'Failed to save marks');
+      if (error.response?.status === 409) {
+        // Another teacher saved some of these entries first; theirs are kept until the page is reloaded
+        applyVersions(error.response.data.detail.versions);
+        toast.error(error.response.data.detail.message);
+      } else {
+        toast.error(error.response?.data?.detail || 'Failed to save marks');
+      }
     } finally {
       setSaving(false);
     }